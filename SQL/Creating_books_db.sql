@@ -58,3 +58,38 @@ CREATE TABLE Ratings (
 
 
 
+
+-- Summary tables, kept up to date by refresh_summary_tables and update_summary_tables in Python.
+-- They store sums and counts (not averages) so they can be updated incrementally.
+
+CREATE TABLE Author_Summary (
+    author_id INT PRIMARY KEY,
+    book_count INT NOT NULL,
+    rated_count INT NOT NULL,
+    rating_sum DECIMAL(15,2) NOT NULL,
+    FOREIGN KEY (author_id) REFERENCES Authors(author_id)
+);
+
+CREATE TABLE Genre_Summary (
+    genre_id INT PRIMARY KEY,
+    book_count INT NOT NULL,
+    rated_count INT NOT NULL,
+    rating_sum DECIMAL(15,2) NOT NULL,
+    review_sum DECIMAL(20,0) NOT NULL,
+    FOREIGN KEY (genre_id) REFERENCES Genres(genre_id)
+);
+
+CREATE TABLE Format_Summary (
+    book_format VARCHAR(255) PRIMARY KEY,
+    format_count INT NOT NULL,
+    book_count INT NOT NULL,
+    rated_count INT NOT NULL,
+    rating_sum DECIMAL(15,2) NOT NULL
+);
+
+CREATE TABLE Page_Summary (
+    num_pages INT PRIMARY KEY,
+    book_count INT NOT NULL,
+    rated_count INT NOT NULL,
+    rating_sum DECIMAL(15,2) NOT NULL
+);
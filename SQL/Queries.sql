@@ -1,68 +1,131 @@
+-- Queries of the analysis. Every statement starts with a "-- name:" line and is loaded by
+-- goodreads.database.QUERIES (a QueryRegistry) under that name; thresholds and limits are
+-- bound parameters (:min_ratings, :limit, ...) given by the get_* functions of goodreads.database.
+-- The "_summary" statements answer the same question from the summary tables of
+-- Creating_books_db.sql.
+
 -- 1. Which genres are the most popular among the highest-rated books?
 
-SELECT Genres.genre, AVG(Books.average_rating) AS avg_rating, COUNT(*) AS book_count
+-- name: avg_rating_by_genre
+SELECT Genres.genre AS Genre, AVG(Books.average_rating) AS Avg_Rating, COUNT(*) AS Count
 FROM Books
 JOIN Book_Genres ON Books.book_id = Book_Genres.book_id
 JOIN Genres ON Genres.genre_id = Book_Genres.genre_id
 GROUP BY Genres.genre
-HAVING AVG(Books.average_rating) > 4
-ORDER BY avg_rating DESC;
+HAVING COUNT(*) >= :min_books AND AVG(Books.average_rating) > :min_rating
+ORDER BY Avg_Rating DESC
+LIMIT :limit;
+
+-- name: avg_rating_by_genre_summary
+SELECT Genres.genre AS Genre, 1.0 * rating_sum / rated_count AS Avg_Rating, book_count AS Count
+FROM Genre_Summary
+JOIN Genres ON Genres.genre_id = Genre_Summary.genre_id
+WHERE book_count >= :min_books AND rating_sum > :min_rating * rated_count
+ORDER BY Avg_Rating DESC
+LIMIT :limit;
 
 -- 2. Which authors have the most books with high ratings?
 
-SELECT author, count(author) as "Number of Books rated", avg(average_rating) as Average_Rating
-from Authors join Books on Authors.author_id = Books.author_id
-group by author
-having count(author) > 10 and Average_Rating >= 4
-order by Average_Rating desc;
-
+-- name: best_authors
+SELECT author, COUNT(author) AS `Number of Books rated`, AVG(average_rating) AS Average_Rating
+FROM Authors
+JOIN Books ON Authors.author_id = Books.author_id
+GROUP BY author
+HAVING COUNT(author) > :min_books AND AVG(average_rating) >= :min_rating
+ORDER BY Average_Rating DESC
+LIMIT :limit;
+
+-- name: best_authors_summary
+SELECT author, SUM(book_count) AS `Number of Books rated`,
+       1.0 * SUM(rating_sum) / SUM(rated_count) AS Average_Rating
+FROM Authors
+JOIN Author_Summary ON Authors.author_id = Author_Summary.author_id
+GROUP BY author
+HAVING SUM(book_count) > :min_books AND SUM(rating_sum) >= :min_rating * SUM(rated_count)
+ORDER BY Average_Rating DESC
+LIMIT :limit;
 
 -- 3. Which formats are the most in-demand (e.g., hardcover, paperback)?
 
-Select book_format, count(book_format) 
-from Formats
-group by book_format
-order by count(book_format) DESC;
+-- name: book_formats
+SELECT book_format, COUNT(book_format) AS `count(book_format)`
+FROM Formats
+WHERE book_format IS NOT NULL
+GROUP BY book_format
+ORDER BY COUNT(book_format) DESC
+LIMIT :limit;
+
+-- name: book_formats_summary
+SELECT book_format, format_count AS `count(book_format)`
+FROM Format_Summary
+WHERE format_count > 0 AND book_format IS NOT NULL
+ORDER BY format_count DESC
+LIMIT :limit;
 
 -- 4. Which genres have the highest number of reviews?
 
-SELECT Genres.genre, SUM(Books.num_reviews) AS sum_reviews
+-- name: genres_by_reviews
+SELECT Genres.genre AS Genre, SUM(Books.num_reviews) AS Total_Reviews
 FROM Books
 JOIN Book_Genres ON Books.book_id = Book_Genres.book_id
 JOIN Genres ON Genres.genre_id = Book_Genres.genre_id
 GROUP BY Genres.genre
-ORDER BY sum_reviews DESC;
+ORDER BY Total_Reviews DESC
+LIMIT :limit;
+
+-- name: genres_by_reviews_summary
+SELECT Genres.genre AS Genre, review_sum AS Total_Reviews
+FROM Genre_Summary
+JOIN Genres ON Genres.genre_id = Genre_Summary.genre_id
+ORDER BY review_sum DESC
+LIMIT :limit;
 
 -- 5. Which books have the highest number of 5-star reviews?
 
-SELECT book_title, author, num_ratings, average_rating, 5_star_reviews
-FROM  Authors join Books on Authors.author_id = Books.author_id
-join Ratings on Books.book_id = Ratings.book_id
-where num_ratings > 1000
-order by 5_star_reviews desc;
+-- name: top_books_5_stars
+SELECT book_title, author, num_ratings, average_rating, `5_star_reviews`
+FROM Authors
+JOIN Books ON Authors.author_id = Books.author_id
+JOIN Ratings ON Books.book_id = Ratings.book_id
+WHERE num_ratings > :min_ratings
+ORDER BY `5_star_reviews` DESC
+LIMIT :limit;
 
 -- 6. Which books have high average ratings but a low number of reviews (less than 100)?
 
+-- name: highest_rated_books
 SELECT book_title, author, num_ratings, average_rating
-FROM  Authors join Books on Authors.author_id = Books.author_id
-where num_ratings < 100 and num_ratings > 30
-order by average_rating DESC;
-
+FROM Authors
+JOIN Books ON Authors.author_id = Books.author_id
+WHERE num_ratings < :max_ratings AND num_ratings > :min_ratings
+ORDER BY average_rating DESC
+LIMIT :limit;
 
 -- 7. Do the number of pages correlate with the Average Rating of the book?
 
-SELECT num_pages as "Number of Pages", avg(average_rating) as "Average Rating"
-FROM Books JOIN Formats ON Books.format_id = Formats.format_id
+-- name: num_pages_avg_rating
+SELECT num_pages AS `Number of Pages`, AVG(average_rating) AS `Average Rating`
+FROM Books
+JOIN Formats ON Books.format_id = Formats.format_id
 GROUP BY num_pages
-ORDER BY "Average Rating" DESC;
+ORDER BY `Average Rating` DESC;
 
--- 8. Which books have the highest average rating?
+-- name: num_pages_avg_rating_summary
+SELECT num_pages AS `Number of Pages`, 1.0 * rating_sum / rated_count AS `Average Rating`
+FROM Page_Summary
+WHERE rated_count > 0
+ORDER BY `Average Rating` DESC;
 
-SELECT book_title, average_rating
+-- name: num_pages_rating_by_book
+SELECT book_title, num_pages, average_rating
 FROM Books
-WHERE num_ratings > 300
-ORDER BY average_rating DESC;
+JOIN Formats ON Books.format_id = Formats.format_id;
 
-SELECT *
-from Books
+-- 8. Which books have the highest average rating?
 
+-- name: top_books_by_avg_rating
+SELECT book_title, average_rating
+FROM Books
+WHERE num_ratings > :min_ratings
+ORDER BY average_rating DESC
+LIMIT :limit;
@@ -0,0 +1,31 @@
+"""
+Goodreads analysis package.
+
+The package is split into three modules with their own dependencies:
+
+- goodreads.etl: building the tables from Book_Details.csv (pandas, NumPy).
+- goodreads.database: loading and querying the MySQL database (SQLAlchemy).
+- goodreads.visualization: the charts of the analysis (matplotlib, seaborn).
+
+plus goodreads.synthetic (synthetic data), goodreads.benchmark (benchmark suite) and 
+goodreads.aggregators (online statistics), goodreads.search (full-text search), 
+goodreads.recommend (similar books), goodreads.export (the Tableau extracts), 
+goodreads.validation (constraint checks before loading) and goodreads.metrics (stage 
+timings and counters).
+
+Importing the package does not import any of them; each module is imported the first 
+time it is used (for example goodreads.visualization), so a script only pays for the 
+dependencies it needs.
+"""
+
+import importlib
+
+__all__ = ['etl', 'database', 'visualization', 'synthetic', 'benchmark', 'aggregators', 'search', 'recommend', 'export',
+           'validation', 'metrics']
+
+
+def __getattr__(name):
+    # Import the submodules on first access
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,506 @@
+"""
+Online statistics of the Goodreads analysis: aggregators updated batch by batch in a single
+pass (see database.stream_query), so statistics over millions of books are computed in the
+memory of one batch. Every aggregator can be merged with another one of the same kind, so
+partial results of several workers or partitions combine into the exact overall result.
+The sketches (CountMinSketch, HeavyHitters, HyperLogLog, QuantileSketch and CatalogSketches)
+trade exactness for a fixed size: their results are approximate, within configurable error
+bounds, and they merge the same way.
+
+Only pandas and NumPy are imported here.
+"""
+
+import pandas as pd
+import numpy as np
+
+
+class RunningMoments:
+    """
+    This class keeps the count, mean and variance of a numeric column, updated batch by
+    batch with the parallel form of Welford's algorithm (Chan et al.), which stays accurate
+    where the textbook sum of squares loses precision. Missing values are ignored.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+    
+    def update(self, values):
+        # Add a batch of values
+        values = pd.to_numeric(pd.Series(values), errors='coerce').dropna().to_numpy(dtype='float64')
+        if len(values) == 0:
+            return self
+        batch = RunningMoments()
+        batch.count = len(values)
+        batch.mean = values.mean()
+        batch.m2 = ((values - batch.mean) ** 2).sum()
+        batch.min = values.min()
+        batch.max = values.max()
+        return self.merge(batch)
+    
+    def merge(self, other):
+        # Add the values seen by another aggregator
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        return self
+    
+    def variance(self, ddof=1):
+        # Variance of the values seen so far (sample variance by default, like pandas)
+        return self.m2 / (self.count - ddof) if self.count > ddof else np.nan
+    
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+    
+    def result(self):
+        return {'count': self.count, 'mean': float(self.mean) if self.count else np.nan, 'std': float(self.std()),
+                'min': float(self.min), 'max': float(self.max)}
+
+
+class RunningCorrelation:
+    """
+    This class keeps the Pearson correlation of two numeric columns, updated batch by batch
+    from the moments of each column and their co-moment. Pairs with a missing value are
+    ignored, like pandas' Series.corr.
+    """
+    
+    def __init__(self):
+        self.x = RunningMoments()
+        self.y = RunningMoments()
+        self.comoment = 0.0
+    
+    def update(self, x, y):
+        # Add a batch of (x, y) pairs
+        pairs = pd.DataFrame({'x': pd.to_numeric(pd.Series(x).reset_index(drop=True), errors='coerce'),
+                              'y': pd.to_numeric(pd.Series(y).reset_index(drop=True), errors='coerce')}).dropna()
+        if len(pairs) == 0:
+            return self
+        batch = RunningCorrelation()
+        batch.x.update(pairs['x'])
+        batch.y.update(pairs['y'])
+        x_values = pairs['x'].to_numpy(dtype='float64')
+        y_values = pairs['y'].to_numpy(dtype='float64')
+        batch.comoment = ((x_values - batch.x.mean) * (y_values - batch.y.mean)).sum()
+        return self.merge(batch)
+    
+    def merge(self, other):
+        # Add the pairs seen by another aggregator
+        if other.x.count == 0:
+            return self
+        count = self.x.count + other.x.count
+        self.comoment += (other.comoment + (other.x.mean - self.x.mean) * (other.y.mean - self.y.mean) *
+                          self.x.count * other.x.count / count)
+        self.x.merge(other.x)
+        self.y.merge(other.y)
+        return self
+    
+    def covariance(self, ddof=1):
+        return self.comoment / (self.x.count - ddof) if self.x.count > ddof else np.nan
+    
+    def result(self):
+        # Pearson correlation of the pairs seen so far
+        denominator = np.sqrt(self.x.m2 * self.y.m2)
+        return float(self.comoment / denominator) if self.x.count > 1 and denominator > 0 else np.nan
+
+
+class TopK:
+    """
+    This class keeps the k rows with the largest values of a column among all the batches
+    it has seen, e.g. the most rated books. Only k rows are held between batches.
+    
+    Args:
+    k (int): Number of rows to keep.
+    column (str): Column the rows are ranked by.
+    ascending (bool): Keep the k smallest values instead of the largest.
+    """
+    
+    def __init__(self, k, column, ascending=False):
+        self.k = k
+        self.column = column
+        self.ascending = ascending
+        self.rows = None
+    
+    def update(self, batch_df):
+        # Add a batch of rows
+        if self.ascending:
+            batch_df = batch_df.nsmallest(self.k, self.column)
+        else:
+            batch_df = batch_df.nlargest(self.k, self.column)
+        return self._keep(batch_df)
+    
+    def merge(self, other):
+        # Add the rows kept by another aggregator
+        if other.rows is None:
+            return self
+        return self.update(other.rows)
+    
+    def result(self):
+        # The kept rows, from the first to the k-th
+        if self.rows is None:
+            return pd.DataFrame(columns=[self.column])
+        return self.rows.reset_index(drop=True)
+    
+    def _keep(self, batch_df):
+        rows = batch_df if self.rows is None else pd.concat([self.rows, batch_df], ignore_index=True)
+        # Earlier rows win ties, as with a single nlargest over all the rows
+        self.rows = rows.sort_values(self.column, ascending=self.ascending, kind='stable').head(self.k)
+        return self
+
+
+def hash_keys(keys, seed=0):
+    """
+    This function hashes keys (strings, numbers, or the rows of a DataFrame) to 64-bit 
+    integers with pandas' vectorized SipHash. The hashes only depend on the values and the 
+    seed, so sketches built in different processes can be merged.
+    
+    Args:
+    keys (Series, DataFrame or array): The keys to hash.
+    seed (int): Seed of the hash function.
+    
+    Returns:
+    hashes (ndarray): One uint64 hash per key.
+    """
+    
+    if not isinstance(keys, (pd.Series, pd.DataFrame)):
+        keys = pd.Series(keys)
+    return pd.util.hash_pandas_object(keys, index=False, hash_key=f"{seed:016d}").to_numpy()
+
+
+class CountMinSketch:
+    """
+    This class estimates the total weight of any key (e.g. the reviews of a genre) in a 
+    fixed-size table of counters. An estimate is never below the true total and exceeds it 
+    by at most epsilon times the total weight seen, with probability 1 - delta. Sketches 
+    with the same epsilon, delta and seed can be merged.
+    
+    Args:
+    epsilon (float): Error bound, as a share of the total weight.
+    delta (float): Probability of exceeding the error bound.
+    seed (int): Seed of the hash functions.
+    """
+    
+    def __init__(self, epsilon=0.001, delta=0.01, seed=0):
+        self.width = int(np.ceil(np.e / epsilon))
+        self.depth = int(np.ceil(np.log(1 / delta)))
+        self.seed = seed
+        self.counters = np.zeros((self.depth, self.width))
+        self.total = 0.0
+    
+    def update(self, keys, weights=None):
+        # Add a batch of keys, each with its weight (1 by default)
+        keys = pd.Series(keys).reset_index(drop=True)
+        weights = pd.Series(1.0 if weights is None else pd.to_numeric(pd.Series(weights).reset_index(drop=True)),
+                            index=keys.index, dtype='float64')
+        present = (keys.notna() & weights.notna()).to_numpy()
+        weights = weights.to_numpy()[present]
+        for row, columns in enumerate(self._columns(keys[present])):
+            self.counters[row] += np.bincount(columns, weights, minlength=self.width)
+        self.total += weights.sum()
+        return self
+    
+    def merge(self, other):
+        # Add the keys seen by another sketch
+        if (other.width, other.depth, other.seed) != (self.width, self.depth, self.seed):
+            raise ValueError("Only Count-Min sketches with the same epsilon, delta and seed can be merged")
+        self.counters += other.counters
+        self.total += other.total
+        return self
+    
+    def estimate(self, keys):
+        # Estimated total weight of every key
+        columns = self._columns(pd.Series(keys))
+        return self.counters[np.arange(self.depth)[:, None], columns].min(axis=0)
+    
+    def _columns(self, keys):
+        # One counter per row of the table, from two halves of a single hash (Kirsch-Mitzenmacher)
+        hashes = hash_keys(keys, self.seed)
+        first, second = hashes & np.uint64(0xFFFFFFFF), (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype='uint64')[:, None]
+        return ((first + rows * second) % np.uint64(self.width)).astype('int64')
+
+
+class HeavyHitters:
+    """
+    This class keeps the keys with the largest total weight (e.g. the genres with the most 
+    reviews) in at most capacity counters, with the Misra-Gries algorithm. The count kept 
+    for a key is never above its true total and below it by at most max_error(), i.e. 
+    total weight / (capacity + 1); every key heavier than that is kept. Summaries of any 
+    capacity can be merged, with the error bound of the smallest one.
+    
+    Args:
+    capacity (int): Maximum number of keys kept.
+    """
+    
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='float64')
+        self.total = 0.0
+    
+    def update(self, keys, weights=None):
+        # Add a batch of keys, each with its (non-negative) weight, 1 by default
+        keys = pd.Series(keys).reset_index(drop=True)
+        weights = pd.Series(1.0 if weights is None else pd.to_numeric(pd.Series(weights).reset_index(drop=True)),
+                            index=keys.index, dtype='float64')
+        present = keys.notna() & weights.notna()
+        batch = weights[present].groupby(keys[present].to_numpy()).sum()
+        self.total += batch.sum()
+        return self._add(batch)
+    
+    def merge(self, other):
+        # Add the keys kept by another summary
+        self.capacity = min(self.capacity, other.capacity)
+        self.total += other.total
+        return self._add(other.counts)
+    
+    def max_error(self):
+        # Largest amount by which a count can be below the true total
+        return (self.total - self.counts.sum()) / (self.capacity + 1)
+    
+    def result(self, k=None):
+        # The keys kept, heaviest first
+        counts = self.counts.sort_values(ascending=False, kind='stable')
+        return counts if k is None else counts.head(k)
+    
+    def _add(self, counts):
+        counts = self.counts.add(counts, fill_value=0) if len(self.counts) else counts.astype('float64')
+        if len(counts) > self.capacity:
+            # Decrement every counter by the (capacity + 1)-th largest one and drop the ones left at zero
+            threshold = counts.nlargest(self.capacity + 1).iloc[-1]
+            counts = counts[counts > threshold] - threshold
+        self.counts = counts
+        return self
+
+
+class HyperLogLog:
+    """
+    This class estimates the number of distinct keys (e.g. authors) in 2 ** precision small 
+    registers, with a relative standard error of about 1.04 / sqrt(2 ** precision). 
+    Sketches with the same precision and seed can be merged.
+    
+    Args:
+    error (float): Relative standard error wanted; sets the precision (4 to 18).
+    seed (int): Seed of the hash function.
+    """
+    
+    def __init__(self, error=0.01, seed=0):
+        self.precision = int(np.clip(np.ceil(2 * np.log2(1.04 / error)), 4, 18))
+        self.seed = seed
+        self.registers = np.zeros(2 ** self.precision, dtype='uint8')
+    
+    def update(self, keys):
+        # Add a batch of keys (a Series, or a DataFrame whose rows are the keys)
+        if isinstance(keys, pd.DataFrame):
+            keys = keys.dropna(how='all')
+        else:
+            keys = pd.Series(keys).dropna()
+        hashes = hash_keys(keys, self.seed)
+    
+        # The first bits choose the register, the position of the first 1 in the others is the rank
+        suffix_bits = 64 - self.precision
+        registers = (hashes >> np.uint64(suffix_bits)).astype('int64')
+        suffixes = hashes & np.uint64((1 << suffix_bits) - 1)
+        high = (suffixes >> np.uint64(32)).astype('float64')
+        low = (suffixes & np.uint64(0xFFFFFFFF)).astype('float64')
+        bit_lengths = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        ranks = (suffix_bits - bit_lengths + 1).astype('uint8')
+        np.maximum.at(self.registers, registers, ranks)
+        return self
+    
+    def merge(self, other):
+        # Add the keys seen by another sketch
+        if (other.precision, other.seed) != (self.precision, self.seed):
+            raise ValueError("Only HyperLogLog sketches with the same precision and seed can be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+    
+    def result(self):
+        # Estimated number of distinct keys, with the small-range correction (linear counting)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+        empty = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and empty:
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """
+    This class estimates the quantiles of a numeric column (e.g. the median number of pages) 
+    with a relative accuracy guarantee (DDSketch): every estimated quantile is within 
+    relative_accuracy of the true value. Values are counted in logarithmic buckets, so the 
+    size of the sketch only grows with the logarithm of the range of the values. Sketches 
+    with the same relative accuracy can be merged. Missing values are ignored.
+    
+    Args:
+    relative_accuracy (float): Relative error bound of the quantiles.
+    """
+    
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive = pd.Series(dtype='float64')
+        self.negative = pd.Series(dtype='float64')
+        self.zero_count = 0
+        self.count = 0
+        self.min = np.nan
+        self.max = np.nan
+    
+    def update(self, values):
+        # Add a batch of values
+        values = pd.to_numeric(pd.Series(values), errors='coerce').dropna().to_numpy(dtype='float64')
+        if len(values) == 0:
+            return self
+        self.positive = self._add(self.positive, self._keys(values[values > 0]))
+        self.negative = self._add(self.negative, self._keys(-values[values < 0]))
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self.count += len(values)
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+        return self
+    
+    def merge(self, other):
+        # Add the values seen by another sketch
+        if other.gamma != self.gamma:
+            raise ValueError("Only quantile sketches with the same relative accuracy can be merged")
+        self.positive = self.positive.add(other.positive, fill_value=0)
+        self.negative = self.negative.add(other.negative, fill_value=0)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        return self
+    
+    def quantile(self, q):
+        # Estimated q-quantile(s) of the values seen so far
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+    
+        # Bucket values and counts from the smallest value to the largest
+        negative = self.negative.sort_index(ascending=False)
+        positive = self.positive.sort_index()
+        midpoints = 2 * self.gamma ** np.concatenate([negative.index, positive.index]).astype('float64') / (self.gamma + 1)
+        bucket_values = np.concatenate([-midpoints[:len(negative)], [0.0], midpoints[len(negative):]])
+        counts = np.concatenate([negative.to_numpy(), [self.zero_count], positive.to_numpy()])
+    
+        ranks = np.asarray(q, dtype='float64') * (self.count - 1)
+        buckets = np.searchsorted(np.cumsum(counts), ranks, side='right')
+        estimates = np.clip(bucket_values[np.minimum(buckets, len(counts) - 1)], self.min, self.max)
+        return estimates if np.ndim(q) else float(estimates)
+    
+    def result(self, quantiles=(0.01, 0.25, 0.5, 0.75, 0.99)):
+        return {'count': self.count, 'min': float(self.min), 'max': float(self.max),
+                **{f"p{100 * q:g}": float(self.quantile(q)) for q in quantiles}}
+    
+    def _keys(self, values):
+        # Bucket of every value: the k with gamma ** (k - 1) < value <= gamma ** k
+        return np.ceil(np.log(values) / np.log(self.gamma)).astype('int64')
+    
+    @staticmethod
+    def _add(buckets, keys):
+        if len(keys) == 0:
+            return buckets
+        keys, counts = np.unique(keys, return_counts=True)
+        return buckets.add(pd.Series(counts, index=keys, dtype='float64'), fill_value=0)
+
+
+class CatalogSketches:
+    """
+    This class keeps the sketches of the approximate analytics of the catalog, updated chunk 
+    by chunk as the books stream through the ETL (see etl.update_sketches) instead of scanning 
+    the tables:
+    
+    - the reviews of every genre (CountMinSketch) and the genres with the most reviews 
+      (HeavyHitters), as in get_top_genres_by_reviews;
+    - the book formats and the authors with the most books (HeavyHitters);
+    - the number of distinct authors (HyperLogLog);
+    - the quantiles of 'average_rating' and 'num_pages' (QuantileSketch).
+    
+    Sketches built by parallel workers with the same arguments are combined with merge.
+    
+    Args:
+    epsilon (float): Error bound of the counts, as a share of the total weight.
+    delta (float): Probability of exceeding the error bound of the Count-Min sketch.
+    distinct_error (float): Relative standard error of the number of distinct authors.
+    relative_accuracy (float): Relative error bound of the quantiles.
+    seed (int): Seed of the hash functions.
+    """
+    
+    def __init__(self, epsilon=0.001, delta=0.01, distinct_error=0.01, relative_accuracy=0.01, seed=0):
+        capacity = int(np.ceil(1 / epsilon))
+        self.genre_reviews = CountMinSketch(epsilon, delta, seed)
+        self.top_genres = HeavyHitters(capacity)
+        self.top_formats = HeavyHitters(capacity)
+        self.top_authors = HeavyHitters(capacity)
+        self.authors = HyperLogLog(distinct_error, seed)
+        self.average_rating = QuantileSketch(relative_accuracy)
+        self.num_pages = QuantileSketch(relative_accuracy)
+        self.books = 0
+    
+    def update(self, books_df, book_genres_df):
+        """
+        This method adds a chunk of books to the sketches.
+    
+        Args:
+        books_df (DataFrame): One row per book, with the columns 'author', 'authorlink', 
+        'book_format', 'num_pages' and 'average_rating'.
+        book_genres_df (DataFrame): One row per (book, genre) pair, with the columns 'genre' 
+        and 'num_reviews' (the reviews of the book).
+    
+        Returns:
+        self (CatalogSketches): The updated sketches.
+        """
+        self.genre_reviews.update(book_genres_df['genre'], book_genres_df['num_reviews'])
+        self.top_genres.update(book_genres_df['genre'], book_genres_df['num_reviews'])
+        self.top_formats.update(books_df['book_format'])
+        self.top_authors.update(books_df['author'])
+        self.authors.update(books_df[['author', 'authorlink']])
+        self.average_rating.update(books_df['average_rating'])
+        self.num_pages.update(books_df['num_pages'])
+        self.books += len(books_df)
+        return self
+    
+    def merge(self, other):
+        # Add the books seen by the sketches of another worker
+        for name in ['genre_reviews', 'top_genres', 'top_formats', 'top_authors', 'authors', 
+                     'average_rating', 'num_pages']:
+            getattr(self, name).merge(getattr(other, name))
+        self.books += other.books
+        return self
+    
+    def top_genres_by_reviews(self, limit=10):
+        # Approximate get_top_genres_by_reviews: the heaviest genres, with their Count-Min reviews
+        genres = self.top_genres.result().index
+        reviews = pd.Series(self.genre_reviews.estimate(pd.Series(genres)), index=genres)
+        reviews = reviews.sort_values(ascending=False, kind='stable').head(limit)
+        return pd.DataFrame({'Genre': reviews.index, 'Total_Reviews': reviews.to_numpy()})
+    
+    def most_in_demand_book_formats(self, limit=20):
+        # The book formats with the most books
+        formats = self.top_formats.result(limit)
+        return pd.DataFrame({'book_format': formats.index, 'books': formats.to_numpy()})
+    
+    def most_prolific_authors(self, limit=10):
+        # The authors with the most books
+        authors = self.top_authors.result(limit)
+        return pd.DataFrame({'author': authors.index, 'books': authors.to_numpy()})
+    
+    def result(self):
+        return {
+            'books': self.books,
+            'distinct_authors': self.authors.result(),
+            'average_rating': self.average_rating.result(),
+            'num_pages': self.num_pages.result(),
+            'genre_reviews_max_error': float(self.genre_reviews.total / self.genre_reviews.width * np.e),
+            'top_genres': self.top_genres_by_reviews(),
+            'top_formats': self.most_in_demand_book_formats(),
+            'top_authors': self.most_prolific_authors(),
+        }
@@ -0,0 +1,245 @@
+"""
+Benchmark suite of the Goodreads analysis: times and memory-profiles every stage of the
+pipeline and every analytics query on synthetic data of increasing size, and keeps the
+results of every run in a CSV file so the versions of the code can be compared.
+"""
+
+import pandas as pd
+import os
+import time
+import tracemalloc
+import tempfile
+import subprocess
+import contextlib
+import io
+from sqlalchemy import create_engine
+
+from goodreads import etl, database, synthetic
+
+
+# The analytics queries: name, function and whether it can read from the summary tables
+BENCHMARK_QUERIES = [
+    ('get_top_books_5_stars', database.get_top_books_5_stars, False),
+    ('get_highest_rated_books', database.get_highest_rated_books, False),
+    ('get_best_authors', database.get_best_authors, True),
+    ('get_most_in_demand_book_formats', database.get_most_in_demand_book_formats, True),
+    ('get_avg_rating_by_genre', database.get_avg_rating_by_genre, True),
+    ('get_top_genres_by_reviews', database.get_top_genres_by_reviews, True),
+    ('get_num_pages_avg_rating', database.get_num_pages_avg_rating, True),
+    ('get_top_books_by_avg_rating', database.get_top_books_by_avg_rating, False),
+]
+
+
+def get_code_version():
+    """
+    This function returns the short git commit hash of the code, used to tell benchmark
+    runs of different versions apart.
+    
+    Returns:
+    version (str): The commit hash, or 'unknown' outside of a git repository.
+    """
+    
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def measure(function, repeats=1, profile_memory=True):
+    """
+    This function runs a function and measures it: the best wall time of the repeats,
+    then, in a separate run, the peak of memory allocated by Python and NumPy while it
+    runs (tracemalloc slows the code down, so it is never active while timing). Memory
+    allocated by Arrow-backed columns is not seen by tracemalloc.
+    
+    Args:
+    function (function): The function to measure, without arguments.
+    repeats (int): Number of timed runs.
+    profile_memory (bool): Whether to run the function once more under tracemalloc.
+    
+    Returns:
+    result: The value returned by the function.
+    stats (dict): The seconds and the peak memory in MB (None if not profiled).
+    """
+    
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    
+    peak_mb = None
+    if profile_memory:
+        tracemalloc.start()
+        try:
+            function()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        finally:
+            tracemalloc.stop()
+    
+    return result, {'seconds': min(seconds), 'peak_mb': peak_mb}
+
+
+def benchmark_stages(path, engine, repeats=1, profile_memory=True):
+    """
+    This function measures every stage of the pipeline on a Book_Details file, from
+    reading the CSV to loading the tables and the summary tables into the database.
+    
+    Args:
+    path (str): Path of the Book_Details CSV file.
+    engine (Engine): The SQLAlchemy engine of an empty database.
+    repeats (int): Number of timed runs of each stage.
+    profile_memory (bool): Whether to measure the peak memory of each stage.
+    
+    Returns:
+    records (list): One dict per stage with its name, seconds, peak memory and output rows.
+    """
+    
+    records = []
+    
+    def run(name, function, rows=len):
+        result, stats = measure(function, repeats=repeats, profile_memory=profile_memory)
+        records.append({'kind': 'stage', 'name': name, 'rows': rows(result), **stats})
+        return result
+    
+    df = run('load_book_details', lambda: etl.load_book_details(path))
+    books_df, authors_df, formats_df = run('create_subtables', lambda: etl.create_subtables(df),
+                                           rows=lambda tables: len(tables[0]))
+    formats_df = run('format_format_table', lambda: etl.format_format_table(formats_df.copy()))
+    # format_books_table prints the books without a valid format
+    with contextlib.redirect_stdout(io.StringIO()):
+        run('format_books_table', lambda: etl.format_books_table(books_df.copy(), formats_df))
+    split = run('split_genres', lambda: etl.split_genres(df['genres']))
+    genres_df = run('format_genres_table', lambda: etl.format_genres_table(df, split=split))
+    run('create_book_genres_table', lambda: etl.create_book_genres_table(df, genres_df, split=split))
+    run('create_ratings_table', lambda: etl.create_ratings_table(df))
+    with contextlib.redirect_stdout(io.StringIO()):
+        tables = run('build_tables', lambda: etl.build_tables(df), rows=lambda tables: len(tables['Books']))
+    
+    # Loading is not repeatable on the same database, it is measured once
+    database.create_schema(engine)
+    run_once = measure(lambda: database.bulk_load_tables(engine, tables), profile_memory=False)[1]
+    records.append({'kind': 'stage', 'name': 'bulk_load_tables', 'rows': len(tables['Books']), **run_once})
+    run('refresh_summary_tables', lambda: database.refresh_summary_tables(engine), rows=lambda result: 0)
+    
+    return records
+
+
+def benchmark_queries(engine, repeats=3, profile_memory=True):
+    """
+    This function measures every analytics query, on the base tables and, when the query
+    supports it, on the summary tables.
+    
+    Args:
+    engine (Engine): The SQLAlchemy engine of a loaded database.
+    repeats (int): Number of timed runs of each query.
+    profile_memory (bool): Whether to measure the peak memory of each query.
+    
+    Returns:
+    records (list): One dict per query with its name, seconds, peak memory and result rows.
+    """
+    
+    records = []
+    for name, query_function, supports_summaries in BENCHMARK_QUERIES:
+        variants = [(name, {})]
+        if supports_summaries:
+            variants.append((f"{name}[summaries]", {'use_summaries': True}))
+        for variant_name, options in variants:
+            result, stats = measure(lambda: query_function(engine, **options), repeats=repeats,
+                                    profile_memory=profile_memory)
+            records.append({'kind': 'query', 'name': variant_name, 'rows': len(result), **stats})
+    
+    return records
+
+
+def run_benchmarks(scales=(0.1, 1.0), results_path="benchmarks/results.csv", work_dir=None, repeats=1,
+                   profile_memory=True, seed=0):
+    """
+    This function runs the benchmark suite at each scale factor: it writes a synthetic
+    Book_Details file of that size, measures every pipeline stage while loading it into a
+    fresh SQLite database, then measures every query. The results are appended to
+    results_path with the code version, so regressions show up between versions (see
+    compare_benchmarks).
+    
+    Args:
+    scales (list): Scale factors of the synthetic data (1 is the size of the original dataset).
+    results_path (str): CSV file the results are appended to, or None to not store them.
+    work_dir (str): Directory for the synthetic files and databases. Defaults to a
+    temporary directory removed at the end.
+    repeats (int): Number of timed runs of each stage and query.
+    profile_memory (bool): Whether to measure the peak memory of each stage and query.
+    seed (int): Seed of the synthetic data.
+    
+    Returns:
+    results (DataFrame): One row per scale and stage or query.
+    """
+    
+    version = get_code_version()
+    timestamp = pd.Timestamp.now().isoformat(timespec='seconds')
+    records = []
+    
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        work_dir = work_dir or temporary_dir
+        os.makedirs(work_dir, exist_ok=True)
+    
+        for scale in scales:
+            # 1. Synthetic data and an empty database of this scale
+            path = os.path.join(work_dir, f"Book_Details_{scale}.csv")
+            num_books = synthetic.write_book_details(path, scale=scale, seed=seed)
+            database_path = os.path.join(work_dir, f"books_{scale}.db")
+            if os.path.exists(database_path):
+                os.remove(database_path)
+            engine = create_engine(f"sqlite:///{database_path}")
+    
+            # 2. Pipeline stages, then queries on the loaded database
+            scale_records = benchmark_stages(path, engine, repeats=repeats, profile_memory=profile_memory)
+            scale_records += benchmark_queries(engine, repeats=max(repeats, 3), profile_memory=profile_memory)
+            engine.dispose()
+    
+            for record in scale_records:
+                records.append({'version': version, 'timestamp': timestamp, 'scale': scale,
+                                'num_books': num_books, **record})
+    
+    results = pd.DataFrame(records)
+    
+    if results_path:
+        directory = os.path.dirname(results_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        results.to_csv(results_path, mode='a', header=not os.path.exists(results_path), index=False)
+    
+    return results
+
+
+def compare_benchmarks(results, baseline_version, current_version, threshold=1.2):
+    """
+    This function compares the benchmark results of two versions of the code: for every
+    scale and stage or query it shows the time and peak memory of both versions and flags
+    the ones that got slower by more than the threshold.
+    
+    Args:
+    results (DataFrame or str): The benchmark results, or the path of the results CSV file.
+    baseline_version (str): The version to compare against.
+    current_version (str): The version being checked.
+    threshold (float): Ratio of the times above which a measurement is a regression.
+    
+    Returns:
+    comparison (DataFrame): The times, peak memories and time ratio of both versions.
+    """
+    
+    if isinstance(results, str):
+        results = pd.read_csv(results, dtype={'version': str})
+    
+    # The latest run of each version
+    keys = ['scale', 'kind', 'name']
+    latest = (results[results['version'].isin([baseline_version, current_version])]
+              .sort_values('timestamp').drop_duplicates(keys + ['version'], keep='last'))
+    comparison = latest.pivot_table(index=keys, columns='version', values=['seconds', 'peak_mb'])
+    
+    comparison['time_ratio'] = (comparison[('seconds', current_version)] /
+                                comparison[('seconds', baseline_version)])
+    comparison['regression'] = comparison['time_ratio'] > threshold
+    
+    return comparison
@@ -0,0 +1,479 @@
+"""
+Command-line entry point of the Goodreads analysis:
+
+    python -m goodreads etl --input Book_Details.csv --output-dir Data/tables
+    python -m goodreads load --input Book_Details.csv --validate
+    python -m goodreads report --output-dir "Graphs Python"
+    python -m goodreads import-time
+    python -m goodreads generate --scale 10 --output Book_Details_10.csv
+    python -m goodreads benchmark --scales 0.1 1 10
+    python -m goodreads index --input Book_Details.csv
+    python -m goodreads search "secret garden" --genre Fantasy --min-rating 4
+    python -m goodreads recommend --book-id 2767052
+    python -m goodreads export --csv
+    python -m goodreads sketch --input Book_Details.csv --workers 4
+
+Every command imports only the modules it needs, when it runs, so `etl` never loads
+SQLAlchemy or matplotlib and parsing the arguments is almost free.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+# Modules timed by the import-time command, from the lightest to the heaviest
+IMPORT_TIME_MODULES = ['goodreads', 'goodreads.cli', 'goodreads.etl', 'goodreads.database',
+                       'goodreads.visualization', 'Functions']
+
+
+def measure_import_times(modules=None, repeats=3):
+    """
+    This function measures how long importing each module takes. Every import runs in a
+    fresh Python interpreter, so nothing is already cached by previous imports, and the
+    best time of the repeats is kept.
+    
+    Args:
+    modules (list): Names of the modules to import. Defaults to IMPORT_TIME_MODULES.
+    repeats (int): Number of interpreters started for each module.
+    
+    Returns:
+    import_times (dict): The best import time of each module, in seconds.
+    """
+    
+    modules = modules or IMPORT_TIME_MODULES
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    
+    import_times = {}
+    for module in modules:
+        code = (f"import time; start = time.perf_counter(); import {module}; "
+                f"print(time.perf_counter() - start)")
+        runs = [float(subprocess.run([sys.executable, '-c', code], cwd=project_dir, check=True,
+                                     capture_output=True, text=True).stdout)
+                for _ in range(repeats)]
+        import_times[module] = min(runs)
+    
+    return import_times
+
+
+def run_etl(args):
+    """
+    This function builds the tables from the source file and writes them as CSV files,
+    either in one pass through the columnar cache or chunk by chunk.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import etl
+    
+    if args.chunksize:
+        row_counts = etl.write_streamed_tables(args.input, output_dir=args.output_dir, chunksize=args.chunksize)
+    else:
+        tables = etl.load_cleaned_tables(args.input, cache_dir=args.cache_dir)
+        os.makedirs(args.output_dir, exist_ok=True)
+        row_counts = {}
+        for table_name, table_df in tables.items():
+            table_df.to_csv(os.path.join(args.output_dir, f"{table_name}.csv"), index=False)
+            row_counts[table_name] = len(table_df)
+    
+    for table_name, row_count in row_counts.items():
+        print(f"{table_name}: {row_count} rows")
+
+
+def run_load(args):
+    """
+    This function loads the tables into the database of DB_CONNECTION_STRING, either
+    fully (bulk load) or incrementally from the state of the previous run.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import etl, database, search
+    
+    engine = database.get_engine()
+    database.create_schema(engine)
+    
+    if args.incremental:
+        search_index = None
+        if args.index_dir:
+            index_exists = os.path.exists(os.path.join(args.index_dir, "index.json"))
+            search_index = search.SearchIndex.load(args.index_dir) if index_exists else search.SearchIndex()
+        df = etl.load_book_details(args.input)
+        counts = database.run_incremental_etl(df, engine, state_dir=args.state_dir, batch_size=args.batch_size,
+                                              update_summaries=args.update_summaries, search_index=search_index)
+        print(counts)
+    else:
+        tables = etl.load_cleaned_tables(args.input, cache_dir=args.cache_dir)
+        if args.validate:
+            from goodreads import validation
+            tables, quarantine, validation_report = validation.validate_tables(tables)
+            validation.write_quarantine(quarantine, validation_report, output_dir=args.quarantine_dir)
+            print(validation_report[validation_report['violations'] > 0].to_string(index=False))
+        report = database.bulk_load_tables(engine, tables, batch_size=args.batch_size,
+                                           use_load_data=args.use_load_data)
+        if args.update_summaries:
+            database.refresh_summary_tables(engine)
+        print(report.to_string(index=False))
+        if args.index_dir:
+            search_index = search.SearchIndex.build(tables)
+    
+    if args.index_dir:
+        search_index.save(args.index_dir)
+
+
+def run_report(args):
+    """
+    This function regenerates the charts of the analysis with generate_dashboard, from the 
+    database server or from the tables of the data directory (embedded backend).
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    import matplotlib
+    matplotlib.use('Agg')
+    from goodreads import database, visualization
+    
+    engine = database.get_worker_engine(args.workers, backend=args.backend, data_dir=args.data_dir)
+    report = visualization.generate_dashboard(engine, output_dir=args.output_dir, max_workers=args.workers,
+                                              use_summaries=args.use_summaries)
+    print(report.to_string(index=False))
+
+
+def run_import_time(args):
+    """
+    This function prints the import time of each module of the package.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    for module, seconds in measure_import_times(args.modules, repeats=args.repeats).items():
+        print(f"{module:<25} {seconds * 1000:8.1f} ms")
+
+
+def run_generate(args):
+    """
+    This function writes a synthetic Book_Details file.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import synthetic
+    
+    num_books = synthetic.write_book_details(args.output, scale=args.scale, chunksize=args.chunksize,
+                                             seed=args.seed, malformed_rate=args.malformed_rate)
+    print(f"{args.output}: {num_books} books")
+
+
+def run_benchmark(args):
+    """
+    This function runs the benchmark suite and prints its results, compared with a
+    previous version when one is given.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import benchmark
+    
+    results = benchmark.run_benchmarks(args.scales, results_path=args.results, work_dir=args.work_dir,
+                                       repeats=args.repeats, profile_memory=not args.no_memory)
+    print(results[['scale', 'kind', 'name', 'rows', 'seconds', 'peak_mb']].to_string(index=False))
+    
+    if args.baseline:
+        comparison = benchmark.compare_benchmarks(args.results, args.baseline, results['version'].iloc[0])
+        print(comparison.to_string())
+
+
+def run_index(args):
+    """
+    This function builds the search index of the books and saves it.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import etl, search
+    
+    tables = etl.load_cleaned_tables(args.input, cache_dir=args.cache_dir)
+    search_index = search.SearchIndex.build(tables)
+    search_index.save(args.index_dir)
+    print(f"{args.index_dir}: {len(search_index)} books")
+
+
+def run_search(args):
+    """
+    This function searches the saved index, or completes a title with --autocomplete.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import search
+    
+    search_index = search.SearchIndex.load(args.index_dir)
+    filters = {'author': args.author, 'book_format': args.format, 'genre': args.genre, 'min_rating': args.min_rating,
+               'max_rating': args.max_rating, 'min_ratings': args.min_ratings}
+    if args.autocomplete:
+        results = search_index.autocomplete(args.query, limit=args.limit, **filters)
+    else:
+        results = search_index.search(args.query, limit=args.limit, prefix=args.prefix, **filters)
+    print(results.to_string(index=False))
+
+
+def run_recommend(args):
+    """
+    This function prints the books similar to a book, or the best books of some genres.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import etl, recommend
+    
+    if (args.book_id is None) == (not args.genres):
+        raise SystemExit("recommend needs either --book-id or --genres")
+    
+    tables = etl.load_cleaned_tables(args.input, cache_dir=args.cache_dir)
+    index = recommend.RecommendationIndex.build(tables)
+    if args.book_id is not None:
+        results = index.similar(args.book_id, k=args.k, exact=args.exact, min_ratings=args.min_ratings)
+    else:
+        results = index.best_in_genres(args.genres, k=args.k, min_ratings=args.min_ratings)
+    print(results.to_string(index=False))
+
+
+def run_export(args):
+    """
+    This function writes the Tableau extracts with export_tableau_extracts, from the database 
+    server or from the tables of the data directory (embedded backend).
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import database, export
+    
+    csv_compression = None if args.csv_compression == 'none' else args.csv_compression
+    engine = database.get_worker_engine(args.workers, backend=args.backend, data_dir=args.data_dir)
+    report = export.export_tableau_extracts(engine, output_dir=args.output_dir, max_workers=args.workers,
+                                            use_summaries=args.use_summaries, compression=args.compression,
+                                            csv=args.csv, csv_compression=csv_compression, force=args.force)
+    print(report.to_string(index=False))
+
+
+def run_sketch(args):
+    """
+    This function prints the approximate analytics of the source file, computed from the 
+    sketches of sketch_book_details instead of scanning the tables.
+    
+    Args:
+    args (Namespace): The parsed command-line arguments.
+    
+    Returns:
+    None
+    """
+    
+    from goodreads import etl
+    
+    sketches = etl.sketch_book_details(args.input, chunksize=args.chunksize, max_workers=args.workers,
+                                       epsilon=args.epsilon, distinct_error=args.distinct_error,
+                                       relative_accuracy=args.relative_accuracy)
+    summary = sketches.result()
+    for name in ['books', 'distinct_authors', 'average_rating', 'num_pages']:
+        print(f"{name}: {summary[name]}")
+    for name in ['top_genres', 'top_formats', 'top_authors']:
+        print(summary[name].to_string(index=False))
+
+
+def build_parser():
+    """
+    This function creates the parser of the command-line arguments.
+    
+    Returns:
+    parser (ArgumentParser): The parser, with one subcommand per command.
+    """
+    
+    parser = argparse.ArgumentParser(prog='goodreads', description="Goodreads books analysis")
+    parser.add_argument('--metrics-json', default=None, help="write a JSON report of the run metrics")
+    parser.add_argument('--metrics-prom', default=None, help="write the run metrics in Prometheus text format")
+    parser.add_argument('--profile-memory', action='store_true', help="measure the peak memory of every stage")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    # 1. etl: build the tables and write them as CSV files
+    etl_parser = commands.add_parser('etl', help="build the tables from Book_Details.csv")
+    etl_parser.add_argument('--input', default="Book_Details.csv")
+    etl_parser.add_argument('--output-dir', default="Data/tables")
+    etl_parser.add_argument('--cache-dir', default="Data/cache")
+    etl_parser.add_argument('--chunksize', type=int, default=None, help="stream the source file in chunks")
+    etl_parser.set_defaults(handler=run_etl)
+    
+    # 2. load: load the tables into the database
+    load_parser = commands.add_parser('load', help="load the tables into the database")
+    load_parser.add_argument('--input', default="Book_Details.csv")
+    load_parser.add_argument('--cache-dir', default="Data/cache")
+    load_parser.add_argument('--batch-size', type=int, default=10000)
+    load_parser.add_argument('--use-load-data', action='store_true', help="use LOAD DATA LOCAL INFILE on MySQL")
+    load_parser.add_argument('--incremental', action='store_true', help="only apply the changes since the last run")
+    load_parser.add_argument('--state-dir', default="etl_state")
+    load_parser.add_argument('--update-summaries', action='store_true')
+    load_parser.add_argument('--index-dir', default=None, help="also build or update the search index")
+    load_parser.add_argument('--validate', action='store_true', help="quarantine the rows breaking a constraint")
+    load_parser.add_argument('--quarantine-dir', default="Data/quarantine")
+    load_parser.set_defaults(handler=run_load)
+    
+    # 3. report: regenerate the charts
+    report_parser = commands.add_parser('report', help="regenerate the charts of the analysis")
+    report_parser.add_argument('--output-dir', default="Graphs Python")
+    report_parser.add_argument('--workers', type=int, default=8)
+    report_parser.add_argument('--use-summaries', action='store_true')
+    report_parser.add_argument('--backend', choices=['server', 'embedded'], default=None,
+                               help="database to query, defaults to DB_BACKEND or 'server'")
+    report_parser.add_argument('--data-dir', default="Data/tables", help="tables of the embedded backend")
+    report_parser.set_defaults(handler=run_report)
+    
+    # 4. import-time: measure the import time of the modules
+    import_parser = commands.add_parser('import-time', help="measure the import time of the modules")
+    import_parser.add_argument('modules', nargs='*')
+    import_parser.add_argument('--repeats', type=int, default=3)
+    import_parser.set_defaults(handler=run_import_time)
+    
+    # 5. generate: write synthetic data
+    generate_parser = commands.add_parser('generate', help="write a synthetic Book_Details file")
+    generate_parser.add_argument('--output', default="Book_Details_synthetic.csv")
+    generate_parser.add_argument('--scale', type=float, default=1.0, help="1 is the size of the original dataset")
+    generate_parser.add_argument('--chunksize', type=int, default=100000)
+    generate_parser.add_argument('--seed', type=int, default=0)
+    generate_parser.add_argument('--malformed-rate', type=float, default=0.0)
+    generate_parser.set_defaults(handler=run_generate)
+    
+    # 6. benchmark: time and memory-profile the pipeline and the queries
+    benchmark_parser = commands.add_parser('benchmark', help="benchmark the pipeline on synthetic data")
+    benchmark_parser.add_argument('--scales', type=float, nargs='+', default=[0.1, 1.0])
+    benchmark_parser.add_argument('--results', default="benchmarks/results.csv")
+    benchmark_parser.add_argument('--work-dir', default=None)
+    benchmark_parser.add_argument('--repeats', type=int, default=1)
+    benchmark_parser.add_argument('--no-memory', action='store_true', help="skip the memory profiling")
+    benchmark_parser.add_argument('--baseline', default=None, help="version to compare the results with")
+    benchmark_parser.set_defaults(handler=run_benchmark)
+    
+    # 7. index: build the search index
+    index_parser = commands.add_parser('index', help="build the search index of the books")
+    index_parser.add_argument('--input', default="Book_Details.csv")
+    index_parser.add_argument('--cache-dir', default="Data/cache")
+    index_parser.add_argument('--index-dir', default="Data/search_index")
+    index_parser.set_defaults(handler=run_index)
+    
+    # 8. search: query the search index
+    search_parser = commands.add_parser('search', help="search the books by title and details")
+    search_parser.add_argument('query')
+    search_parser.add_argument('--index-dir', default="Data/search_index")
+    search_parser.add_argument('--limit', type=int, default=10)
+    search_parser.add_argument('--prefix', action='store_true', help="the last word may be unfinished")
+    search_parser.add_argument('--autocomplete', action='store_true', help="complete a book title")
+    search_parser.add_argument('--author', default=None)
+    search_parser.add_argument('--format', default=None)
+    search_parser.add_argument('--genre', default=None)
+    search_parser.add_argument('--min-rating', type=float, default=None)
+    search_parser.add_argument('--max-rating', type=float, default=None)
+    search_parser.add_argument('--min-ratings', type=int, default=None)
+    search_parser.set_defaults(handler=run_search)
+    
+    # 9. recommend: similar books and best books of some genres
+    recommend_parser = commands.add_parser('recommend', help="recommend books similar to a book or in some genres")
+    recommend_parser.add_argument('--book-id', type=int, default=None)
+    recommend_parser.add_argument('--genres', nargs='+', default=None)
+    recommend_parser.add_argument('--input', default="Book_Details.csv")
+    recommend_parser.add_argument('--cache-dir', default="Data/cache")
+    recommend_parser.add_argument('-k', type=int, default=10, help="number of books to return")
+    recommend_parser.add_argument('--min-ratings', type=int, default=None)
+    recommend_parser.add_argument('--exact', action='store_true', help="score every book instead of the closest clusters")
+    recommend_parser.set_defaults(handler=run_recommend)
+    
+    # 10. export: write the Tableau extracts
+    export_parser = commands.add_parser('export', help="write the extracts used by Tableau")
+    export_parser.add_argument('--output-dir', default="DataFrames used for Tableau")
+    export_parser.add_argument('--workers', type=int, default=8)
+    export_parser.add_argument('--use-summaries', action='store_true')
+    export_parser.add_argument('--compression', default='zstd', help="Parquet compression codec")
+    export_parser.add_argument('--csv', action='store_true', help="also write compressed CSV files")
+    export_parser.add_argument('--csv-compression', default='gzip', help="'none' for plain CSV files")
+    export_parser.add_argument('--force', action='store_true', help="rewrite the extracts that did not change")
+    export_parser.add_argument('--backend', choices=['server', 'embedded'], default=None,
+                               help="database to query, defaults to DB_BACKEND or 'server'")
+    export_parser.add_argument('--data-dir', default="Data/tables", help="tables of the embedded backend")
+    export_parser.set_defaults(handler=run_export)
+    
+    # 11. sketch: approximate analytics in one pass over the source file
+    sketch_parser = commands.add_parser('sketch', help="approximate top-K, distinct counts and quantiles")
+    sketch_parser.add_argument('--input', default="Book_Details.csv")
+    sketch_parser.add_argument('--chunksize', type=int, default=50000)
+    sketch_parser.add_argument('--workers', type=int, default=None)
+    sketch_parser.add_argument('--epsilon', type=float, default=0.001, help="error of the counts, share of the total")
+    sketch_parser.add_argument('--distinct-error', type=float, default=0.01, help="relative error of the distinct authors")
+    sketch_parser.add_argument('--relative-accuracy', type=float, default=0.01, help="relative error of the quantiles")
+    sketch_parser.set_defaults(handler=run_sketch)
+    
+    return parser
+
+
+def main(argv=None):
+    """
+    This function runs the command given on the command line, then writes the metrics of 
+    the run (see goodreads.metrics) when requested, even if the command failed.
+    
+    Args:
+    argv (list): The command-line arguments. Defaults to sys.argv.
+    
+    Returns:
+    exit_code (int): 0 when the command succeeded.
+    """
+    
+    from goodreads.metrics import METRICS
+    
+    args = build_parser().parse_args(argv)
+    METRICS.profile_memory = args.profile_memory
+    try:
+        args.handler(args)
+    finally:
+        if args.metrics_json:
+            METRICS.write_json(args.metrics_json)
+        if args.metrics_prom:
+            METRICS.write_prometheus(args.metrics_prom)
+    
+    return 0
@@ -0,0 +1,1279 @@
+"""
+Database part of the Goodreads analysis: the engine, the schema, bulk and incremental 
+loading, the query cache, the summary tables and the queries behind every chart.
+"""
+
+import pandas as pd
+import os
+import re
+import time
+from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy import bindparam
+from sqlalchemy import inspect
+from sqlalchemy import MetaData, Table, Column, Integer, String, Text, Numeric, ForeignKey
+from sqlalchemy.pool import StaticPool
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+import hashlib
+import json
+import shutil
+import warnings
+from collections import OrderedDict
+
+from goodreads.etl import STAR_COLUMNS, TABLE_NAMES, build_incremental_delta, save_etl_state
+from goodreads.metrics import METRICS, instrument_stage, instrument_engine
+from goodreads.aggregators import RunningCorrelation, TopK
+
+
+def create_db_engine(backend=None, tables=None, data_dir="Data/tables", **engine_options):
+    """
+    This function retrieves the database connection string from an environment variable 
+    (or the .env file) and creates a SQLAlchemy engine for connecting to the database. 
+    With the embedded backend no server is needed: the tables are registered in an 
+    in-process SQLite database instead (see create_embedded_engine). 
+    The latency of every statement it executes is recorded in METRICS.
+
+    Args:
+    backend (str): 'server' to connect to DB_CONNECTION_STRING, 'embedded' for the 
+    in-process database. Defaults to the DB_BACKEND environment variable, else 'server'.
+    tables (dict): Embedded backend only, the tables to register (see create_embedded_engine).
+    data_dir (str): Embedded backend only, where the table CSV files are read from.
+    **engine_options: Extra arguments of create_engine, such as pool_size (server backend only: 
+    the embedded backend ignores them with a warning).
+
+    Returns:
+    engine (Engine): A SQLAlchemy engine connected to the database.
+    """
+    
+    # python-dotenv is only needed when an engine is created
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    backend = backend or os.getenv("DB_BACKEND", "server")
+    if backend == 'embedded':
+        if engine_options:
+            warnings.warn(f"The embedded backend shares a single connection and ignores {sorted(engine_options)}", 
+                          stacklevel=2)
+        return create_embedded_engine(tables=tables, data_dir=data_dir)
+    if backend != 'server':
+        raise ValueError(f"Unknown database backend: {backend!r} (expected 'server' or 'embedded')")
+
+    # Retrieve the connection string from environment variables
+    connection_string = os.getenv("DB_CONNECTION_STRING")
+    
+    # Create a SQLAlchemy engine
+    engine = create_engine(connection_string, **engine_options)
+    instrument_engine(engine)
+    
+    return engine
+
+# Engines shared by the whole process, keyed by their settings (see get_engine)
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(backend=None, data_dir="Data/tables", pool_size=None, pool_recycle=None, pool_pre_ping=None, 
+               **engine_options):
+    """
+    This function returns the engine of the process for a database, creating it with 
+    create_db_engine on the first call only. Later calls with the same settings return the 
+    same engine, so repeated analytics calls (e.g. from API workers) reuse its pool of open 
+    connections and its cache of compiled statements instead of reconnecting. The pool 
+    settings default to the DB_POOL_SIZE, DB_POOL_RECYCLE and DB_POOL_PRE_PING environment 
+    variables (or the .env file). The embedded backend has no pool: its pool settings are 
+    ignored with a warning when given explicitly, and the environment defaults are not used.
+
+    Args:
+    backend (str): 'server' or 'embedded', see create_db_engine.
+    data_dir (str): Embedded backend only, where the table CSV files are read from.
+    pool_size (int): Number of connections kept open. Defaults to DB_POOL_SIZE, else 5.
+    pool_recycle (int): Seconds after which a connection is replaced, so the server never 
+    closes it first (MySQL wait_timeout). Defaults to DB_POOL_RECYCLE, else 3600.
+    pool_pre_ping (bool): Whether to test a connection before handing it out, replacing 
+    the ones the server dropped. Defaults to DB_POOL_PRE_PING, else True.
+    **engine_options: Extra arguments of create_engine, such as max_overflow.
+
+    Returns:
+    engine (Engine): The shared SQLAlchemy engine.
+    """
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    backend = backend or os.getenv("DB_BACKEND", "server")
+    pool_options = {'pool_size': pool_size, 'pool_recycle': pool_recycle, 'pool_pre_ping': pool_pre_ping}
+    if backend == 'embedded':
+        # Only the settings given explicitly are passed on, for create_db_engine to warn about
+        engine_options.update({name: value for name, value in pool_options.items() if value is not None})
+        key = (backend, os.path.abspath(data_dir))
+    else:
+        if pool_size is None:
+            pool_options['pool_size'] = int(os.getenv("DB_POOL_SIZE", "5"))
+        if pool_recycle is None:
+            pool_options['pool_recycle'] = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+        if pool_pre_ping is None:
+            pool_options['pool_pre_ping'] = os.getenv("DB_POOL_PRE_PING", "1").lower() not in ('0', 'false', 'no')
+        engine_options.update(pool_options)
+        key = (backend, os.getenv("DB_CONNECTION_STRING"), tuple(sorted(engine_options.items())))
+    with _ENGINES_LOCK:
+        if key not in _ENGINES:
+            _ENGINES[key] = create_db_engine(backend=backend, data_dir=data_dir, **engine_options)
+        return _ENGINES[key]
+
+
+def get_worker_engine(max_workers, backend=None, data_dir="Data/tables"):
+    """
+    This function returns the shared engine (see get_engine) for max_workers threads running 
+    queries at once. With the server backend its pool holds max_workers connections and never 
+    opens more; the embedded backend shares a single connection and takes no pool settings.
+
+    Args:
+    max_workers (int): Number of threads using the engine at the same time.
+    backend (str): 'server' or 'embedded'. Defaults to DB_BACKEND, else 'server'.
+    data_dir (str): Embedded backend only, where the table CSV files are read from.
+
+    Returns:
+    engine (Engine): The shared SQLAlchemy engine.
+    """
+    
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    backend = backend or os.getenv("DB_BACKEND", "server")
+    if backend == 'embedded':
+        return get_engine(backend=backend, data_dir=data_dir)
+    
+    return get_engine(backend=backend, data_dir=data_dir, pool_size=max_workers, max_overflow=0)
+
+
+def dispose_engines():
+    """
+    This function closes the connections of every engine returned by get_engine and forgets 
+    the engines. It should be called in a worker process right after it is forked, since 
+    connections cannot be shared between processes.
+
+    Returns:
+    None
+    """
+    
+    with _ENGINES_LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose(close=False)
+        _ENGINES.clear()
+
+# The schema of SQL/Creating_books_db.sql, usable with any database SQLAlchemy supports
+BOOKS_METADATA = MetaData()
+
+Table('Authors', BOOKS_METADATA,
+      Column('author_id', Integer, primary_key=True),
+      Column('author', String(255), nullable=False),
+      Column('authorlink', String(255)))
+
+Table('Formats', BOOKS_METADATA,
+      Column('format_id', Integer, primary_key=True),
+      Column('num_pages', Integer, nullable=False),
+      Column('book_format', String(255), nullable=False))
+
+Table('Genres', BOOKS_METADATA,
+      Column('genre_id', Integer, primary_key=True),
+      Column('genre', String(255), nullable=False))
+
+Table('Books', BOOKS_METADATA,
+      Column('book_id', Integer, primary_key=True),
+      Column('book_title', String(255), nullable=False),
+      Column('book_details', Text),
+      Column('publication_info', String(255)),
+      Column('num_ratings', Integer),
+      Column('num_reviews', Integer),
+      Column('average_rating', Numeric(3, 2, asdecimal=False)),
+      Column('author_id', Integer, ForeignKey('Authors.author_id')),
+      Column('format_id', Integer, ForeignKey('Formats.format_id')))
+
+Table('Book_Genres', BOOKS_METADATA,
+      Column('book_id', Integer, ForeignKey('Books.book_id'), primary_key=True),
+      Column('genre_id', Integer, ForeignKey('Genres.genre_id'), primary_key=True))
+
+Table('Ratings', BOOKS_METADATA,
+      Column('book_id', Integer, ForeignKey('Books.book_id'), primary_key=True),
+      *[Column(column, Integer) for column in STAR_COLUMNS])
+
+# Groups of tables that only depend on the groups before them
+LOAD_ORDER = [['Authors', 'Formats', 'Genres'], ['Books'], ['Book_Genres', 'Ratings']]
+
+
+def create_schema(engine):
+    """
+    This function creates the tables of the Books database (see SQL/Creating_books_db.sql) 
+    in the database of the engine, skipping the ones that already exist. It is mostly 
+    useful to set up a SQLite or local MySQL stand-in.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+
+    Returns:
+    None
+    """
+    
+    BOOKS_METADATA.create_all(engine)
+
+
+def dataframe_to_records(table_df):
+    # Rows as dictionaries of Python values, with NaN converted to None (NULL)
+    return table_df.astype(object).where(table_df.notna(), None).to_dict('records')
+
+
+def insert_rows(connection, table_name, table_df, batch_size=10000):
+    """
+    This function inserts rows into a table of the schema with batched multi-row inserts, 
+    on a connection opened by the caller (so several tables can share one transaction). 
+    NaN values are inserted as NULL and columns that are not in the table are ignored.
+
+    Args:
+    connection (Connection): An open connection to the database.
+    table_name (str): The name of the table in the database.
+    table_df (DataFrame): The rows to insert.
+    batch_size (int): Number of rows sent per insert statement.
+
+    Returns:
+    None
+    """
+    
+    table = BOOKS_METADATA.tables[table_name]
+    columns = [column for column in table.columns.keys() if column in table_df.columns]
+    for batch_start in range(0, len(table_df), batch_size):
+        batch = table_df[columns].iloc[batch_start:batch_start + batch_size]
+        connection.execute(table.insert(), dataframe_to_records(batch))
+
+
+@instrument_stage
+def load_table(engine, table_name, table_df, batch_size=10000, use_load_data=False):
+    """
+    This function writes one table into the database inside a single transaction, so 
+    the table is either fully loaded or not loaded at all. Rows are sent with batched 
+    multi-row inserts, or with LOAD DATA LOCAL INFILE on MySQL when use_load_data is True 
+    (the connection must allow local_infile).
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    table_name (str): The name of the table in the database.
+    table_df (DataFrame): The rows to load. Columns that are not in the table are ignored.
+    batch_size (int): Number of rows sent per insert statement.
+    use_load_data (bool): Whether to use LOAD DATA LOCAL INFILE when the database is MySQL.
+
+    Returns:
+    stats (dict): The table name, the loading method, the number of rows, the seconds 
+    it took and the rows per second.
+    """
+    
+    table = BOOKS_METADATA.tables[table_name]
+    columns = [column for column in table.columns.keys() if column in table_df.columns]
+    table_df = table_df[columns]
+    method = 'load_data' if use_load_data and engine.dialect.name == 'mysql' else 'insert'
+    
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        if method == 'load_data':
+            # Write the rows to a temporary CSV file and let the server read it
+            with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as csv_file:
+                table_df.to_csv(csv_file, index=False, header=False, na_rep='NULL', lineterminator='\n')
+            try:
+                column_list = ', '.join(f'`{column}`' for column in columns)
+                connection.execute(text(f"""LOAD DATA LOCAL INFILE :path INTO TABLE `{table_name}`
+                                            CHARACTER SET utf8mb4
+                                            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                                            LINES TERMINATED BY '\\n'
+                                            ({column_list})"""), {'path': csv_file.name})
+            finally:
+                os.remove(csv_file.name)
+        else:
+            # Send the rows in batches of multi-row inserts, with NaN converted to NULL
+            insert_rows(connection, table_name, table_df, batch_size)
+    seconds = time.perf_counter() - start
+    
+    return {
+        'table': table_name,
+        'method': method,
+        'rows': len(table_df),
+        'seconds': seconds,
+        'rows_per_sec': len(table_df) / seconds if seconds > 0 else float('nan'),
+    }
+
+
+@instrument_stage
+def bulk_load_tables(engine, tables, batch_size=10000, max_workers=3, use_load_data=False, cache=None):
+    """
+    This function loads the six tables into the database in foreign-key order: first 
+    Authors, Formats and Genres, then Books, then Book_Genres and Ratings. Tables of the 
+    same group do not depend on each other and are loaded in parallel threads, each one 
+    in its own transaction (SQLite databases are always loaded one table at a time).
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    tables (dict): The tables keyed by table name, as returned by build_tables.
+    batch_size (int): Number of rows sent per insert statement.
+    max_workers (int): Maximum number of tables loaded at the same time.
+    use_load_data (bool): Whether to use LOAD DATA LOCAL INFILE when the database is MySQL.
+    cache (QueryCache): Optional query cache to invalidate once the tables are loaded.
+
+    Returns:
+    report (DataFrame): The loading method, rows, seconds and rows per second of each table.
+    """
+    
+    if engine.dialect.name == 'sqlite':
+        max_workers = 1
+    
+    report = []
+    for group in LOAD_ORDER:
+        group = [table_name for table_name in group if table_name in tables]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(load_table, engine, table_name, tables[table_name], 
+                                       batch_size, use_load_data)
+                       for table_name in group]
+            report.extend(future.result() for future in futures)
+    
+    # Cached analytics results are stale once the data changed
+    if cache is not None:
+        cache.invalidate(get_data_version(engine))
+    
+    return pd.DataFrame(report)
+
+
+class QueryCache:
+    """
+    This class caches the results of analytics queries as DataFrames. Results are keyed on 
+    the SQL text, its parameters and a data-version token, kept in memory with LRU eviction 
+    and optionally written to disk as Parquet files (requires pyarrow), so a new session can 
+    reuse them. Changing the data version (see invalidate) makes every older result unreachable.
+
+    Args:
+    max_entries (int): Maximum number of results kept in memory.
+    cache_dir (str): Optional directory where results are also stored as Parquet files.
+    data_version (str): Token identifying the current state of the data, e.g. the result 
+    of get_data_version or a load timestamp.
+    """
+    
+    def __init__(self, max_entries=64, cache_dir=None, data_version=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.data_version = data_version
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    def make_key(self, query, params=None):
+        # Hash of the SQL text, the sorted parameters and the data version
+        payload = json.dumps([str(query), sorted((params or {}).items()), self.data_version], default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        
+        # Fall back to the disk copy, and keep it in memory for the next time
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            result_df = pd.read_parquet(self._path(key))
+            self._remember(key, result_df)
+            with self._lock:
+                self.hits += 1
+            return result_df
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key, result_df):
+        self._remember(key, result_df)
+        if self.cache_dir is not None:
+            # Written next to its final path and renamed, so a reader never sees a partial file
+            temporary_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            result_df.to_parquet(temporary_path, index=False)
+            os.replace(temporary_path, self._path(key))
+    
+    def invalidate(self, data_version=None):
+        """
+        This method drops every cached result, in memory and on disk. It should be called 
+        after the tables are reloaded, with the new data version if there is one.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.data_version = data_version
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def stats(self):
+        # Hit/miss counters to see how many queries the cache saved
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+    
+    def _remember(self, key, result_df):
+        with self._lock:
+            self._entries[key] = result_df
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+
+def get_data_version(engine):
+    """
+    This function computes a data-version token for QueryCache from the content of the six 
+    tables and of the summary tables, so it changes whenever a row is added, removed or 
+    updated in place. MySQL computes it with CHECKSUM TABLE; on other databases the rows of 
+    every table are read in key order and hashed (pandas.util.hash_pandas_object).
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+
+    Returns:
+    data_version (str): A short hash identifying the current content of the database.
+    """
+    
+    digest = hashlib.sha256()
+    table_names = TABLE_NAMES + list(SUMMARY_TABLES)
+    with engine.connect() as connection:
+        if engine.dialect.name == 'mysql':
+            # One live checksum per table (NULL for a missing table), in a single statement
+            rows = connection.execute(text(f"CHECKSUM TABLE {', '.join(table_names)}")).fetchall()
+            digest.update(str([tuple(row) for row in rows]).encode('utf-8'))
+        else:
+            existing = set(inspect(connection).get_table_names())
+            for table_name in table_names:
+                if table_name not in existing:
+                    continue
+                keys = ', '.join(column.name for column in BOOKS_METADATA.tables[table_name].primary_key.columns)
+                digest.update(table_name.encode('utf-8'))
+                for chunk_df in pd.read_sql(text(f'SELECT * FROM {table_name} ORDER BY {keys}'), connection, 
+                                            chunksize=100000):
+                    digest.update(pd.util.hash_pandas_object(chunk_df, index=False).to_numpy().tobytes())
+    
+    return digest.hexdigest()[:16]
+
+
+def run_query(engine, query, params=None, cache=None):
+    """
+    This function executes an analytics query and returns its result as a DataFrame. When a 
+    QueryCache is given, the result is served from the cache if the same query already ran 
+    with the same parameters and data version.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    query (TextClause): The SQL query to execute.
+    params (dict): Optional values of the query parameters.
+    cache (QueryCache): Optional cache of query results.
+
+    Returns:
+    result_df (DataFrame): The rows returned by the query.
+    """
+    
+    if cache is not None:
+        key = cache.make_key(query, params)
+        cached_df = cache.get(key)
+        if cached_df is not None:
+            METRICS.increment('query_cache_hits')
+            # Return a copy so callers can modify it without changing the cache
+            return cached_df.copy()
+    
+    with engine.connect() as connection:
+        result = connection.execute(query, params or {})
+        result_df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    METRICS.record_fetch(len(result_df), int(result_df.memory_usage(deep=True).sum()))
+    
+    if cache is not None:
+        cache.put(key, result_df.copy())
+    
+    return result_df
+
+
+def stream_query(engine, query, params=None, batch_size=10000):
+    """
+    This function executes a query with a server-side cursor and yields its result in 
+    DataFrames of at most batch_size rows, so results of any size are processed with the 
+    memory of one batch (see goodreads.aggregators). The connection stays open until the 
+    generator is exhausted or closed.
+    
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    query (TextClause): The SQL query to execute.
+    params (dict): Optional values of the query parameters.
+    batch_size (int): Maximum number of rows per batch.
+    
+    Yields:
+    batch_df (DataFrame): The next rows returned by the query.
+    """
+    
+    rows = 0
+    num_bytes = 0
+    with engine.connect() as connection:
+        # stream_results asks the driver for an unbuffered cursor (e.g. SSCursor on MySQL)
+        connection = connection.execution_options(stream_results=True, yield_per=batch_size)
+        result = connection.execute(query, params or {})
+        columns = list(result.keys())
+        try:
+            for partition in result.partitions(batch_size):
+                batch_df = pd.DataFrame(partition, columns=columns)
+                rows += len(batch_df)
+                num_bytes += int(batch_df.memory_usage(deep=True).sum())
+                yield batch_df
+        finally:
+            result.close()
+            METRICS.record_fetch(rows, num_bytes)
+
+
+# Default file of the named analytics statements, and the line starting each statement
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SQL', 'Queries.sql')
+QUERY_NAME_PATTERN = re.compile(r'^--\s*name:\s*(?P<name>\w+)\s*$')
+
+
+def parse_named_queries(sql):
+    """
+    This function splits a SQL file into named statements. Every statement starts with a 
+    "-- name: <name>" line and ends before the next one; the other comment lines and the 
+    blank lines are left out.
+
+    Args:
+    sql (str): The content of the SQL file.
+
+    Returns:
+    queries (dict): The SQL text of every statement, keyed by name, in the order of the file.
+    """
+    
+    queries = {}
+    name = None
+    for line in sql.splitlines():
+        match = QUERY_NAME_PATTERN.match(line.strip())
+        if match:
+            name = match.group('name')
+            if name in queries:
+                raise ValueError(f"Query {name!r} is defined twice")
+            queries[name] = []
+        elif name is not None and line.strip() and not line.strip().startswith('--'):
+            queries[name].append(line.rstrip())
+    
+    return {name: '\n'.join(lines) for name, lines in queries.items()}
+
+
+class QueryRegistry:
+    """
+    This class holds the named analytics statements of a SQL file (SQL/Queries.sql by 
+    default). The file is read the first time a statement is needed and every statement is 
+    built once as a parameterized TextClause, so each call only binds its thresholds and 
+    SQLAlchemy finds the compiled form of the statement in the cache of the engine.
+
+    Args:
+    path (str): Path of the SQL file, see parse_named_queries for its format.
+    """
+    
+    def __init__(self, path=QUERIES_PATH):
+        self.path = path
+        self._queries = None
+        self._lock = threading.Lock()
+    
+    def load(self):
+        # Read and build the statements, once
+        with self._lock:
+            if self._queries is None:
+                with open(self.path, encoding='utf-8') as sql_file:
+                    queries = parse_named_queries(sql_file.read())
+                self._queries = {name: text(sql) for name, sql in queries.items()}
+            return self._queries
+    
+    def names(self):
+        return list(self.load())
+    
+    def __contains__(self, name):
+        return name in self.load()
+    
+    def __getitem__(self, name):
+        queries = self.load()
+        if name not in queries:
+            raise KeyError(f"No query named {name!r} in {self.path}")
+        return queries[name]
+    
+    def run(self, engine, name, params=None, cache=None):
+        # Execute a named statement with run_query
+        return run_query(engine, self[name], params, cache=cache)
+
+
+# The statements of SQL/Queries.sql, used by the get_* functions
+QUERIES = QueryRegistry()
+
+# Largest LIMIT accepted by both MySQL and SQLite, bound when every row is wanted (limit=None)
+ALL_ROWS = 2 ** 63 - 1
+
+# Summary tables kept up to date from the Books table. They store sums and counts so 
+# averages stay exact when books are added or removed.
+SUMMARY_TABLES = {
+    'Author_Summary': 'author_id',
+    'Genre_Summary': 'genre_id',
+    'Format_Summary': 'book_format',
+    'Page_Summary': 'num_pages',
+}
+
+Table('Author_Summary', BOOKS_METADATA,
+      Column('author_id', Integer, ForeignKey('Authors.author_id'), primary_key=True),
+      Column('book_count', Integer, nullable=False),
+      Column('rated_count', Integer, nullable=False),
+      Column('rating_sum', Numeric(15, 2, asdecimal=False), nullable=False))
+
+Table('Genre_Summary', BOOKS_METADATA,
+      Column('genre_id', Integer, ForeignKey('Genres.genre_id'), primary_key=True),
+      Column('book_count', Integer, nullable=False),
+      Column('rated_count', Integer, nullable=False),
+      Column('rating_sum', Numeric(15, 2, asdecimal=False), nullable=False),
+      Column('review_sum', Numeric(20, 0, asdecimal=False), nullable=False))
+
+Table('Format_Summary', BOOKS_METADATA,
+      Column('book_format', String(255), primary_key=True),
+      Column('format_count', Integer, nullable=False),
+      Column('book_count', Integer, nullable=False),
+      Column('rated_count', Integer, nullable=False),
+      Column('rating_sum', Numeric(15, 2, asdecimal=False), nullable=False))
+
+Table('Page_Summary', BOOKS_METADATA,
+      Column('num_pages', Integer, primary_key=True),
+      Column('book_count', Integer, nullable=False),
+      Column('rated_count', Integer, nullable=False),
+      Column('rating_sum', Numeric(15, 2, asdecimal=False), nullable=False))
+
+# Full rebuild of each summary table from the base tables
+SUMMARY_REFRESH_QUERIES = {
+    'Author_Summary': '''INSERT INTO Author_Summary (author_id, book_count, rated_count, rating_sum)
+                         SELECT author_id, COUNT(*), COUNT(average_rating), COALESCE(SUM(average_rating), 0)
+                         FROM Books
+                         WHERE author_id IS NOT NULL
+                         GROUP BY author_id''',
+    'Genre_Summary': '''INSERT INTO Genre_Summary (genre_id, book_count, rated_count, rating_sum, review_sum)
+                        SELECT genre_id, COUNT(*), COUNT(average_rating), COALESCE(SUM(average_rating), 0), 
+                               COALESCE(SUM(num_reviews), 0)
+                        FROM Book_Genres
+                        JOIN Books ON Books.book_id = Book_Genres.book_id
+                        GROUP BY genre_id''',
+    'Format_Summary': '''INSERT INTO Format_Summary (book_format, format_count, book_count, rated_count, rating_sum)
+                         SELECT f.book_format, f.format_count, COALESCE(b.book_count, 0), 
+                                COALESCE(b.rated_count, 0), COALESCE(b.rating_sum, 0)
+                         FROM (SELECT book_format, COUNT(*) AS format_count 
+                               FROM Formats GROUP BY book_format) f
+                         LEFT JOIN (SELECT book_format, COUNT(*) AS book_count, COUNT(average_rating) AS rated_count, 
+                                           SUM(average_rating) AS rating_sum
+                                    FROM Books JOIN Formats ON Books.format_id = Formats.format_id
+                                    GROUP BY book_format) b ON f.book_format = b.book_format''',
+    'Page_Summary': '''INSERT INTO Page_Summary (num_pages, book_count, rated_count, rating_sum)
+                       SELECT num_pages, COUNT(*), COUNT(average_rating), COALESCE(SUM(average_rating), 0)
+                       FROM Books
+                       JOIN Formats ON Books.format_id = Formats.format_id
+                       GROUP BY num_pages''',
+}
+
+
+@instrument_stage
+def refresh_summary_tables(engine, cache=None):
+    """
+    This function rebuilds the four summary tables (Author_Summary, Genre_Summary, 
+    Format_Summary and Page_Summary) from the base tables, each one in its own transaction. 
+    It is meant for the first build or after a full reload; day-to-day changes should go 
+    through update_summary_tables.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional query cache to invalidate once the summaries are rebuilt.
+
+    Returns:
+    None
+    """
+    
+    for table_name, query in SUMMARY_REFRESH_QUERIES.items():
+        with engine.begin() as connection:
+            connection.execute(text(f'DELETE FROM {table_name}'))
+            connection.execute(text(query))
+    
+    if cache is not None:
+        cache.invalidate(get_data_version(engine))
+
+
+def summarize_books(books_df, book_genres_df, formats_df, format_rows_df=None):
+    """
+    This function computes the contribution of a set of books to each summary table: the 
+    number of books, of rated books and the sum of ratings (and of reviews for genres) 
+    per author, genre, book format and number of pages.
+
+    Args:
+    books_df (DataFrame): Rows of the Books table.
+    book_genres_df (DataFrame): Rows of the Book_Genres table of those books.
+    formats_df (DataFrame): The Formats table, used to look up the format of each book.
+    format_rows_df (DataFrame): Optional rows of the Formats table to count in Format_Summary.
+
+    Returns:
+    summaries (dict): One DataFrame per summary table, keyed by table name.
+    """
+    
+    books_df = books_df[['book_id', 'author_id', 'format_id', 'average_rating', 'num_reviews']].copy()
+    books_df['average_rating'] = pd.to_numeric(books_df['average_rating'])
+    books_df['num_reviews'] = pd.to_numeric(books_df['num_reviews']).fillna(0)
+    aggregations = {
+        'book_count': ('book_id', 'size'),
+        'rated_count': ('average_rating', 'count'),
+        'rating_sum': ('average_rating', 'sum'),
+    }
+    
+    author_summary = books_df.dropna(subset=['author_id']).groupby('author_id', as_index=False).agg(**aggregations)
+    
+    book_genres = book_genres_df[['book_id', 'genre_id']].merge(books_df, on='book_id')
+    genre_summary = book_genres.groupby('genre_id', as_index=False).agg(
+        review_sum=('num_reviews', 'sum'), **aggregations)
+    
+    book_formats = books_df.merge(formats_df[['format_id', 'num_pages', 'book_format']], on='format_id')
+    format_summary = book_formats.groupby('book_format', as_index=False).agg(**aggregations)
+    page_summary = book_formats.groupby('num_pages', as_index=False).agg(**aggregations)
+    
+    # Format_Summary also counts the rows of the Formats table
+    if format_rows_df is not None:
+        format_counts = format_rows_df.groupby('book_format').size().rename('format_count').reset_index()
+    else:
+        format_counts = pd.DataFrame({'book_format': pd.Series(dtype=object), 'format_count': pd.Series(dtype='int64')})
+    format_summary = format_summary.merge(format_counts, on='book_format', how='outer').fillna(0)
+    
+    return {
+        'Author_Summary': author_summary,
+        'Genre_Summary': genre_summary,
+        'Format_Summary': format_summary,
+        'Page_Summary': page_summary,
+    }
+
+
+def apply_summary_delta(connection, table_name, delta_df):
+    """
+    This function adds a delta (new values minus old values) to a summary table: existing 
+    keys are updated in place, new keys are inserted and keys left without any book or 
+    format are removed.
+
+    Args:
+    connection (Connection): An open connection, inside a transaction.
+    table_name (str): The name of the summary table.
+    delta_df (DataFrame): The key column and the change of each value column.
+
+    Returns:
+    None
+    """
+    
+    key = SUMMARY_TABLES[table_name]
+    value_columns = [column for column in delta_df.columns if column != key]
+    if delta_df.empty:
+        return
+    
+    # Find which keys already have a row in the summary table
+    existing_keys = set()
+    keys = delta_df[key].tolist()
+    select_keys = text(f'SELECT {key} FROM {table_name} WHERE {key} IN :keys').bindparams(
+        bindparam('keys', expanding=True))
+    for batch_start in range(0, len(keys), 1000):
+        result = connection.execute(select_keys, {'keys': keys[batch_start:batch_start + 1000]})
+        existing_keys.update(row[0] for row in result)
+    
+    # Update the existing rows and insert the new ones
+    is_existing = delta_df[key].isin(existing_keys)
+    if is_existing.any():
+        assignments = ', '.join(f'{column} = {column} + :{column}' for column in value_columns)
+        connection.execute(text(f'UPDATE {table_name} SET {assignments} WHERE {key} = :{key}'), 
+                           dataframe_to_records(delta_df[is_existing]))
+    if (~is_existing).any():
+        connection.execute(BOOKS_METADATA.tables[table_name].insert(), 
+                           dataframe_to_records(delta_df[~is_existing]))
+    
+    # Remove keys that no longer have any book (or format)
+    empty_condition = 'book_count <= 0 AND format_count <= 0' if table_name == 'Format_Summary' else 'book_count <= 0'
+    connection.execute(text(f'DELETE FROM {table_name} WHERE {empty_condition}'))
+
+
+def apply_summary_changes(connection, added=None, removed=None):
+    """
+    This function applies to the summary tables the changes due to the books that were 
+    added and removed, on an open connection, so the summaries can be updated in the same 
+    transaction as the base tables. A changed book is passed once in removed (old values) 
+    and once in added (new values).
+
+    Args:
+    connection (Connection): An open connection, inside a transaction.
+    added (dict): The new rows, keyed by table name ('Books', 'Book_Genres' and optionally 
+    'Formats' for new formats).
+    removed (dict): The removed rows, keyed by table name ('Books', 'Book_Genres' and 
+    optionally 'Formats' for removed formats).
+
+    Returns:
+    None
+    """
+    
+    added = added or {}
+    removed = removed or {}
+    empty_books = pd.DataFrame(columns=['book_id', 'author_id', 'format_id', 'average_rating', 'num_reviews'])
+    empty_book_genres = pd.DataFrame(columns=['book_id', 'genre_id'])
+    
+    # Look up the page count and format of the books in the Formats table (removed formats included)
+    result = connection.execute(text('SELECT format_id, num_pages, book_format FROM Formats'))
+    formats_df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    changed_formats = [rows['Formats'][['format_id', 'num_pages', 'book_format']] 
+                       for rows in [removed, added] if 'Formats' in rows]
+    formats_df = pd.concat([formats_df, *changed_formats]).drop_duplicates(subset=['format_id'], keep='last')
+    
+    # Format_Summary counts the added Formats rows and discounts the removed ones
+    added_summaries = summarize_books(added.get('Books', empty_books), added.get('Book_Genres', empty_book_genres), 
+                                      formats_df, added.get('Formats'))
+    removed_summaries = summarize_books(removed.get('Books', empty_books), removed.get('Book_Genres', empty_book_genres), 
+                                        formats_df, removed.get('Formats'))
+    
+    for table_name, key in SUMMARY_TABLES.items():
+        # Delta = contribution of the added rows minus contribution of the removed rows
+        delta_df = added_summaries[table_name].set_index(key).sub(
+            removed_summaries[table_name].set_index(key), fill_value=0).reset_index()
+        value_columns = [column for column in delta_df.columns if column != key]
+        delta_df = delta_df[(delta_df[value_columns] != 0).any(axis=1)]
+        for column in value_columns:
+            if column != 'rating_sum':
+                delta_df[column] = delta_df[column].astype('int64')
+        apply_summary_delta(connection, table_name, delta_df)
+
+
+@instrument_stage
+def update_summary_tables(engine, added=None, removed=None, cache=None):
+    """
+    This function updates the summary tables incrementally from the books that were added 
+    and removed, instead of rescanning the whole Books table (see apply_summary_changes). 
+    All the summaries are updated in a single transaction.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    added (dict): The new rows, keyed by table name ('Books', 'Book_Genres' and optionally 
+    'Formats' for new formats).
+    removed (dict): The removed rows, keyed by table name ('Books', 'Book_Genres' and 
+    optionally 'Formats' for removed formats).
+    cache (QueryCache): Optional query cache to invalidate once the summaries are updated.
+
+    Returns:
+    None
+    """
+    
+    with engine.begin() as connection:
+        apply_summary_changes(connection, added, removed)
+    
+    if cache is not None:
+        cache.invalidate(get_data_version(engine))
+
+
+# Source file of each table in the data directory, for the ones not named after the table
+DATA_FILES = {'Book_Genres': ['Book_Genres.csv', 'book_genres_df_cleaned.csv']}
+
+# Columns indexed in the embedded database, the join and filter keys of the analytics queries
+EMBEDDED_INDEXES = {
+    'Authors': ['author_id'],
+    'Formats': ['format_id'],
+    'Genres': ['genre_id'],
+    'Books': ['book_id', 'author_id', 'format_id'],
+    'Book_Genres': ['book_id', 'genre_id'],
+    'Ratings': ['book_id'],
+}
+
+
+def read_data_tables(data_dir="Data/tables"):
+    """
+    This function reads the cleaned tables saved as CSV files in data_dir (one file per 
+    table, named after the table, as written by `python -m goodreads etl`). Index columns 
+    saved by pandas and columns that are not part of the schema are dropped. A FileNotFoundError 
+    names the tables whose file is missing.
+
+    Args:
+    data_dir (str): Directory containing the table CSV files.
+
+    Returns:
+    tables (dict): The six tables, keyed by table name.
+    """
+    
+    tables = {}
+    missing = []
+    for table_name in TABLE_NAMES:
+        file_names = DATA_FILES.get(table_name, [f"{table_name}.csv"])
+        for file_name in file_names:
+            path = os.path.join(data_dir, file_name)
+            if os.path.exists(path):
+                table_df = pd.read_csv(path)
+                columns = [column.name for column in BOOKS_METADATA.tables[table_name].columns]
+                tables[table_name] = table_df[[column for column in columns if column in table_df.columns]]
+                break
+        else:
+            missing.append(' or '.join(file_names))
+    
+    if missing:
+        raise FileNotFoundError(f"Missing table files in {data_dir}: {', '.join(missing)} "
+                                f"(write them with `python -m goodreads etl --output-dir {data_dir}`)")
+    
+    return tables
+
+
+def create_embedded_engine(tables=None, data_dir="Data/tables", summaries=True):
+    """
+    This function creates an in-process SQLite database holding the six tables, so the 
+    analytics queries run locally without a database server (e.g. in CI). The tables come 
+    from the given DataFrames or from the CSV files of data_dir, and all six are required, 
+    so the charts are never drawn from an empty table. They are registered as they are, 
+    without the constraints of the schema, and indexed on their keys. Every connection of 
+    the engine shares the same database.
+
+    Args:
+    tables (dict): The tables keyed by table name, as returned by build_tables. Defaults 
+    to the CSV files of data_dir.
+    data_dir (str): Directory containing the table CSV files (see read_data_tables).
+    summaries (bool): Whether to also build the summary tables, for use_summaries=True.
+
+    Returns:
+    engine (Engine): A SQLAlchemy engine connected to the in-memory database.
+    """
+    
+    if tables is None:
+        tables = read_data_tables(data_dir)
+    missing = [table_name for table_name in TABLE_NAMES if table_name not in tables]
+    if missing:
+        raise ValueError(f"Missing tables for the embedded database: {', '.join(missing)}")
+    
+    # A single connection shared by all threads, so they all see the same in-memory database
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={'check_same_thread': False})
+    instrument_engine(engine)
+    
+    with engine.begin() as connection:
+        for table_name in TABLE_NAMES:
+            tables[table_name].to_sql(table_name, connection, index=False)
+            for column in EMBEDDED_INDEXES[table_name]:
+                connection.execute(text(f'CREATE INDEX ix_{table_name}_{column} ON {table_name} ({column})'))
+        # Summary tables without constraints either, so NULL keys of the data are kept as they are
+        for table_name in SUMMARY_TABLES:
+            columns = ', '.join(column.name for column in BOOKS_METADATA.tables[table_name].columns)
+            connection.execute(text(f'CREATE TABLE {table_name} ({columns})'))
+    
+    if summaries:
+        refresh_summary_tables(engine)
+    
+    return engine
+
+
+@instrument_stage
+def apply_delta(engine, delta, batch_size=10000, update_summaries=False, cache=None):
+    """
+    This function applies a delta from build_incremental_delta to the database in a single 
+    transaction: the rows of deleted and changed books are removed, the new rows are 
+    inserted in foreign-key order and the authors whose link changed are updated. Only the 
+    changed rows are touched. The summary tables, when updated, change in the same transaction.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    delta (dict): The delta returned by build_incremental_delta.
+    batch_size (int): Number of rows sent per insert statement.
+    update_summaries (bool): Whether to also update the summary tables incrementally.
+    cache (QueryCache): Optional query cache to invalidate once the delta is applied.
+
+    Returns:
+    None
+    """
+    
+    upserts = delta['upserts']
+    removed_book_ids = delta['deletes']['book_ids'] + delta['deletes']['changed_book_ids']
+    
+    # Old rows of the removed books, to take them out of the summary tables
+    removed = {'Books': [], 'Book_Genres': []}
+    
+    with engine.begin() as connection:
+        for batch_start in range(0, len(removed_book_ids), 1000):
+            book_ids = {'book_ids': removed_book_ids[batch_start:batch_start + 1000]}
+            if update_summaries:
+                for table_name in removed:
+                    select_rows = text(f'SELECT * FROM {table_name} WHERE book_id IN :book_ids').bindparams(
+                        bindparam('book_ids', expanding=True))
+                    result = connection.execute(select_rows, book_ids)
+                    removed[table_name].append(pd.DataFrame(result.fetchall(), columns=list(result.keys())))
+            
+            # Children first, then the books themselves
+            for table_name in ['Ratings', 'Book_Genres', 'Books']:
+                delete_rows = text(f'DELETE FROM {table_name} WHERE book_id IN :book_ids').bindparams(
+                    bindparam('book_ids', expanding=True))
+                connection.execute(delete_rows, book_ids)
+        
+        for group in LOAD_ORDER:
+            for table_name in group:
+                insert_rows(connection, table_name, upserts[table_name], batch_size)
+        
+        # Authors are keyed by name: an existing author only gets its new link
+        updated_authors = delta['updates']['Authors']
+        if not updated_authors.empty:
+            connection.execute(text('UPDATE Authors SET authorlink = :authorlink WHERE author_id = :author_id'), 
+                               dataframe_to_records(updated_authors[['author_id', 'authorlink']]))
+        
+        if update_summaries:
+            removed = {table_name: pd.concat(frames, ignore_index=True) 
+                       for table_name, frames in removed.items() if frames}
+            apply_summary_changes(connection, 
+                                  added={'Books': upserts['Books'], 'Book_Genres': upserts['Book_Genres'], 
+                                         'Formats': upserts['Formats']}, 
+                                  removed=removed)
+    
+    if cache is not None:
+        cache.invalidate(get_data_version(engine))
+
+
+@instrument_stage
+def run_incremental_etl(df, engine, state_dir="etl_state", batch_size=10000, update_summaries=False, cache=None, 
+                        search_index=None):
+    """
+    This function runs an incremental refresh: it builds the delta between the source 
+    DataFrame and the previous run, applies it to the database and then saves the new key 
+    mappings. The first run (empty state) loads everything and should target empty tables.
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    state_dir (str): Directory where the state between runs is stored.
+    batch_size (int): Number of rows sent per insert statement.
+    update_summaries (bool): Whether to also update the summary tables incrementally.
+    cache (QueryCache): Optional query cache to invalidate once the delta is applied.
+    search_index (SearchIndex): Optional search index (see goodreads.search) to update with 
+    the same delta.
+
+    Returns:
+    counts (dict): The number of new, changed, deleted and unchanged books, and of updated authors.
+    """
+    
+    delta = build_incremental_delta(df, state_dir)
+    apply_delta(engine, delta, batch_size=batch_size, update_summaries=update_summaries, cache=cache)
+    if search_index is not None:
+        search_index.apply_delta(delta)
+    save_etl_state(delta['state'], state_dir)
+    
+    return delta['counts']
+
+
+def get_top_books_5_stars(engine, min_ratings=1000, limit=10, cache=None):
+    """
+    This function retrieves the books with the most 5-star reviews among the books with 
+    more than min_ratings ratings. The threshold, the ordering and the number of books are 
+    applied in the SQL query, so only the final rows are transferred.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    min_ratings (int): Books need more than this number of ratings.
+    limit (int): Number of books to return.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    top_books_5_stars (DataFrame): The columns 'book_title', 'author', 'num_ratings', 
+    'average_rating', '5_star_reviews' and 'book_author', ordered by 5-star reviews.
+    """
+    
+    top_books_5_stars = QUERIES.run(engine, 'top_books_5_stars', {'min_ratings': min_ratings, 'limit': limit}, 
+                                    cache=cache)
+    top_books_5_stars['average_rating'] = pd.to_numeric(top_books_5_stars['average_rating'])
+    
+    # Combine the book title and author into one string for easier labeling
+    top_books_5_stars['book_author'] = top_books_5_stars['book_title'] + ' - ' + top_books_5_stars['author']
+    
+    return top_books_5_stars
+
+def get_highest_rated_books(engine, min_ratings=30, max_ratings=100, limit=10, cache=None):
+    """
+    This function retrieves the books with the highest average rating among the books 
+    with a low number of ratings (between min_ratings and max_ratings, both excluded).
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    min_ratings (int): Books need more than this number of ratings.
+    max_ratings (int): Books need less than this number of ratings.
+    limit (int): Number of books to return.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    highest_rated_books (DataFrame): The columns 'book_title', 'author', 'num_ratings' 
+    and 'average_rating', ordered by average rating.
+    """
+    
+    highest_rated_books = QUERIES.run(engine, 'highest_rated_books', {'min_ratings': min_ratings, 
+                                                                      'max_ratings': max_ratings, 
+                                                                      'limit': limit}, cache=cache)
+    highest_rated_books['average_rating'] = pd.to_numeric(highest_rated_books['average_rating'])
+    
+    return highest_rated_books
+
+def get_best_authors(engine, min_books=10, min_rating=4, limit=10, cache=None, use_summaries=False):
+    """
+    This function retrieves the authors with more than min_books books rated and an 
+    average rating of min_rating or higher, ordered by average rating.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    min_books (int): Authors need more than this number of books.
+    min_rating (float): Minimum average rating of the books of the author.
+    limit (int): Number of authors to return.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    use_summaries (bool): Whether to read from the Author_Summary table instead of Books.
+
+    Returns:
+    best_authors (DataFrame): The columns 'author', 'Number of Books rated' and 'Average_Rating'.
+    """
+    
+    query_name = 'best_authors_summary' if use_summaries else 'best_authors'
+    best_authors = QUERIES.run(engine, query_name, {'min_books': min_books, 'min_rating': min_rating, 
+                                                    'limit': limit}, cache=cache)
+    
+    # Convert necessary columns to numeric types
+    best_authors['Average_Rating'] = pd.to_numeric(best_authors['Average_Rating'])
+    best_authors['Number of Books rated'] = pd.to_numeric(best_authors['Number of Books rated'])
+    
+    return best_authors
+
+def get_most_in_demand_book_formats(engine, limit=None, cache=None, use_summaries=False):
+    """
+    This function retrieves the number of formats (distinct page count and format pairs) 
+    of each book format, most common first.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    limit (int): Number of book formats to return, or None for all of them.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    use_summaries (bool): Whether to read from the Format_Summary table instead of Formats.
+
+    Returns:
+    best_formats (DataFrame): The columns 'book_format' and 'count(book_format)'.
+    """
+    
+    query_name = 'book_formats_summary' if use_summaries else 'book_formats'
+    best_formats = QUERIES.run(engine, query_name, {'limit': ALL_ROWS if limit is None else limit}, cache=cache)
+    
+    return best_formats
+
+def get_avg_rating_by_genre(engine, min_books=500, min_rating=4, limit=None, cache=None, use_summaries=False):
+    """
+    This function retrieves the average rating of the books of each genre, for the genres 
+    with min_books or more books and an average rating greater than min_rating.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    min_books (int): Minimum number of books of the genre.
+    min_rating (float): Genres need an average rating greater than this.
+    limit (int): Number of genres to return, or None for all of them.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    use_summaries (bool): Whether to read from the Genre_Summary table instead of Books.
+
+    Returns:
+    best_genres (DataFrame): The columns 'Genre', 'Avg_Rating' and 'Count', ordered by average rating.
+    """
+    
+    query_name = 'avg_rating_by_genre_summary' if use_summaries else 'avg_rating_by_genre'
+    best_genres = QUERIES.run(engine, query_name, {'min_books': min_books, 'min_rating': min_rating, 
+                                                   'limit': ALL_ROWS if limit is None else limit}, cache=cache)
+    best_genres['Avg_Rating'] = pd.to_numeric(best_genres['Avg_Rating'])
+    
+    return best_genres
+
+def get_top_genres_by_reviews(engine, limit=10, cache=None, use_summaries=False):
+    """
+    This function retrieves the genres whose books have the most reviews in total.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    limit (int): Number of genres to return.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    use_summaries (bool): Whether to read from the Genre_Summary table instead of Books.
+
+    Returns:
+    top_genres (DataFrame): The columns 'Genre' and 'Total_Reviews', ordered by total reviews.
+    """
+    
+    query_name = 'genres_by_reviews_summary' if use_summaries else 'genres_by_reviews'
+    top_genres = QUERIES.run(engine, query_name, {'limit': limit}, cache=cache)
+    top_genres['Total_Reviews'] = pd.to_numeric(top_genres['Total_Reviews'])
+    
+    return top_genres
+
+def get_num_pages_avg_rating(engine, cache=None, use_summaries=False):
+    """
+    This function retrieves the average rating of the books of each number of pages.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    use_summaries (bool): Whether to read from the Page_Summary table instead of Books.
+
+    Returns:
+    num_pages_avg_rating (DataFrame): The columns 'Number of Pages' and 'Average Rating', 
+    ordered by average rating.
+    """
+    
+    query_name = 'num_pages_avg_rating_summary' if use_summaries else 'num_pages_avg_rating'
+    num_pages_avg_rating = QUERIES.run(engine, query_name, cache=cache)
+    num_pages_avg_rating['Average Rating'] = pd.to_numeric(num_pages_avg_rating['Average Rating'])
+    
+    return num_pages_avg_rating
+
+def get_top_books_by_avg_rating(engine, min_ratings=300, limit=10, cache=None):
+    """
+    This function retrieves the books with the highest average rating among the books with 
+    more than min_ratings ratings.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    min_ratings (int): Books need more than this number of ratings.
+    limit (int): Number of books to return.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    top_books (DataFrame): The columns 'book_title' and 'average_rating', ordered by average rating.
+    """
+    
+    top_books = QUERIES.run(engine, 'top_books_by_avg_rating', {'min_ratings': min_ratings, 'limit': limit}, 
+                            cache=cache)
+    top_books['average_rating'] = pd.to_numeric(top_books['average_rating'])
+    
+    return top_books
+
+
+def get_num_pages_rating_statistics(engine, batch_size=50000, top_k=10):
+    """
+    This function computes, in one streamed pass over the books (see stream_query), the 
+    book-level correlation between the number of pages and the average rating, the moments 
+    of both columns and the longest books. Unlike the correlation of get_num_pages_avg_rating, 
+    which only sees one average per number of pages, every book counts once.
+    
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    batch_size (int): Number of books fetched per batch.
+    top_k (int): Number of longest books to return.
+    
+    Returns:
+    statistics (dict): The correlation, the moments of 'num_pages' and 'average_rating' 
+    (count, mean, std, min, max) over the books having both, and the longest books.
+    """
+    
+    correlation = RunningCorrelation()
+    longest_books = TopK(top_k, 'num_pages')
+    for batch_df in stream_query(engine, QUERIES['num_pages_rating_by_book'], batch_size=batch_size):
+        batch_df['num_pages'] = pd.to_numeric(batch_df['num_pages'])
+        batch_df['average_rating'] = pd.to_numeric(batch_df['average_rating'])
+        correlation.update(batch_df['num_pages'], batch_df['average_rating'])
+        longest_books.update(batch_df.dropna(subset=['num_pages']))
+    
+    return {
+        'correlation': correlation.result(),
+        'num_pages': correlation.x.result(),
+        'average_rating': correlation.y.result(),
+        'longest_books': longest_books.result(),
+    }
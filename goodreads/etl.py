@@ -0,0 +1,1668 @@
+"""
+ETL part of the Goodreads analysis: reading Book_Details.csv and building the Authors, 
+Formats, Genres, Books, Book_Genres and Ratings tables from it. Only pandas and NumPy 
+are imported, so scripts that build the tables do not load SQLAlchemy or matplotlib.
+"""
+
+import pandas as pd
+import numpy as np
+import ast
+import time
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import hashlib
+import json
+
+from goodreads.metrics import METRICS, instrument_stage
+from goodreads.aggregators import CatalogSketches
+
+
+@instrument_stage
+def load_book_details(path="Book_Details.csv", chunksize=None):
+    # Read the CSV file into a DataFrame, or into an iterator of
+    # DataFrames of chunksize rows when a chunksize is given
+    df = pd.read_csv(path, chunksize=chunksize)
+    # Return the DataFrame
+    return df
+
+
+
+def first_occurrences(codes):
+    """
+    This function finds the first row of each code of a factorized column. pd.factorize 
+    numbers the values in order of first appearance, so a row is the first of its code 
+    exactly when its code is greater than every code before it.
+
+    Args:
+    codes (ndarray): Codes returned by pd.factorize.
+
+    Returns:
+    first_rows (ndarray): The position of the first row of each code, in code order.
+    """
+    
+    if len(codes) == 0:
+        return np.array([], dtype='int64')
+    is_first = np.empty(len(codes), dtype=bool)
+    is_first[0] = True
+    is_first[1:] = codes[1:] > np.maximum.accumulate(codes)[:-1]
+    
+    return np.flatnonzero(is_first)
+
+
+def build_dimension(df, columns, id_column, lookup_column=None):
+    """
+    This function builds a dimension table and its foreign-key column in one pass, without 
+    joins: the distinct combinations of columns are numbered by factorization (in order of 
+    first appearance, like drop_duplicates) and every row gets the surrogate key of its 
+    combination directly from the factorization codes.
+
+    Args:
+    df (DataFrame): The DataFrame containing the dimension columns.
+    columns (list): Columns whose distinct combinations form the dimension.
+    id_column (str): Name of the surrogate key column, numbered from 1.
+    lookup_column (str): Optional column the rows are linked by instead of the whole 
+    combination. Each row then gets the key of the first dimension row with the same value 
+    (e.g. books are linked to authors by name, even when an author has several links).
+
+    Returns:
+    dimension_df (DataFrame): The distinct combinations of columns with their keys.
+    keys (ndarray): The key of each row of df.
+    """
+    
+    # 1. One code per distinct combination of the columns, missing values included
+    codes = None
+    for column in columns:
+        column_codes, column_uniques = pd.factorize(df[column], use_na_sentinel=False)
+        if codes is None:
+            codes = column_codes
+        else:
+            codes = pd.factorize(codes * len(column_uniques) + column_codes)[0]
+    
+    # 2. The dimension rows are the first row of each combination
+    dimension_df = df[columns].iloc[first_occurrences(codes)].reset_index(drop=True)
+    dimension_df[id_column] = np.arange(1, len(dimension_df) + 1)
+    
+    # 3. Key of each row, from its own combination or from the first one with the same lookup value
+    if lookup_column is None:
+        keys = codes + 1
+    else:
+        lookup_codes = pd.factorize(df[lookup_column], use_na_sentinel=False)[0]
+        keys = codes[first_occurrences(lookup_codes)][lookup_codes] + 1
+    
+    return dimension_df, keys
+
+
+@instrument_stage
+def create_subtables(df):
+    """
+    This function creates three subtables from the original DataFrame: 
+    Books_df, Authors_df, and Formats_df. It selects necessary columns 
+    for each table, assigns unique IDs where necessary, and links 
+    authors and formats with the books (see build_dimension).
+
+    The Authors table has one row per distinct (author, authorlink) pair, and 
+    books are linked by name to the first pair of their author. The streaming 
+    mode (stream_book_details_tables) follows the same rule.
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+
+    Returns:
+    books_df (DataFrame): The Books table with linked author and format IDs.
+    authors_df (DataFrame): The Authors table with unique author IDs.
+    formats_df (DataFrame): The Formats table with unique format IDs.
+    """
+    
+    # 1. Select the necessary columns for the Books table
+    books_df = df[['book_id', 'book_title', 'book_details', 'publication_info', 
+                   'num_ratings', 'num_reviews', 'average_rating', 
+                   'rating_distribution']].copy()
+
+    # 2. Create the Authors table and link authors with books by name
+    authors_df, books_df['author_id'] = build_dimension(df, ['author', 'authorlink'], 'author_id', 
+                                                        lookup_column='author')
+
+    # 3. Create the Formats table and link formats with books
+    formats_df, books_df['format_id'] = build_dimension(df, ['format'], 'format_id')
+
+    return books_df, authors_df, formats_df
+
+
+def extract_groups(values, pattern):
+    """
+    This function extracts the named groups of a regular expression from every string of 
+    a column in one vectorized pass. With pyarrow installed the pattern runs in Arrow's 
+    compiled regex engine (RE2), otherwise in pandas' str.extract, so it must only use the 
+    syntax both support (no backreferences or lookarounds).
+
+    Args:
+    values (Series): The strings to parse.
+    pattern (str): Regular expression with named groups.
+
+    Returns:
+    groups_df (DataFrame): One column per group, with the index of values. Groups that did 
+    not match, or matched an empty string, are NaN.
+    """
+    
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        groups_df = values.str.extract(pattern)
+    else:
+        matches = pc.extract_regex(pa.array(values, type=pa.large_string(), from_pandas=True), pattern)
+        # flatten() applies the validity of the match (null for rows that do not match) to the groups
+        groups_df = pd.DataFrame({field.name: group.to_pandas().set_axis(values.index) for field, group in 
+                                  zip(matches.type, matches.flatten())}, index=values.index)
+    
+    return groups_df.where(groups_df != '')
+
+
+# Matches a whole stringified format list: "['<pages> pages, <format>']", where the page 
+# count or the format may be missing (e.g. "['Kindle Edition']")
+FORMAT_PATTERN = (r"""^(?P<list>\[)\s*(?:['"]\s*(?:(?P<pages>\d[\d,]*)\s+pages?\b)?\s*,?\s*"""
+                  r"""(?P<format>.*?)\s*['"])?\s*\]$""")
+
+# Parse result of a format entry; only 'ok' entries have both a page count and a format
+FORMAT_STATUSES = ['ok', 'missing_pages', 'missing_format', 'empty', 'unparsable']
+
+
+def parse_formats(formats):
+    """
+    This function parses a column of stringified format lists (e.g. "['652 pages, Paperback']") 
+    in a single vectorized regex pass into a typed page count and a format name, and 
+    reports the entries that do not have both.
+
+    Args:
+    formats (Series): The 'format' column of the original DataFrame.
+
+    Returns:
+    parsed_df (DataFrame): With the index of formats and the columns 'num_pages' (nullable 
+    integer), 'book_format' (string) and 'format_status' (one of FORMAT_STATUSES).
+    """
+    
+    parts = extract_groups(formats, FORMAT_PATTERN)
+    
+    # Page counts may have thousands separators ("1,024 pages")
+    num_pages = parts['pages'].str.replace(',', '', regex=False).astype('Int64')
+    book_format = parts['format']
+    
+    status = np.select(
+        [parts['list'].isna(), num_pages.isna() & book_format.isna(), num_pages.isna(), book_format.isna()],
+        ['unparsable', 'empty', 'missing_pages', 'missing_format'], default='ok')
+    status = np.where((formats.isna() | (formats == '')).to_numpy(), 'empty', status)
+    
+    return pd.DataFrame({
+        'num_pages': num_pages,
+        'book_format': book_format,
+        'format_status': pd.Categorical(status, categories=FORMAT_STATUSES),
+    }, index=formats.index)
+
+
+@instrument_stage
+def format_format_table(formats_df, malformed='drop'):
+    """
+    This function processes the 'format' column in the formats_df DataFrame 
+    by parsing it into two separate columns: 'num_pages' (an integer) and 'book_format' 
+    (see parse_formats). Formats without a page count or a format name cannot be stored 
+    in the Formats table (both columns are NOT NULL); they are counted in METRICS by 
+    parse status and then dropped, or reported as an error.
+
+    Args:
+    formats_df (DataFrame): The original DataFrame containing the 'format' column.
+    malformed (str): What to do with the formats that cannot be parsed completely: 
+    'drop' them or 'raise' a ValueError.
+
+    Returns:
+    formats_df (DataFrame): The cleaned DataFrame with separate 'num_pages' and 'book_format' columns.
+    """
+    
+    parsed_df = parse_formats(formats_df['format'])
+    valid = (parsed_df['format_status'] == 'ok').to_numpy()
+    
+    # Report the malformed entries by status
+    if not valid.all():
+        malformed_counts = parsed_df.loc[~valid, 'format_status'].value_counts()
+        if malformed == 'raise':
+            examples = formats_df.loc[~valid, 'format'].head(5).tolist()
+            raise ValueError(f"{(~valid).sum()} malformed formats ({malformed_counts[malformed_counts > 0].to_dict()}), "
+                             f"e.g. {examples}")
+        for status, count in malformed_counts[malformed_counts > 0].items():
+            METRICS.increment(f'formats_{status}', int(count))
+    
+    formats_df = formats_df.drop(columns=["format"])
+    formats_df['num_pages'] = parsed_df['num_pages']
+    formats_df['book_format'] = parsed_df['book_format']
+    
+    # Keep the complete formats only, with a plain integer page count
+    formats_df = formats_df[valid].astype({'num_pages': 'int64'})
+    
+    return formats_df
+
+
+def format_format_table_str_replace(formats_df):
+    """
+    This function is the original implementation of format_format_table, which cleans 
+    each part of the 'format' column with a chain of string replacements and round-trips 
+    'num_pages' through floats and strings. It is kept as a reference for 
+    compare_format_throughput.
+
+    Args:
+    formats_df (DataFrame): The original DataFrame containing the 'format' column.
+
+    Returns:
+    formats_df (DataFrame): The cleaned DataFrame with separate 'num_pages' and 'book_format' columns.
+    """
+    
+    # Split the 'format' column into two separate columns
+    split_format = formats_df["format"].str.split(",", expand=True).reindex(columns=[0, 1])
+
+    # Clean up the number of pages column
+    formats_df["num_pages"] = (
+        split_format[0]
+        .str.replace("[", "", regex=False)
+        .str.replace("]", "", regex=False)
+        .str.replace("'", "", regex=False)
+        .str.replace("pages", "", regex=False)
+        .str.strip()
+    )
+
+    # Clean up the book format column
+    formats_df["book_format"] = (
+        split_format[1]
+        .str.replace("[", "", regex=False)
+        .str.replace("]", "", regex=False)
+        .str.replace("'", "", regex=False)
+        .str.strip()
+    )
+
+    # Drop the original 'format' column as it's no longer needed
+    formats_df = formats_df.drop(columns=["format"])
+
+    # Convert 'num_pages' to numeric, handling non-numeric values
+    # (always as floats, so the string manipulation below sees "652.0" even when no value is missing)
+    formats_df["num_pages"] = pd.to_numeric(formats_df['num_pages'], errors='coerce').astype(float)
+    formats_df.dropna(subset="num_pages", inplace=True)
+
+    # Convert 'num_pages' to string to manipulate characters
+    formats_df['num_pages'] = formats_df['num_pages'].astype(str)
+
+    # Remove the last digit '0' from 'num_pages' if it exists
+    formats_df['num_pages'] = formats_df['num_pages'].apply(lambda x: x[:-1] if x.endswith('0') else x)
+
+    # Remove any remaining non-numeric characters
+    formats_df['num_pages'] = formats_df['num_pages'].str.replace(r'\D', '', regex=True)
+
+    # Convert 'num_pages' back to int
+    formats_df['num_pages'] = formats_df['num_pages'].astype(int)
+
+    # Return the cleaned DataFrame
+    return formats_df
+
+
+def compare_format_throughput(df, repeats=3):
+    """
+    This function times the regex-based format_format_table against the original string 
+    replacement implementation on the formats of the same DataFrame and checks that both 
+    return identical tables.
+
+    Args:
+    df (DataFrame): The original DataFrame containing the 'format' column.
+    repeats (int): Number of runs per implementation; the fastest run is kept.
+
+    Returns:
+    comparison (DataFrame): Seconds, rows per second and speedup of each implementation.
+    """
+    
+    formats_df = df[['format']].drop_duplicates().reset_index(drop=True)
+    formats_df['format_id'] = formats_df.index + 1
+    
+    results = {}
+    tables = {}
+    for name, function in [('str_replace', format_format_table_str_replace), 
+                           ('regex', format_format_table)]:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            tables[name] = function(formats_df.copy()).reset_index(drop=True)
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+    
+    # Both implementations must produce the same Formats table
+    if not tables['regex'].equals(tables['str_replace']):
+        raise ValueError("The regex Formats table differs from the str_replace one.")
+    
+    comparison = pd.DataFrame({
+        'method': list(results.keys()),
+        'seconds': list(results.values()),
+    })
+    comparison['rows_per_sec'] = len(formats_df) / comparison['seconds']
+    comparison['speedup'] = results['str_replace'] / comparison['seconds']
+    
+    return comparison
+
+
+@instrument_stage
+def format_books_table(books_df, formats_df):
+    """
+    This function cleans the Books_df DataFrame by removing duplicates 
+    and ensuring that all foreign keys (format_id) in Books_df are linked 
+    to a valid primary key in Formats_df.
+
+    Args:
+    books_df (DataFrame): The original Books DataFrame containing book details.
+    formats_df (DataFrame): The Formats DataFrame containing format information.
+
+    Returns:
+    books_df_cleaned (DataFrame): The cleaned Books DataFrame with valid foreign keys.
+    """
+    
+    # Remove duplicates based on the 'book_id' column
+    books_df.drop_duplicates(subset=['book_id'], keep='first', inplace=True)
+
+    # Check for any format_id in books_df that is not in formats_df
+    invalid_format_ids = books_df[~books_df['format_id'].isin(formats_df['format_id'])]
+
+    # Display the rows in books_df with invalid format_id values, if any
+    if not invalid_format_ids.empty:
+        print("The following format_id values in books_df do not exist in formats_df:")
+        print(invalid_format_ids[['format_id']].drop_duplicates())
+    else:
+        print("All format_id values in books_df are valid.")
+
+    # Get the total number of invalid format_id rows
+    total_invalid_format_ids = invalid_format_ids.shape[0]
+    print(f"Total number of invalid format_id values in books_df: {total_invalid_format_ids}")
+    METRICS.increment('invalid_format_ids', total_invalid_format_ids)
+
+    # Keep only rows with valid format_id values in books_df
+    books_df_cleaned = books_df[books_df['format_id'].isin(formats_df['format_id'])]
+
+    return books_df_cleaned
+
+
+
+# Matches every quoted genre inside a stringified genres list, single or double quoted
+GENRE_PATTERN = r"'(?P<single>[^']+)'|\"(?P<double>[^\"]+)\""
+
+# Matches the inside of a whole stringified genres list, and the separators between its genres
+GENRE_LIST_PATTERN = r"""^\[\s*['"](?P<genres>.*)['"]\s*\]$"""
+GENRE_SEPARATOR_PATTERN = r"""['"]\s*,\s*['"]"""
+
+
+@instrument_stage
+def split_genres(genres):
+    """
+    This function splits a column of stringified genre lists (e.g. "['Fantasy', 'Fiction']") 
+    into one row per individual genre, parsing the genres of the whole column in a single 
+    vectorized pass. With pyarrow installed, the lists are split by Arrow's compiled 
+    regex kernels; otherwise every quoted genre is matched with pandas' str.extractall. 
+    Entries that are not a list of genres give no rows, and are counted in METRICS.
+
+    Args:
+    genres (Series): The 'genres' column of the original DataFrame.
+
+    Returns:
+    book_genres (DataFrame): One row per (row position, genre) pair, with the columns 
+    'row' (position of the row in the genres column) and 'genre'.
+    """
+    
+    genres = genres.reset_index(drop=True)
+    if isinstance(genres.dtype, pd.CategoricalDtype):
+        genres = genres.astype(object)
+    
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        # Match every quoted genre of the column at once
+        matches = genres.str.extractall(GENRE_PATTERN)
+        # Genres containing an apostrophe are written between double quotes
+        genre = matches['single'].fillna(matches['double']).str.strip().to_numpy()
+        rows = matches.index.get_level_values(0).to_numpy(dtype='int64')
+    else:
+        # Take the inside of each list and split it on the quotes and commas between genres
+        lists = pc.extract_regex(pa.array(genres, type=pa.large_string(), from_pandas=True), GENRE_LIST_PATTERN)
+        split = pc.split_pattern_regex(lists.flatten()[0], GENRE_SEPARATOR_PATTERN)
+        rows = pc.list_parent_indices(split).to_numpy().astype('int64')
+        genre = pc.utf8_trim_whitespace(pc.list_flatten(split)).to_pandas().to_numpy()
+        non_empty = genre != ''
+        rows, genre = rows[non_empty], genre[non_empty]
+    
+    books_with_genres = np.count_nonzero(np.diff(rows)) + 1 if len(rows) else 0
+    METRICS.increment('books_without_genres', int(len(genres) - books_with_genres))
+    
+    return pd.DataFrame({
+        'row': rows,
+        'genre': genre,
+    })
+
+
+@instrument_stage
+def parse_book_literals(df):
+    """
+    This function parses the stringified list columns of the original DataFrame into typed 
+    columns: the page count and format name of each book (see parse_formats) and its list 
+    of genres (see split_genres).
+
+    Args:
+    df (DataFrame): The original DataFrame containing the 'format' and 'genres' columns.
+
+    Returns:
+    parsed_df (DataFrame): With the index of df and the columns 'num_pages', 'book_format', 
+    'format_status' and 'genres' (a list of genre names, empty when there are none).
+    """
+    
+    parsed_df = parse_formats(df['format'])
+    
+    split = split_genres(df['genres'])
+    genre_lists = split.groupby('row')['genre'].agg(list).reindex(range(len(df)))
+    parsed_df['genres'] = [genre_list if isinstance(genre_list, list) else [] for genre_list in genre_lists]
+    
+    return parsed_df
+
+
+@instrument_stage
+def format_genres_table(df, split=None):
+    """
+    This function processes the 'genres' column in the original DataFrame to create the 
+    genres_df DataFrame, with one row per individual genre (e.g. 'Fantasy') instead of one 
+    row per combination of genres. The lists of genres are split, duplicates are removed 
+    and a unique genre ID is assigned to each genre.
+
+    Args:
+    df (DataFrame): The original DataFrame containing the 'genres' column.
+    split (DataFrame): Optional result of split_genres(df['genres']), if already computed.
+
+    Returns:
+    genres_df (DataFrame): The DataFrame with one row per genre and its unique genre ID.
+    """
+    
+    # Split the lists of genres into one row per individual genre
+    if split is None:
+        split = split_genres(df['genres'])
+    genres_df = split[['genre']]
+    
+    # Keep each genre once and drop empty names
+    genres_df = genres_df[genres_df['genre'] != ''].drop_duplicates().reset_index(drop=True)
+    
+    # Assign a unique genre_id to each genre
+    genres_df['genre_id'] = genres_df.index + 1
+    
+    return genres_df
+
+
+@instrument_stage
+def create_book_genres_table(df, genres_df, split=None):
+    """
+    This function creates the book_genres_df DataFrame, the many-to-many bridge between 
+    books and individual genres. The list of genres of each book is split into one row per 
+    genre, whose genre ID is then looked up in genres_df. A book_id repeated in df keeps 
+    the genres of its first row, like its row of the Books table.
+
+    Args:
+    df (DataFrame): The original DataFrame containing book and genre information.
+    genres_df (DataFrame): The genres DataFrame created by format_genres_table.
+    split (DataFrame): Optional result of split_genres(df['genres']), if already computed.
+
+    Returns:
+    book_genres_df (DataFrame): The DataFrame linking book IDs to genre IDs, one row per pair.
+    """
+    
+    # Split the genres of each book into one row per genre
+    if split is None:
+        split = split_genres(df['genres'])
+    rows = split['row'].to_numpy()
+    split = split[~df['book_id'].duplicated().to_numpy()[rows]]
+    book_ids = df['book_id'].to_numpy()[split['row'].to_numpy()]
+    
+    # Look up the genre ID of each distinct genre name once (genres unknown to genres_df are dropped)
+    codes, names = pd.factorize(split['genre'])
+    positions = pd.Index(genres_df['genre']).get_indexer(names)[codes]
+    known = (codes >= 0) & (positions >= 0)
+    book_ids = book_ids[known]
+    genre_ids = genres_df['genre_id'].to_numpy()[positions[known]]
+    
+    # (book_id, genre_id) is the primary key of the Book_Genres table
+    pairs = pd.Series(book_ids.astype('int64') * (int(genre_ids.max(initial=0)) + 1) + genre_ids)
+    unique = ~pairs.duplicated().to_numpy()
+    book_genres_df = pd.DataFrame({'book_id': book_ids[unique], 'genre_id': genre_ids[unique]})
+    
+    return book_genres_df
+
+
+@instrument_stage
+def aggregate_genre_stats(books_df, book_genres_df, genres_df):
+    """
+    This function computes per-genre statistics from the tables in memory with vectorized 
+    merges and a groupby: the number of books, the average rating of those books and their 
+    total number of reviews. Every book counts once in each of its genres.
+
+    Args:
+    books_df (DataFrame): The Books table.
+    book_genres_df (DataFrame): The Book_Genres table.
+    genres_df (DataFrame): The Genres table.
+
+    Returns:
+    genre_stats (DataFrame): The columns 'genre', 'book_count', 'avg_rating' and 'sum_reviews', 
+    one row per genre.
+    """
+    
+    # Attach the rating and reviews of each book to each of its genres
+    book_genre_stats = (book_genres_df
+                        .merge(books_df[['book_id', 'average_rating', 'num_reviews']], on='book_id')
+                        .merge(genres_df[['genre_id', 'genre']], on='genre_id'))
+    
+    genre_stats = book_genre_stats.groupby('genre', as_index=False).agg(
+        book_count=('book_id', 'size'),
+        avg_rating=('average_rating', 'mean'),
+        sum_reviews=('num_reviews', 'sum'),
+    )
+    
+    return genre_stats
+
+
+# Column names of the Ratings table, from 5 stars down to 1 star
+STAR_COLUMNS = ['5_star_reviews', '4_star_reviews', '3_star_reviews', '2_star_reviews', '1_star_reviews']
+
+# Matches every "<star>: <count>" pair inside a rating_distribution string, with the star and the
+# count in single quotes, double quotes or unquoted, like the dictionaries ast.literal_eval accepts
+RATING_PATTERN = (r"""(?<![\w'"])(?P<star_quote>['"]?)(?P<star>[1-5])(?P=star_quote)\s*:\s*"""
+                  r"""(?P<count_quote>['"]?)(?P<count>\d[\d,]*)(?P=count_quote)""")
+
+
+def extract_rating_counts(rating_distribution):
+    """
+    This function extracts the number of reviews for each star rating from a column of
+    stringified rating_distribution dictionaries in a single vectorized pass. All the
+    "'star': 'count'" pairs of the whole column are matched with one regex, and the counts
+    are scattered into a NumPy array instead of parsing every row with ast.literal_eval.
+    Stars and counts may be single-quoted, double-quoted or bare integers.
+
+    Args:
+    rating_distribution (Series): The 'rating_distribution' column of the original DataFrame.
+
+    Returns:
+    counts (ndarray): An int64 array of shape (rows, 5) with the 5-star to 1-star counts.
+    Stars missing from a distribution are counted as 0.
+    """
+    
+    # Match every star/count pair of the column at once
+    matches = rating_distribution.reset_index(drop=True).str.extractall(RATING_PATTERN)
+    
+    # Position of the row and of the star column each match belongs to
+    rows = matches.index.get_level_values(0).to_numpy(dtype='int64')
+    stars = 5 - matches['star'].to_numpy(dtype='int64')
+    
+    # Remove the thousands separators and convert the counts to integers
+    values = matches['count'].str.replace(",", "", regex=False).to_numpy(dtype='int64')
+    
+    # Scatter the counts into a (rows, 5) array
+    counts = np.zeros((len(rating_distribution), len(STAR_COLUMNS)), dtype='int64')
+    counts[rows, stars] = values
+    
+    return counts
+
+
+@instrument_stage
+def create_ratings_table(df):
+    """
+    This function creates and formats the Ratings table by extracting the number 
+    of reviews for each star rating (1 to 5 stars) from the 'rating_distribution' 
+    column in the original DataFrame.
+
+    Args:
+    df (DataFrame): The original DataFrame containing book and rating information.
+
+    Returns:
+    ratings_df (DataFrame): The formatted DataFrame with separate columns for each star rating.
+    """
+    
+    # Create a DataFrame with the book_id column
+    ratings_df = df[['book_id']].copy()
+    
+    # Extract the star ratings of every book in one vectorized pass
+    counts = extract_rating_counts(df['rating_distribution'])
+    for position, column in enumerate(STAR_COLUMNS):
+        ratings_df[column] = counts[:, position]
+    
+    return ratings_df
+
+
+def create_ratings_table_literal_eval(df):
+    """
+    This function is the original row-by-row implementation of create_ratings_table, 
+    which parses each 'rating_distribution' string with ast.literal_eval. It is kept as 
+    a reference for compare_ratings_throughput.
+
+    Args:
+    df (DataFrame): The original DataFrame containing book and rating information.
+
+    Returns:
+    ratings_df (DataFrame): The formatted DataFrame with separate columns for each star rating.
+    """
+    
+    # Create a DataFrame with book_id and rating_distribution
+    ratings_df = df[['book_id', 'rating_distribution']].copy()
+    
+    # Function to extract star ratings from the rating_distribution string
+    def extract_ratings(rating_dist):
+        # Convert the string into a dictionary
+        rating_dict = ast.literal_eval(rating_dist)
+        
+        # Extract values for each star rating, handling commas
+        stars_5 = int(rating_dict.get('5', '0').replace(",", ""))
+        stars_4 = int(rating_dict.get('4', '0').replace(",", ""))
+        stars_3 = int(rating_dict.get('3', '0').replace(",", ""))
+        stars_2 = int(rating_dict.get('2', '0').replace(",", ""))
+        stars_1 = int(rating_dict.get('1', '0').replace(",", ""))
+        
+        return pd.Series([stars_5, stars_4, stars_3, stars_2, stars_1])
+    
+    # Apply the extraction function to the rating_distribution column
+    ratings_df[STAR_COLUMNS] = ratings_df['rating_distribution'].apply(extract_ratings)
+    
+    # Drop the original 'rating_distribution' column
+    ratings_df = ratings_df.drop(columns=['rating_distribution'])
+    
+    return ratings_df
+
+
+@instrument_stage
+def add_rating_stats(ratings_df, prior_weight=None, prior_mean=None):
+    """
+    This function adds per-book statistics derived from the star counts of the Ratings 
+    table: the total number of reviews, the mean and variance of the star ratings and a 
+    Bayesian-smoothed average. Everything is computed as array operations over the whole table.
+
+    The Bayesian average pulls books with few reviews towards the catalog mean:
+    (prior_weight * prior_mean + sum of stars) / (prior_weight + total reviews).
+
+    Args:
+    ratings_df (DataFrame): The Ratings table created by create_ratings_table.
+    prior_weight (float): Number of "virtual" reviews of the prior. Defaults to the mean 
+    number of reviews per book.
+    prior_mean (float): Rating of the prior. Defaults to the mean rating of the whole catalog.
+
+    Returns:
+    ratings_df (DataFrame): A copy of the Ratings table with the columns 'total_reviews', 
+    'mean_rating', 'rating_variance' and 'bayesian_rating' added.
+    """
+    
+    # Star counts as a (rows, 5) array and the star value of each column
+    counts = ratings_df[STAR_COLUMNS].to_numpy(dtype='float64')
+    stars = np.array([5, 4, 3, 2, 1], dtype='float64')
+    
+    # Total reviews, sum of stars and sum of squared stars per book
+    total = counts.sum(axis=1)
+    star_sum = counts @ stars
+    star_square_sum = counts @ (stars ** 2)
+    
+    # Mean and variance of the ratings, NaN for books without reviews
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(total > 0, star_sum / total, np.nan)
+        variance = np.where(total > 0, star_square_sum / total - mean ** 2, np.nan)
+    
+    # Default prior: the average book of the catalog
+    if prior_weight is None:
+        prior_weight = total.mean() if len(total) else 0.0
+    if prior_mean is None:
+        prior_mean = star_sum.sum() / total.sum() if total.sum() > 0 else 0.0
+    
+    ratings_df = ratings_df.copy()
+    ratings_df['total_reviews'] = total.astype('int64')
+    ratings_df['mean_rating'] = mean
+    ratings_df['rating_variance'] = np.clip(variance, 0, None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratings_df['bayesian_rating'] = (prior_weight * prior_mean + star_sum) / (prior_weight + total)
+    
+    return ratings_df
+
+
+def compare_ratings_throughput(df, repeats=3):
+    """
+    This function times the vectorized create_ratings_table against the original 
+    ast.literal_eval implementation on the same DataFrame and checks that both 
+    return identical tables.
+
+    Args:
+    df (DataFrame): The original DataFrame containing the 'rating_distribution' column.
+    repeats (int): Number of runs per implementation; the fastest run is kept.
+
+    Returns:
+    comparison (DataFrame): Seconds, rows per second and speedup of each implementation.
+    """
+    
+    results = {}
+    tables = {}
+    for name, function in [('literal_eval', create_ratings_table_literal_eval), 
+                           ('vectorized', create_ratings_table)]:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            tables[name] = function(df)
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+    
+    # Both implementations must produce the same Ratings table
+    if not tables['vectorized'].equals(tables['literal_eval']):
+        raise ValueError("The vectorized Ratings table differs from the literal_eval one.")
+    
+    comparison = pd.DataFrame({
+        'method': list(results.keys()),
+        'seconds': list(results.values()),
+    })
+    comparison['rows_per_sec'] = len(df) / comparison['seconds']
+    comparison['speedup'] = results['literal_eval'] / comparison['seconds']
+    
+    return comparison
+
+
+def stream_book_details_tables(path="Book_Details.csv", chunksize=50000, optimize=False, sketches=None):
+    """
+    This function is the streaming version of the table-building steps. It reads the 
+    source CSV in chunks of chunksize rows and yields the six tables chunk by chunk, so 
+    only one chunk of the raw data is in memory at a time. The state kept between chunks 
+    is not bounded by the chunk size: it grows with the number of distinct authors, formats, 
+    genres and books (the set of book IDs seen so far takes about 60 bytes per book).
+
+    The author, format and genre IDs are kept consistent across chunks with dictionaries 
+    mapping each author, raw format string and individual genre to its ID. The dimension 
+    rows are taken from every source row and authors are keyed like create_subtables, so the 
+    dimension tables and their IDs are the ones of build_tables on the same file. Each chunk only contains the dimension rows seen for the first time in that chunk. Books 
+    already seen in a previous chunk and books with an invalid format are skipped, together 
+    with their genres and ratings, so every chunk can be loaded as-is.
+
+    Args:
+    path (str): Path of the Book_Details CSV file.
+    chunksize (int): Number of source rows read per chunk.
+    optimize (bool): Whether to convert the tables to compact dtypes (see optimize_dtypes).
+    sketches (CatalogSketches): Optional sketches of the approximate analytics, updated with 
+    the books of every chunk (see update_sketches).
+
+    Yields:
+    tables (dict): The new rows of each table for the current chunk, keyed by table name 
+    ('Authors', 'Formats', 'Genres', 'Books', 'Book_Genres', 'Ratings').
+    """
+    
+    # Dimension state shared by all chunks
+    author_pairs = set()
+    author_ids = {}
+    format_ids = {}
+    valid_format_ids = set()
+    genre_ids = {}
+    seen_book_ids = set()
+    
+    for chunk in load_book_details(path, chunksize=chunksize):
+        # 1. New (author, authorlink) pairs get the next free author IDs, and each new author 
+        # name the ID of its first pair (see create_subtables)
+        authors_df = chunk[['author', 'authorlink']].drop_duplicates()
+        pairs = list(zip(*(authors_df[column].astype(object).where(authors_df[column].notna(), None) 
+                           for column in ['author', 'authorlink'])))
+        is_new = np.array([pair not in author_pairs for pair in pairs], dtype=bool)
+        authors_df = authors_df[is_new].reset_index(drop=True)
+        authors_df['author_id'] = authors_df.index + len(author_pairs) + 1
+        author_pairs.update(pair for pair, new in zip(pairs, is_new) if new)
+        first_pairs = authors_df.drop_duplicates(subset=['author'])
+        first_pairs = first_pairs[~first_pairs['author'].isin(author_ids)]
+        author_ids.update(zip(first_pairs['author'], first_pairs['author_id']))
+        
+        # 2. New formats get the next free format IDs and are cleaned
+        formats_df = chunk[['format']].drop_duplicates()
+        formats_df = formats_df[~formats_df['format'].isin(format_ids)].reset_index(drop=True)
+        formats_df['format_id'] = formats_df.index + len(format_ids) + 1
+        format_ids.update(zip(formats_df['format'], formats_df['format_id']))
+        if not formats_df.empty:
+            formats_df = format_format_table(formats_df)
+        else:
+            formats_df = pd.DataFrame(columns=['format_id', 'num_pages', 'book_format'])
+        valid_format_ids.update(formats_df['format_id'])
+        
+        # 3. New individual genres get the next free genre IDs
+        genres_df = format_genres_table(chunk)
+        genres_df = genres_df[~genres_df['genre'].isin(genre_ids)].reset_index(drop=True)
+        genres_df['genre_id'] = genres_df.index + len(genre_ids) + 1
+        genre_ids.update(zip(genres_df['genre'], genres_df['genre_id']))
+        
+        # 4. Keep only the first occurrence of each book
+        chunk = chunk.drop_duplicates(subset=['book_id'], keep='first')
+        chunk = chunk[~chunk['book_id'].isin(seen_book_ids)]
+        seen_book_ids.update(chunk['book_id'])
+        
+        # 5. Link the books with their authors and formats, keeping only valid formats
+        books_df = chunk[['book_id', 'book_title', 'book_details', 'publication_info', 
+                          'num_ratings', 'num_reviews', 'average_rating', 
+                          'rating_distribution']].copy()
+        books_df['author_id'] = chunk['author'].map(author_ids)
+        books_df['format_id'] = chunk['format'].map(format_ids)
+        valid_books = books_df['format_id'].isin(valid_format_ids)
+        books_df = books_df[valid_books]
+        chunk = chunk[valid_books]
+        
+        # 6. Link the books with each of their genres
+        split = split_genres(chunk['genres'])
+        book_genres_df = split.copy()
+        book_genres_df['book_id'] = chunk['book_id'].to_numpy()[book_genres_df['row']]
+        book_genres_df['genre_id'] = book_genres_df['genre'].map(genre_ids)
+        book_genres_df = (book_genres_df.dropna(subset=['genre_id'])[['book_id', 'genre_id']]
+                          .astype('int64').drop_duplicates())
+        
+        # 7. Extract the star ratings of the books
+        ratings_df = create_ratings_table(chunk)
+        
+        # 8. Add the books to the sketches of the approximate analytics
+        if sketches is not None:
+            update_sketches(sketches, chunk, split=split)
+        
+        tables = {
+            'Authors': authors_df,
+            'Formats': formats_df,
+            'Genres': genres_df,
+            'Books': books_df,
+            'Book_Genres': book_genres_df,
+            'Ratings': ratings_df,
+        }
+        yield optimize_tables(tables) if optimize else tables
+
+
+@instrument_stage
+def write_streamed_tables(path="Book_Details.csv", output_dir="Data/tables", chunksize=50000):
+    """
+    This function runs stream_book_details_tables and appends every chunk of every table 
+    to a CSV file named after the table in output_dir, so the tables are written 
+    incrementally without holding them in memory.
+
+    Args:
+    path (str): Path of the Book_Details CSV file.
+    output_dir (str): Directory where the table CSV files are written. The default is not 
+    tracked by git, unlike the CSV files of Data/.
+    chunksize (int): Number of source rows read per chunk.
+
+    Returns:
+    row_counts (dict): The number of rows written to each table.
+    """
+    
+    os.makedirs(output_dir, exist_ok=True)
+    row_counts = {}
+    
+    for tables in stream_book_details_tables(path, chunksize=chunksize):
+        for table_name, table_df in tables.items():
+            # Write the header only with the first chunk of each table
+            first_chunk = table_name not in row_counts
+            table_df.to_csv(os.path.join(output_dir, f"{table_name}.csv"), 
+                            mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+            row_counts[table_name] = row_counts.get(table_name, 0) + len(table_df)
+    
+    return row_counts
+
+
+def update_sketches(sketches, df, split=None):
+    """
+    This function adds the books of a chunk of the original DataFrame to the sketches of the 
+    approximate analytics. Books whose format cannot be parsed are left out, as they are 
+    left out of the Books table, and a genre counts once per book, as in Book_Genres.
+
+    Args:
+    sketches (CatalogSketches): The sketches to update.
+    df (DataFrame): A chunk of the original DataFrame.
+    split (DataFrame): Optional result of split_genres(df['genres']), if already computed.
+
+    Returns:
+    sketches (CatalogSketches): The updated sketches.
+    """
+    
+    if split is None:
+        split = split_genres(df['genres'])
+    formats = parse_formats(df['format'])
+    valid = (formats['format_status'] == 'ok').to_numpy()
+    
+    books_df = pd.DataFrame({
+        'author': df['author'].to_numpy()[valid],
+        'authorlink': df['authorlink'].to_numpy()[valid],
+        'book_format': formats['book_format'].to_numpy()[valid],
+        'num_pages': formats['num_pages'].to_numpy(dtype='float64', na_value=np.nan)[valid],
+        'average_rating': pd.to_numeric(df['average_rating'], errors='coerce').to_numpy()[valid],
+    })
+    
+    split = split[valid[split['row'].to_numpy()]].drop_duplicates(subset=['row', 'genre'])
+    book_genres_df = pd.DataFrame({
+        'genre': split['genre'].to_numpy(),
+        'num_reviews': pd.to_numeric(df['num_reviews'], errors='coerce').to_numpy()[split['row'].to_numpy()],
+    })
+    
+    return sketches.update(books_df, book_genres_df)
+
+
+def sketch_chunk(df, sketch_options):
+    # Sketches of one chunk of the original DataFrame, built in a worker process
+    df = df.drop_duplicates(subset=['book_id'], keep='first').reset_index(drop=True)
+    return update_sketches(CatalogSketches(**sketch_options), df)
+
+
+@instrument_stage
+def sketch_book_details(path="Book_Details.csv", chunksize=50000, max_workers=None, **sketch_options):
+    """
+    This function builds the sketches of the approximate analytics of a source file in one 
+    pass, without building the tables. The chunks are sketched by several worker processes 
+    and their sketches are merged, so the result does not depend on the number of workers 
+    (up to books repeated in different chunks, which are counted once per chunk). At most 
+    two chunks per worker are read ahead.
+
+    Args:
+    path (str): Path of the Book_Details CSV file.
+    chunksize (int): Number of source rows read per chunk.
+    max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+    **sketch_options: Error bounds of the sketches, see CatalogSketches.
+
+    Returns:
+    sketches (CatalogSketches): The merged sketches of every chunk.
+    """
+    
+    max_workers = max_workers or os.cpu_count()
+    sketches = CatalogSketches(**sketch_options)
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for chunk in load_book_details(path, chunksize=chunksize):
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sketches.merge(future.result())
+            pending.add(executor.submit(sketch_chunk, chunk, sketch_options))
+        for future in pending:
+            sketches.merge(future.result())
+    
+    return sketches
+
+
+@instrument_stage
+def build_subtables_stage(df):
+    """
+    This function builds the Books, Authors and Formats tables from the original DataFrame 
+    (create_subtables, format_format_table and format_books_table).
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+
+    Returns:
+    tables (dict): The 'Authors', 'Formats' and 'Books' tables.
+    """
+    
+    books_df, authors_df, formats_df = create_subtables(df)
+    formats_df = format_format_table(formats_df)
+    books_df = format_books_table(books_df, formats_df)
+    
+    return {'Authors': authors_df, 'Formats': formats_df, 'Books': books_df}
+
+
+@instrument_stage
+def build_genres_stage(df):
+    """
+    This function builds the Genres and Book_Genres tables from the original DataFrame.
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+
+    Returns:
+    tables (dict): The 'Genres' and 'Book_Genres' tables.
+    """
+    
+    genres_df = format_genres_table(df)
+    book_genres_df = create_book_genres_table(df, genres_df)
+    
+    return {'Genres': genres_df, 'Book_Genres': book_genres_df}
+
+
+@instrument_stage
+def build_ratings_stage(df):
+    """
+    This function builds the Ratings table from the original DataFrame.
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+
+    Returns:
+    tables (dict): The 'Ratings' table.
+    """
+    
+    return {'Ratings': create_ratings_table(df)}
+
+
+# The stages that build the tables from the original DataFrame, with a version number 
+# to bump whenever the output of the stage changes (it invalidates the stage cache)
+TABLE_STAGES = {
+    'subtables': (build_subtables_stage, 1),
+    'genres': (build_genres_stage, 2),
+    'ratings': (build_ratings_stage, 1),
+}
+
+# Order of the tables in the dictionaries returned by the pipeline (foreign-key order)
+TABLE_NAMES = ['Authors', 'Formats', 'Genres', 'Books', 'Book_Genres', 'Ratings']
+
+
+def link_child_tables(tables):
+    """
+    This function keeps only the Book_Genres and Ratings rows of the books left in the Books 
+    table by format_books_table (first occurrence of each book_id, valid format_id), so the 
+    child tables have no orphan rows, as in stream_book_details_tables.
+
+    Args:
+    tables (dict): The tables keyed by table name.
+
+    Returns:
+    tables (dict): The same tables, with the child tables restricted to the remaining books.
+    """
+    
+    book_ids = tables['Books']['book_id']
+    book_genres_df = tables['Book_Genres']
+    tables['Book_Genres'] = book_genres_df[book_genres_df['book_id'].isin(book_ids)].reset_index(drop=True)
+    
+    # A duplicated book keeps the ratings of its first row, like its Books row
+    ratings_df = tables['Ratings'].drop_duplicates(subset=['book_id'], keep='first')
+    tables['Ratings'] = ratings_df[ratings_df['book_id'].isin(book_ids)].reset_index(drop=True)
+    
+    return tables
+
+
+@instrument_stage
+def build_tables(df, optimize=False):
+    """
+    This function runs all the table-building steps on the original DataFrame, in the 
+    same order as the notebook, and returns the six tables of the database. Book_Genres 
+    and Ratings only keep the books of the Books table (see link_child_tables).
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+    optimize (bool): Whether to convert the tables to compact dtypes (see optimize_dtypes).
+
+    Returns:
+    tables (dict): The tables keyed by table name, in foreign-key order 
+    ('Authors', 'Formats', 'Genres', 'Books', 'Book_Genres', 'Ratings').
+    """
+    
+    tables = {}
+    for stage_function, _ in TABLE_STAGES.values():
+        tables.update(stage_function(df))
+    tables = link_child_tables({table_name: tables[table_name] for table_name in TABLE_NAMES})
+    
+    if optimize:
+        tables = optimize_tables(tables)
+    
+    return tables
+
+
+# Long free-text columns, stored as strings instead of categories
+TEXT_COLUMNS = ['book_title', 'book_details', 'publication_info', 'rating_distribution', 'authorlink', 
+                'format', 'genres']
+
+# Columns stored as DECIMAL in the database, kept as float64 so their values are written back exactly
+DECIMAL_COLUMNS = ['average_rating', 'rating_sum', 'review_sum']
+
+
+def smallest_integer_dtype(minimum, maximum):
+    # Smallest nullable integer dtype (unsigned if possible) holding every value from minimum to maximum
+    if pd.isna(minimum):
+        return 'Int8'
+    candidates = ['UInt8', 'UInt16', 'UInt32', 'UInt64'] if minimum >= 0 else ['Int8', 'Int16', 'Int32', 'Int64']
+    for dtype in candidates:
+        bounds = np.iinfo(dtype.lower())
+        if bounds.min <= minimum and maximum <= bounds.max:
+            return dtype
+    return candidates[-1]
+
+
+def optimize_dtypes(table_df, category_threshold=0.5):
+    """
+    This function converts the columns of a table to compact dtypes: integers (with or 
+    without missing values) are downcast to the smallest nullable integer type that fits, 
+    floats to float32 except the DECIMAL columns of the schema, which stay float64, repeated 
+    strings (fewer unique values than category_threshold times the number of rows) to 
+    categoricals and the other strings to the string dtype (backed by Arrow when pyarrow is 
+    installed).
+
+    Args:
+    table_df (DataFrame): The table to convert.
+    category_threshold (float): Maximum ratio of unique values to rows for a categorical.
+
+    Returns:
+    table_df (DataFrame): A copy of the table with compact dtypes.
+    """
+    
+    try:
+        import pyarrow  # noqa: F401
+        string_dtype = 'string[pyarrow]'
+    except ImportError:
+        string_dtype = 'string'
+    
+    table_df = table_df.copy()
+    for column in table_df.columns:
+        values = table_df[column]
+        if pd.api.types.is_bool_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(values):
+            table_df[column] = values.astype(smallest_integer_dtype(values.min(), values.max()))
+        elif pd.api.types.is_float_dtype(values):
+            # Whole-number floats (integers with NaN) become nullable integers
+            non_null = values.dropna()
+            if column in DECIMAL_COLUMNS:
+                table_df[column] = values.astype('float64')
+            elif len(non_null) and (non_null == non_null.round()).all() and non_null.abs().max() < 2 ** 31:
+                table_df[column] = values.astype(smallest_integer_dtype(non_null.min(), non_null.max()))
+            else:
+                table_df[column] = values.astype('float32')
+        elif pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+            if column not in TEXT_COLUMNS and values.nunique() <= category_threshold * len(values):
+                table_df[column] = values.astype('category')
+            else:
+                table_df[column] = values.astype(string_dtype)
+    
+    return table_df
+
+
+@instrument_stage
+def optimize_tables(tables, category_threshold=0.5):
+    """
+    This function applies optimize_dtypes to every table of a dictionary of tables.
+
+    Args:
+    tables (dict): The tables keyed by table name.
+    category_threshold (float): Maximum ratio of unique values to rows for a categorical.
+
+    Returns:
+    tables (dict): The tables with compact dtypes.
+    """
+    
+    return {table_name: optimize_dtypes(table_df, category_threshold) for table_name, table_df in tables.items()}
+
+
+def memory_report(tables_before, tables_after):
+    """
+    This function compares the memory used by each table before and after optimize_tables.
+
+    Args:
+    tables_before (dict): The tables with their original dtypes.
+    tables_after (dict): The same tables with compact dtypes.
+
+    Returns:
+    report (DataFrame): The bytes used by each table before and after, and the ratio.
+    """
+    
+    report = pd.DataFrame({
+        'table': list(tables_before),
+        'bytes_before': [int(tables_before[name].memory_usage(deep=True).sum()) for name in tables_before],
+        'bytes_after': [int(tables_after[name].memory_usage(deep=True).sum()) for name in tables_before],
+    })
+    report['ratio'] = report['bytes_after'] / report['bytes_before']
+    
+    return report
+
+
+def run_stage_graph(stages, max_workers=None):
+    """
+    This function runs a graph of stages, starting each stage as soon as the stages it 
+    depends on are finished. Independent stages run at the same time in a process pool; 
+    light stages (e.g. concatenating the results of other stages) can run in the current 
+    process to avoid copying their inputs to a worker.
+
+    Args:
+    stages (dict): For each stage name, a tuple (function, dependencies, args, local). The 
+    function is called with args followed by the results of the dependencies, in order. 
+    Stages with local set to True run in the current process.
+    max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+    results (dict): The result of every stage, keyed by stage name.
+    """
+    
+    results = {}
+    pending = dict(stages)
+    running = {}
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # Start every stage whose dependencies are finished
+            for stage_name, (function, dependencies, args, local) in list(pending.items()):
+                if all(dependency in results for dependency in dependencies):
+                    del pending[stage_name]
+                    inputs = [*args, *[results[dependency] for dependency in dependencies]]
+                    if local:
+                        results[stage_name] = function(*inputs)
+                    else:
+                        running[executor.submit(function, *inputs)] = stage_name
+            
+            if not running:
+                if pending:
+                    raise ValueError(f"Stages with missing or circular dependencies: {sorted(pending)}")
+                continue
+            
+            # Wait for at least one stage to finish
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    
+    return results
+
+
+def concat_parts(*parts):
+    # Recombine the results of the chunks of a row-wise stage, in order
+    return pd.concat(parts)
+
+
+def split_genres_chunk(genres, offset):
+    # split_genres on a chunk of rows, with row positions relative to the whole column
+    split = split_genres(genres)
+    split['row'] += offset
+    return split
+
+
+@instrument_stage
+def build_books_stage(df, formats_df):
+    # Books and Authors tables, linked with the formats parsed by the format chunks
+    books_df, authors_df, _ = create_subtables(df)
+    books_df = format_books_table(books_df, formats_df)
+    return {'Authors': authors_df, 'Books': books_df}
+
+
+@instrument_stage
+def run_pipeline_parallel(df, max_workers=None, chunks=None, optimize=False):
+    """
+    This function builds the same six tables as build_tables, using several CPU cores. 
+    The stages that only depend on the original DataFrame run at the same time, and the 
+    row-wise work (parsing the ratings, the formats and the genre lists) is split into 
+    chunks spread across the workers, then recombined in order. IDs are still assigned 
+    on the whole data, so the result is identical to build_tables.
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+    max_workers (int): Number of worker processes. Defaults to the number of CPUs.
+    chunks (int): Number of chunks of the row-wise stages. Defaults to max_workers.
+    optimize (bool): Whether to convert the tables to compact dtypes (see optimize_dtypes).
+
+    Returns:
+    tables (dict): The tables keyed by table name, in foreign-key order.
+    """
+    
+    max_workers = max_workers or os.cpu_count()
+    chunks = chunks or max_workers
+    
+    # Row boundaries of the chunks of the original DataFrame
+    bounds = np.linspace(0, len(df), chunks + 1).astype(int)
+    
+    # The distinct formats and their IDs, as assigned by create_subtables
+    formats_df = df[['format']].drop_duplicates().reset_index(drop=True)
+    formats_df['format_id'] = formats_df.index + 1
+    format_bounds = np.linspace(0, len(formats_df), chunks + 1).astype(int)
+    
+    stages = {}
+    for chunk in range(chunks):
+        start, end = bounds[chunk], bounds[chunk + 1]
+        stages[f'ratings_{chunk}'] = (create_ratings_table, [], (df.iloc[start:end],), False)
+        stages[f'genres_{chunk}'] = (split_genres_chunk, [], (df['genres'].iloc[start:end], start), False)
+        stages[f'formats_{chunk}'] = (format_format_table, [], 
+                                      (formats_df.iloc[format_bounds[chunk]:format_bounds[chunk + 1]].copy(),), False)
+    
+    chunk_names = lambda prefix: [f'{prefix}_{chunk}' for chunk in range(chunks)]
+    stages['ratings'] = (concat_parts, chunk_names('ratings'), (), True)
+    stages['formats'] = (concat_parts, chunk_names('formats'), (), True)
+    stages['genre_split'] = (lambda *parts: pd.concat(parts, ignore_index=True), chunk_names('genres'), (), True)
+    stages['books'] = (build_books_stage, ['formats'], (df,), False)
+    stages['genres'] = (lambda split: format_genres_table(df, split=split), ['genre_split'], (), True)
+    stages['book_genres'] = (lambda split, genres_df: create_book_genres_table(df, genres_df, split=split), 
+                             ['genre_split', 'genres'], (), True)
+    
+    results = run_stage_graph(stages, max_workers=max_workers)
+    tables = {
+        'Authors': results['books']['Authors'],
+        'Formats': results['formats'],
+        'Genres': results['genres'],
+        'Books': results['books']['Books'],
+        'Book_Genres': results['book_genres'],
+        'Ratings': results['ratings'],
+    }
+    tables = link_child_tables(tables)
+    
+    if optimize:
+        tables = optimize_tables(tables)
+    
+    return tables
+
+
+def fingerprint_file(path, sample_size=1 << 20):
+    """
+    This function computes a cheap fingerprint of a file from its size, its modification 
+    time and a hash of its first and last sample_size bytes, so large files do not have 
+    to be read in full.
+
+    Args:
+    path (str): Path of the file.
+    sample_size (int): Number of bytes hashed at the start and at the end of the file.
+
+    Returns:
+    fingerprint (str): A hexadecimal fingerprint of the file.
+    """
+    
+    file_stat = os.stat(path)
+    digest = hashlib.sha256(f"{file_stat.st_size}:{file_stat.st_mtime_ns}".encode('utf-8'))
+    with open(path, 'rb') as source_file:
+        digest.update(source_file.read(sample_size))
+        if file_stat.st_size > sample_size:
+            source_file.seek(max(file_stat.st_size - sample_size, sample_size))
+            digest.update(source_file.read())
+    
+    return digest.hexdigest()
+
+
+def write_arrow_table(table_df, path):
+    """
+    This function writes a DataFrame to an uncompressed Arrow IPC file, which can be 
+    memory-mapped by read_arrow_table. Requires pyarrow.
+
+    Args:
+    table_df (DataFrame): The table to write.
+    path (str): Path of the Arrow file.
+
+    Returns:
+    None
+    """
+    
+    # pyarrow is an optional dependency, only needed by the columnar cache
+    import pyarrow as pa
+    
+    arrow_table = pa.Table.from_pandas(table_df, preserve_index=False)
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    os.replace(path + '.tmp', path)
+
+
+def read_arrow_table(path):
+    """
+    This function reads an Arrow IPC file written by write_arrow_table through a memory 
+    map, so the numeric columns are not copied by the read.
+
+    Args:
+    path (str): Path of the Arrow file.
+
+    Returns:
+    table_df (DataFrame): The table.
+    """
+    
+    import pyarrow as pa
+    
+    with pa.memory_map(path, 'r') as source:
+        arrow_table = pa.ipc.open_file(source).read_all()
+    
+    return arrow_table.to_pandas(split_blocks=True)
+
+
+@instrument_stage
+def load_cleaned_tables(path="Book_Details.csv", cache_dir="Data/cache", force=False, optimize=False):
+    """
+    This function returns the six tables, reading them from a columnar cache when possible. 
+    The cleaned tables (and the parsed source) are stored as Arrow IPC files in cache_dir, 
+    together with a manifest holding the fingerprint of the source file and of each stage. 
+    On a warm start the tables are memory-mapped instead of parsing the CSV again; a stage 
+    is only recomputed when the source file or the version of the stage changed.
+
+    Args:
+    path (str): Path of the Book_Details CSV file.
+    cache_dir (str): Directory of the columnar cache.
+    force (bool): Whether to recompute every stage even if the cache is valid.
+    optimize (bool): Whether to convert the tables to compact dtypes (see optimize_dtypes).
+
+    Returns:
+    tables (dict): The tables keyed by table name, in foreign-key order.
+    """
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        try:
+            with open(manifest_path, encoding='utf-8') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            # An unreadable manifest is treated as empty: every stage is rebuilt
+            manifest = {}
+    
+    source_fingerprint = fingerprint_file(path)
+    source_path = os.path.join(cache_dir, 'Book_Details.arrow')
+    df = None
+    
+    def load_source():
+        # Parse the CSV only if the cached copy of the source is stale
+        if manifest.get('source') == source_fingerprint and os.path.exists(source_path):
+            return read_arrow_table(source_path)
+        source_df = load_book_details(path)
+        write_arrow_table(source_df, source_path)
+        manifest['source'] = source_fingerprint
+        return source_df
+    
+    tables = {}
+    stages = manifest.setdefault('stages', {})
+    for stage_name, (stage_function, stage_version) in TABLE_STAGES.items():
+        stage_fingerprint = f"{source_fingerprint}:{stage_version}"
+        stage_paths = {table_name: os.path.join(cache_dir, f"{table_name}.arrow") 
+                       for table_name in stages.get(stage_name, {}).get('tables', [])}
+        
+        if (stages.get(stage_name, {}).get('fingerprint') == stage_fingerprint 
+                and stage_paths and all(os.path.exists(table_path) for table_path in stage_paths.values())):
+            # Warm start: memory-map the cached tables of the stage
+            for table_name, table_path in stage_paths.items():
+                tables[table_name] = read_arrow_table(table_path)
+        else:
+            if df is None:
+                df = load_source()
+            stage_tables = stage_function(df)
+            for table_name, table_df in stage_tables.items():
+                write_arrow_table(table_df, os.path.join(cache_dir, f"{table_name}.arrow"))
+            tables.update(stage_tables)
+            stages[stage_name] = {'fingerprint': stage_fingerprint, 'tables': list(stage_tables)}
+    
+    # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    tables = link_child_tables({table_name: tables[table_name] for table_name in TABLE_NAMES})
+    
+    if optimize:
+        tables = optimize_tables(tables)
+    
+    return tables
+
+
+# Columns of the source file that define the content of a book
+BOOK_SOURCE_COLUMNS = ['book_id', 'book_title', 'book_details', 'publication_info', 'num_ratings', 
+                       'num_reviews', 'average_rating', 'rating_distribution', 'author', 'authorlink', 
+                       'format', 'genres']
+
+# Key mappings persisted between incremental runs, with their columns
+ETL_STATE_FILES = {
+    'authors': ['author', 'authorlink', 'author_id'],
+    'formats': ['format', 'format_id', 'valid'],
+    'genres': ['genre', 'genre_id'],
+    'books': ['book_id', 'row_hash'],
+}
+
+
+def load_etl_state(state_dir="etl_state"):
+    """
+    This function reads the key mappings saved by save_etl_state: the ID of every author, 
+    raw format string and genre, and the content hash of every book of the last run. 
+    Missing files give empty mappings, which is the state of a first run.
+
+    Args:
+    state_dir (str): Directory where the state is stored.
+
+    Returns:
+    state (dict): One DataFrame per mapping ('authors', 'formats', 'genres', 'books').
+    """
+    
+    state = {}
+    for name, columns in ETL_STATE_FILES.items():
+        path = os.path.join(state_dir, f"{name}.csv")
+        if os.path.exists(path):
+            state[name] = pd.read_csv(path, keep_default_na=False, na_values=[''])
+        else:
+            state[name] = pd.DataFrame({column: pd.Series(dtype='int64' if column.endswith('_id') or column == 'row_hash' 
+                                                          else object) for column in columns})
+    return state
+
+
+def save_etl_state(state, state_dir="etl_state"):
+    """
+    This function writes the key mappings of an incremental run to state_dir, so the next 
+    run reuses the same IDs. It should be called once the delta has been applied.
+
+    Args:
+    state (dict): The 'state' entry of the delta returned by build_incremental_delta.
+    state_dir (str): Directory where the state is stored.
+
+    Returns:
+    None
+    """
+    
+    os.makedirs(state_dir, exist_ok=True)
+    for name, columns in ETL_STATE_FILES.items():
+        # Write to a temporary file first so an interrupted run never leaves a truncated mapping
+        path = os.path.join(state_dir, f"{name}.csv")
+        state[name][columns].to_csv(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+
+def assign_new_ids(values, mapping_df, value_column, id_column):
+    """
+    This function gives the next free IDs to the values that are not in a key mapping yet, 
+    keeping the IDs of the values already in it.
+
+    Args:
+    values (Series): The values that need an ID.
+    mapping_df (DataFrame): The current mapping, with value_column and id_column.
+    value_column (str): The name of the value column of the mapping.
+    id_column (str): The name of the ID column of the mapping.
+
+    Returns:
+    new_rows (DataFrame): The new values with their IDs.
+    """
+    
+    new_values = pd.Series(values.dropna().unique())
+    new_values = new_values[~new_values.isin(mapping_df[value_column])].reset_index(drop=True)
+    next_id = int(mapping_df[id_column].max()) + 1 if not mapping_df.empty else 1
+    
+    return pd.DataFrame({value_column: new_values, id_column: np.arange(next_id, next_id + len(new_values))})
+
+
+@instrument_stage
+def build_incremental_delta(df, state_dir="etl_state"):
+    """
+    This function compares the source DataFrame with the state of the previous run and 
+    builds only the changes to apply to the database. Author, format and genre IDs are 
+    taken from the persisted mappings, so existing rows keep their IDs, and new values get 
+    the next free IDs. Books are compared through a hash of their source columns, and known 
+    authors through their link.
+
+    Args:
+    df (DataFrame): The original DataFrame containing all the data.
+    state_dir (str): Directory where the state of the previous run is stored.
+
+    Returns:
+    delta (dict): 'upserts' (new rows of each table, keyed by table name, including the new 
+    and changed books), 'updates' (the known 'Authors' whose authorlink changed), 'deletes' 
+    (book IDs to remove, and 'changed_book_ids' whose rows are replaced), 'counts' (number 
+    of new, changed, deleted and unchanged books, and of updated authors) and 'state' (the 
+    mappings to save with save_etl_state once the delta is applied).
+    """
+    
+    state = load_etl_state(state_dir)
+    df = df.drop_duplicates(subset=['book_id'], keep='first').reset_index(drop=True)
+    
+    # 1. New authors, and known authors whose link changed
+    authorlinks = df[['author', 'authorlink']].drop_duplicates(subset=['author'])
+    new_authors = assign_new_ids(df['author'], state['authors'], 'author', 'author_id')
+    new_authors = new_authors.merge(authorlinks, on='author', how='left')
+    previous_links = state['authors']['authorlink']
+    current_links = state['authors']['author'].map(dict(zip(authorlinks['author'], authorlinks['authorlink'])))
+    is_relinked = (state['authors']['author'].isin(authorlinks['author']) & (current_links != previous_links)
+                   & ~(current_links.isna() & previous_links.isna()))
+    updated_authors = state['authors'].loc[is_relinked, ['author_id', 'author']].assign(
+        authorlink=current_links[is_relinked])
+    authors_map = pd.concat([state['authors'].assign(authorlink=previous_links.where(~is_relinked, current_links)), 
+                             new_authors], ignore_index=True)
+    
+    # 2. New formats, cleaned with format_format_table; unparseable ones are kept as invalid
+    new_formats = assign_new_ids(df['format'], state['formats'], 'format', 'format_id')
+    if not new_formats.empty:
+        cleaned_formats = format_format_table(new_formats.copy())
+    else:
+        cleaned_formats = pd.DataFrame(columns=['format_id', 'num_pages', 'book_format'])
+    new_formats['valid'] = new_formats['format_id'].isin(cleaned_formats['format_id'])
+    formats_map = pd.concat([state['formats'], new_formats], ignore_index=True)
+    
+    # 3. New individual genres
+    book_genres = split_genres(df['genres'])
+    book_genres = book_genres[book_genres['genre'] != '']
+    new_genres = assign_new_ids(book_genres['genre'], state['genres'], 'genre', 'genre_id')
+    genres_map = pd.concat([state['genres'], new_genres], ignore_index=True)
+    
+    # 4. Books with a valid format, and their content hash
+    valid_format_ids = set(formats_map.loc[formats_map['valid'].astype(bool), 'format_id'])
+    format_ids = df['format'].map(dict(zip(formats_map['format'], formats_map['format_id'])))
+    is_valid = format_ids.isin(valid_format_ids)
+    row_hashes = pd.util.hash_pandas_object(df[BOOK_SOURCE_COLUMNS], index=False).to_numpy().view('int64')
+    current = pd.DataFrame({'book_id': df['book_id'], 'row_hash': row_hashes})[is_valid]
+    
+    # 5. Compare with the hashes of the previous run
+    previous_hashes = dict(zip(state['books']['book_id'], state['books']['row_hash']))
+    previous_hash = current['book_id'].map(previous_hashes)
+    is_new = previous_hash.isna()
+    is_changed = ~is_new & (previous_hash != current['row_hash'])
+    deleted_book_ids = sorted(set(previous_hashes) - set(current['book_id']))
+    changed_book_ids = current.loc[is_changed, 'book_id'].tolist()
+    upsert_rows = df.loc[current.index[(is_new | is_changed).to_numpy()]]
+    
+    # 6. Rows of the new and changed books
+    books_df = upsert_rows[['book_id', 'book_title', 'book_details', 'publication_info', 'num_ratings', 
+                            'num_reviews', 'average_rating', 'rating_distribution']].copy()
+    books_df['author_id'] = upsert_rows['author'].map(dict(zip(authors_map['author'], authors_map['author_id'])))
+    books_df['format_id'] = format_ids[upsert_rows.index]
+    
+    book_genres_df = book_genres[book_genres['row'].isin(upsert_rows.index)].copy()
+    book_genres_df['book_id'] = df['book_id'].to_numpy()[book_genres_df['row']]
+    book_genres_df['genre_id'] = book_genres_df['genre'].map(dict(zip(genres_map['genre'], genres_map['genre_id'])))
+    book_genres_df = book_genres_df[['book_id', 'genre_id']].drop_duplicates()
+    
+    ratings_df = create_ratings_table(upsert_rows)
+    
+    return {
+        'upserts': {
+            'Authors': new_authors,
+            'Formats': cleaned_formats,
+            'Genres': new_genres,
+            'Books': books_df,
+            'Book_Genres': book_genres_df,
+            'Ratings': ratings_df,
+        },
+        'updates': {
+            'Authors': updated_authors.reset_index(drop=True),
+        },
+        'deletes': {
+            'book_ids': deleted_book_ids,
+            'changed_book_ids': changed_book_ids,
+        },
+        'counts': {
+            'new': int(is_new.sum()),
+            'changed': len(changed_book_ids),
+            'deleted': len(deleted_book_ids),
+            'unchanged': int(len(current) - is_new.sum() - len(changed_book_ids)),
+            'updated_authors': len(updated_authors),
+        },
+        'state': {
+            'authors': authors_map,
+            'formats': formats_map,
+            'genres': genres_map,
+            'books': current,
+        },
+    }
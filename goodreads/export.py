@@ -0,0 +1,229 @@
+"""
+Export part of the Goodreads analysis: the extracts of `DataFrames used for Tableau/`
+produced from the analytics functions of goodreads.database in one run. The extracts are
+queried and written in parallel as compressed, typed Parquet files (and optionally as
+compressed CSV files), and an extract whose content did not change since the previous
+export is not rewritten, so the BI refresh only re-ingests the files that moved.
+
+Parquet files require pyarrow.
+"""
+
+import pandas as pd
+import os
+import time
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from goodreads.database import (get_worker_engine, get_top_books_5_stars, get_highest_rated_books, get_best_authors,
+                                get_most_in_demand_book_formats, get_avg_rating_by_genre,
+                                get_num_pages_avg_rating, get_top_books_by_avg_rating, ALL_ROWS)
+
+
+# The Tableau extracts: file name (without extension), data function, its arguments, the
+# columns written (None for all) and whether the data function can read from the summary tables
+TABLEAU_EXTRACTS = [
+    ('highest_rated_books_5_stars', get_top_books_5_stars, {'min_ratings': 1000, 'limit': ALL_ROWS},
+     ['book_title', 'author', 'num_ratings', 'average_rating', '5_star_reviews'], False),
+    ('high_rated_books_low_number_reviews', get_highest_rated_books,
+     {'min_ratings': 30, 'max_ratings': 100, 'limit': ALL_ROWS}, None, False),
+    ('best_authors', get_best_authors, {'min_books': 10, 'min_rating': 4, 'limit': ALL_ROWS}, None, True),
+    ('best_formats', get_most_in_demand_book_formats, {'limit': ALL_ROWS}, None, True),
+    ('best_genres_clean', get_avg_rating_by_genre, {'min_books': 500, 'min_rating': 4, 'limit': ALL_ROWS}, None, True),
+    ('num_pages_avg_rating', get_num_pages_avg_rating, {}, None, True),
+    ('highest_avg_rating', get_top_books_by_avg_rating, {'min_ratings': 300, 'limit': ALL_ROWS}, None, False),
+]
+
+
+def hash_extract(extract_df):
+    """
+    This function computes the content hash of an extract from its column names, its dtypes
+    and the hash of every row (pandas.util.hash_pandas_object), so the hash only changes
+    when the data written to the files would change.
+    
+    Args:
+    extract_df (DataFrame): The extract.
+    
+    Returns:
+    content_hash (str): A hexadecimal SHA-256 of the extract.
+    """
+    
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in extract_df.dtypes.items()]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(extract_df, index=False).to_numpy().tobytes())
+    
+    return digest.hexdigest()
+
+
+def write_parquet(extract_df, path, compression='zstd'):
+    """
+    This function writes an extract to a compressed Parquet file, keeping the dtypes of its
+    columns. The file is written next to its final path and then renamed, so Tableau never
+    reads a half-written extract. Requires pyarrow.
+    
+    Args:
+    extract_df (DataFrame): The extract.
+    path (str): Path of the Parquet file.
+    compression (str): Parquet compression codec ('zstd', 'snappy', 'gzip' or 'none').
+    
+    Returns:
+    None
+    """
+    
+    # pyarrow is an optional dependency, only needed by the Parquet extracts
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    arrow_table = pa.Table.from_pandas(extract_df, preserve_index=False)
+    pq.write_table(arrow_table, path + '.tmp', compression=compression)
+    os.replace(path + '.tmp', path)
+
+
+def write_csv(extract_df, path, compression='gzip'):
+    """
+    This function writes an extract to a CSV file, compressed unless compression is None,
+    through a temporary file renamed at the end like write_parquet.
+    
+    Args:
+    extract_df (DataFrame): The extract.
+    path (str): Path of the CSV file.
+    compression (str): Compression of pandas.DataFrame.to_csv ('gzip', 'zstd', ...) or None.
+    
+    Returns:
+    None
+    """
+    
+    extract_df.to_csv(path + '.tmp', index=False, compression=compression)
+    os.replace(path + '.tmp', path)
+
+
+def extract_paths(output_dir, name, csv=False, csv_compression='gzip'):
+    """
+    This function returns the paths of the files of an extract.
+    
+    Args:
+    output_dir (str): Directory of the extracts.
+    name (str): Name of the extract.
+    csv (bool): Whether a CSV file is written next to the Parquet file.
+    csv_compression (str): Compression of the CSV file, or None.
+    
+    Returns:
+    paths (dict): The paths keyed by format ('parquet' and possibly 'csv').
+    """
+    
+    paths = {'parquet': os.path.join(output_dir, f"{name}.parquet")}
+    if csv:
+        extension = {None: '', 'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst', 'zip': '.zip'}
+        paths['csv'] = os.path.join(output_dir, f"{name}.csv{extension.get(csv_compression, '.' + str(csv_compression))}")
+    
+    return paths
+
+
+def export_extract(engine, output_dir, name, data_function, arguments, columns, previous, use_summaries=False,
+                   cache=None, compression='zstd', csv=False, csv_compression='gzip'):
+    """
+    This function runs the query of one extract and writes its files, unless the content
+    hash of the extract and the settings of the files are the ones recorded in the manifest
+    by the previous export and the files still exist.
+    
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    output_dir (str): Directory of the extracts.
+    name (str): Name of the extract.
+    data_function (function): The get_* function returning the data of the extract.
+    arguments (dict): Keyword arguments of the data function.
+    columns (list): Columns written, or None for all of them.
+    previous (dict): The manifest entry of the extract from the previous export, or None.
+    use_summaries (bool): Whether the data function reads from the summary tables.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    compression (str): Parquet compression codec.
+    csv (bool): Whether to also write a CSV file.
+    csv_compression (str): Compression of the CSV file, or None.
+    
+    Returns:
+    entry (dict): The manifest entry of the extract (hash, settings, files and rows), with
+    its status ('written' or 'unchanged') and the seconds spent on the query and on writing.
+    """
+    
+    # 1. Query the extract
+    start = time.perf_counter()
+    if use_summaries:
+        arguments = dict(arguments, use_summaries=True)
+    extract_df = data_function(engine, cache=cache, **arguments)
+    if columns is not None:
+        extract_df = extract_df[columns]
+    query_seconds = time.perf_counter() - start
+    
+    # 2. Compare its content and settings with the previous export
+    content_hash = hash_extract(extract_df)
+    settings = {'compression': compression, 'csv': csv, 'csv_compression': csv_compression if csv else None}
+    paths = extract_paths(output_dir, name, csv, csv_compression)
+    unchanged = (previous is not None and previous.get('hash') == content_hash
+                 and previous.get('settings') == settings
+                 and all(os.path.exists(path) for path in paths.values()))
+    
+    # 3. Write the files of the extract if it moved
+    start = time.perf_counter()
+    if not unchanged:
+        write_parquet(extract_df, paths['parquet'], compression=compression)
+        if csv:
+            write_csv(extract_df, paths['csv'], compression=csv_compression)
+    write_seconds = time.perf_counter() - start
+    
+    return {'hash': content_hash, 'settings': settings, 'files': [os.path.basename(path) for path in paths.values()],
+            'rows': len(extract_df), 'status': 'unchanged' if unchanged else 'written',
+            'query_seconds': query_seconds, 'write_seconds': write_seconds}
+
+
+def export_tableau_extracts(engine=None, output_dir="DataFrames used for Tableau", max_workers=8, use_summaries=False,
+                            cache=None, compression='zstd', csv=False, csv_compression='gzip', force=False):
+    """
+    This function produces every Tableau extract in one run. Each extract runs its query,
+    hashes its content and writes its files in its own thread (at most max_workers at once).
+    The content hash of every extract is kept in the manifest.json of output_dir, and an
+    extract whose hash did not change since the previous export is not rewritten, so its
+    files keep their modification time.
+    
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database. By default the shared
+    engine of get_worker_engine, for max_workers threads.
+    output_dir (str): Directory of the extracts.
+    max_workers (int): Maximum number of extracts exported (and connections used) at once.
+    use_summaries (bool): Whether to read from the summary tables where possible.
+    cache (QueryCache): Optional cache of query results, see run_query.
+    compression (str): Parquet compression codec ('zstd', 'snappy', 'gzip' or 'none').
+    csv (bool): Whether to also write every extract as a CSV file.
+    csv_compression (str): Compression of the CSV files ('gzip', 'zstd', ...) or None.
+    force (bool): Whether to rewrite every extract even if its content did not change.
+    
+    Returns:
+    report (DataFrame): The name, status, rows, files, query and write seconds of each extract.
+    """
+    
+    if engine is None:
+        engine = get_worker_engine(max_workers)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(export_extract, engine, output_dir, name, data_function, arguments, columns,
+                                         manifest.get(name), use_summaries and supports_summaries, cache,
+                                         compression, csv, csv_compression)
+                   for name, data_function, arguments, columns, supports_summaries in TABLEAU_EXTRACTS}
+        entries = {name: future.result() for name, future in futures.items()}
+    
+    # Only the hash, settings, files and rows of the extracts are kept between exports
+    manifest = {name: {key: entry[key] for key in ['hash', 'settings', 'files', 'rows']}
+                for name, entry in entries.items()}
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    
+    report = pd.DataFrame([{'name': name, **entry} for name, entry in entries.items()])
+    
+    return report[['name', 'status', 'rows', 'files', 'query_seconds', 'write_seconds']]
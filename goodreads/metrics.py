@@ -0,0 +1,333 @@
+"""
+Runtime instrumentation of the Goodreads analysis: wall time, rows and peak memory of the
+ETL stages, and latency, rows and bytes of the SQL statements sent through an instrumented
+engine. The metrics can be read as a dictionary, written as a JSON run report, or written
+as a Prometheus text-format file (for the node_exporter textfile collector).
+
+Only the standard library is imported here; SQLAlchemy is imported by instrument_engine.
+"""
+
+import os
+import time
+import json
+import socket
+import hashlib
+import threading
+import tracemalloc
+import functools
+from collections import deque
+
+
+# Prometheus metrics of the statements: aggregate field, metric name, type and help text
+QUERY_METRICS = [
+    ('count', 'query_executions_total', 'counter', "Number of executions of the statement."),
+    ('seconds_sum', 'query_seconds_total', 'counter', "Total latency of the statement."),
+    ('seconds_max', 'query_seconds_max', 'gauge', "Slowest execution of the statement."),
+    ('rows_sum', 'query_rows_total', 'counter', "Rows returned by the statement."),
+    ('bytes_sum', 'query_bytes_total', 'counter', "Bytes fetched by the statement."),
+]
+
+
+class MetricsRegistry:
+    """
+    This class collects the metrics of a run. Stage measurements are kept one by one,
+    query measurements are aggregated per SQL statement (plus the most recent ones), so
+    the registry stays small in long-running processes. It is safe to use from several
+    threads. Metrics recorded in worker processes are not sent back to the parent.
+    
+    Args:
+    profile_memory (bool): Whether instrumented stages measure their peak memory with
+    tracemalloc (which slows Python code down).
+    recent_queries (int): Number of individual query measurements kept.
+    """
+    
+    def __init__(self, profile_memory=False, recent_queries=1000):
+        self.profile_memory = profile_memory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._recent_queries = recent_queries
+        self.reset()
+    
+    def reset(self):
+        # Forget every metric recorded so far and start a new run
+        with self._lock:
+            self.started = time.time()
+            self.stages = []
+            self.statements = {}
+            self.queries = deque(maxlen=self._recent_queries)
+            self.counters = {}
+    
+    def record_stage(self, stage, seconds, rows_in=None, rows_out=None, peak_bytes=None):
+        # Record one run of an ETL stage
+        with self._lock:
+            self.stages.append({'stage': stage, 'started': time.time() - seconds, 'seconds': seconds,
+                                'rows_in': rows_in, 'rows_out': rows_out, 'peak_bytes': peak_bytes})
+    
+    def record_query(self, statement, seconds, rows=None):
+        # Record one execution of a SQL statement and remember it as the last query of the thread
+        statement = ' '.join(str(statement).split())
+        statement_id = hashlib.sha1(statement.encode('utf-8')).hexdigest()[:12]
+        record = {'statement_id': statement_id, 'seconds': seconds, 'rows': rows, 'bytes': None}
+        with self._lock:
+            aggregate = self.statements.setdefault(statement_id, {
+                'statement': statement, 'count': 0, 'seconds_sum': 0.0, 'seconds_max': 0.0,
+                'rows_sum': 0, 'bytes_sum': 0})
+            aggregate['count'] += 1
+            aggregate['seconds_sum'] += seconds
+            aggregate['seconds_max'] = max(aggregate['seconds_max'], seconds)
+            aggregate['rows_sum'] += max(rows or 0, 0)
+            self.queries.append(record)
+        self._local.last_query = record
+    
+    def record_fetch(self, rows, num_bytes):
+        # Add the rows and bytes fetched by the caller to the last query of the current thread
+        record = getattr(self._local, 'last_query', None)
+        if record is None:
+            return
+        with self._lock:
+            aggregate = self.statements[record['statement_id']]
+            # The rows reported by the driver (-1 for most SELECT statements) are replaced
+            aggregate['rows_sum'] += rows - max(record['rows'] or 0, 0)
+            aggregate['bytes_sum'] += num_bytes
+            record['rows'] = rows
+            record['bytes'] = num_bytes
+        self._local.last_query = None
+    
+    def increment(self, counter, amount=1):
+        # Add an amount to a named counter
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+    
+    def snapshot(self):
+        """
+        This method returns the metrics recorded so far.
+    
+        Returns:
+        metrics (dict): The run information, the stage runs, the queries aggregated per
+        statement, the most recent queries and the counters.
+        """
+        with self._lock:
+            return {
+                'run': {'host': socket.gethostname(), 'pid': os.getpid(), 'started': self.started,
+                        'finished': time.time()},
+                'stages': [dict(stage) for stage in self.stages],
+                'statements': {statement_id: dict(aggregate) for statement_id, aggregate in self.statements.items()},
+                'recent_queries': [dict(query) for query in self.queries],
+                'counters': dict(self.counters),
+            }
+    
+    def write_json(self, path):
+        # Write the snapshot of the metrics as a JSON run report
+        write_atomically(path, json.dumps(self.snapshot(), indent=2))
+    
+    def to_prometheus(self, prefix='goodreads'):
+        """
+        This method formats the metrics in the Prometheus text exposition format. Stages
+        report their latest run; statements report totals since the start of the run.
+    
+        Args:
+        prefix (str): Prefix of the metric names.
+    
+        Returns:
+        text (str): The metrics, one sample per line.
+        """
+        metrics = self.snapshot()
+        latest_stages = {stage['stage']: stage for stage in metrics['stages']}
+        runs = {}
+        for stage in metrics['stages']:
+            runs[stage['stage']] = runs.get(stage['stage'], 0) + 1
+    
+        families = [
+            (f'{prefix}_stage_seconds', 'gauge', "Wall time of the latest run of the stage.",
+             [({'stage': name}, stage['seconds']) for name, stage in latest_stages.items()]),
+            (f'{prefix}_stage_rows_in', 'gauge', "Input rows of the latest run of the stage.",
+             [({'stage': name}, stage['rows_in']) for name, stage in latest_stages.items()]),
+            (f'{prefix}_stage_rows_out', 'gauge', "Output rows of the latest run of the stage.",
+             [({'stage': name}, stage['rows_out']) for name, stage in latest_stages.items()]),
+            (f'{prefix}_stage_peak_bytes', 'gauge', "Peak memory allocated during the latest run of the stage.",
+             [({'stage': name}, stage['peak_bytes']) for name, stage in latest_stages.items()]),
+            (f'{prefix}_stage_runs_total', 'counter', "Number of runs of the stage.",
+             [({'stage': name}, count) for name, count in runs.items()]),
+        ]
+        for field, name, kind, help_text in QUERY_METRICS:
+            families.append((f'{prefix}_{name}', kind, help_text,
+                             [({'statement_id': statement_id, 'statement': aggregate['statement'][:80]},
+                               aggregate[field])
+                              for statement_id, aggregate in metrics['statements'].items()]))
+        families.append((f'{prefix}_events_total', 'counter', "Named event counters.",
+                         [({'event': counter}, value) for counter, value in metrics['counters'].items()]))
+    
+        lines = []
+        for name, kind, help_text, samples in families:
+            samples = [(labels, value) for labels, value in samples if value is not None]
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+    
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path, prefix='goodreads'):
+        # Write the metrics as a Prometheus text-format file
+        write_atomically(path, self.to_prometheus(prefix))
+
+
+# Metrics of the current process, used by default by the instrumented functions
+METRICS = MetricsRegistry()
+
+
+def escape_label(value):
+    """
+    This function escapes the backslashes, quotes and new lines of a Prometheus label value.
+    
+    Args:
+    value: The label value.
+    
+    Returns:
+    escaped (str): The value, ready to be written between double quotes.
+    """
+    
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_atomically(path, content):
+    """
+    This function writes a text file through a temporary file renamed at the end, so
+    readers such as the Prometheus textfile collector never see it half written.
+    
+    Args:
+    path (str): Path of the file.
+    content (str): Text to write.
+    
+    Returns:
+    None
+    """
+    
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(temporary_path, path)
+
+
+def count_rows(value):
+    """
+    This function counts the rows of a stage input or output: the length of a DataFrame,
+    Series or array, the total of a tuple or dict of them, or None for anything else.
+    
+    Args:
+    value: The input or output of a stage.
+    
+    Returns:
+    rows (int): The number of rows, or None.
+    """
+    
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        counts = [count_rows(item) for item in value]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    if getattr(value, 'ndim', 0) >= 1:
+        return len(value)
+    return None
+
+
+# Peak of memory reached by the enclosing stages before a nested stage reset it
+_peak_carry = threading.local()
+
+
+def instrument_stage(function=None, name=None, registry=None):
+    """
+    This decorator records the wall time, the rows in (the first DataFrame argument) and
+    out (the returned DataFrames) and, when the registry profiles memory, the peak memory
+    allocated during every call of an ETL function.
+    
+    Args:
+    function (function): The function to instrument.
+    name (str): Name of the stage. Defaults to the name of the function.
+    registry (MetricsRegistry): Where the metrics are recorded. Defaults to METRICS.
+    
+    Returns:
+    wrapper (function): The instrumented function.
+    """
+    
+    if function is None:
+        return functools.partial(instrument_stage, name=name, registry=registry)
+    
+    stage = name or function.__name__
+    
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        metrics = registry or METRICS
+        rows_in = next((rows for rows in map(count_rows, args) if rows is not None), None)
+    
+        # 1. Start tracing memory, or reset the peak of the tracing started by an enclosing stage
+        profile = metrics.profile_memory
+        started_tracing = False
+        if profile:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            carried_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            outer_carry = getattr(_peak_carry, 'value', 0)
+            _peak_carry.value = 0
+    
+        # 2. Run the stage
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = None
+            if profile:
+                peak = max(tracemalloc.get_traced_memory()[1], _peak_carry.value)
+                peak_bytes = peak - baseline
+                # Let the enclosing stage know about the peak it did not see
+                _peak_carry.value = max(outer_carry, carried_peak, peak)
+                if started_tracing:
+                    tracemalloc.stop()
+                    _peak_carry.value = 0
+    
+        # 3. Record the measurement
+        metrics.record_stage(stage, seconds, rows_in=rows_in, rows_out=count_rows(result), peak_bytes=peak_bytes)
+    
+        return result
+    
+    return wrapper
+
+
+def instrument_engine(engine, registry=None):
+    """
+    This function hooks the SQLAlchemy events of an engine so the latency and the rows
+    reported by the driver of every statement it executes are recorded. The rows and bytes
+    actually fetched are added by the code that fetches them (see run_query).
+    
+    Args:
+    engine (Engine): The SQLAlchemy engine to instrument.
+    registry (MetricsRegistry): Where the metrics are recorded. Defaults to METRICS.
+    
+    Returns:
+    engine (Engine): The same engine.
+    """
+    
+    from sqlalchemy import event
+    
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('query_start', []).append(time.perf_counter())
+    
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - connection.info['query_start'].pop()
+        (registry or METRICS).record_query(statement, seconds, rows=cursor.rowcount)
+    
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    
+    return engine
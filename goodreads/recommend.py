@@ -0,0 +1,439 @@
+"""
+Book recommendations of the Goodreads analysis: every book is described by a vector
+combining its genres and the shape of its rating distribution, so "books like this" and
+"best candidates in these genres" queries are answered with matrix products over the
+catalog instead of loops over the books.
+
+- The genres of a book are IDF-weighted (rare genres say more about a book than 'Fiction').
+  They are stored sparsely, by book and by genre, and densified a chunk of books at a time.
+- The rating shape is the share of each star in the reviews of the book, centered on the
+  catalog, so polarizing books are close to other polarizing books.
+- A small embedding of each book (its genres projected on the principal components of the
+  genre co-occurrences, plus its rating shape) is grouped in clusters, an inverted-file
+  index: a query only scores the books of the clusters closest to it, with the exact
+  similarity. Neighbours of every book can also be precomputed.
+
+Only pandas and NumPy are imported here.
+"""
+
+import pandas as pd
+import numpy as np
+
+from goodreads.etl import STAR_COLUMNS, add_rating_stats
+
+
+def normalize_rows(matrix):
+    """
+    This function scales every row of a matrix to unit length, so dot products between
+    rows are cosine similarities. Rows of zeros stay zero.
+    
+    Args:
+    matrix (ndarray): The vectors, one per row.
+    
+    Returns:
+    normalized (ndarray): The unit-length vectors.
+    """
+    
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def top_k(scores, k):
+    """
+    This function finds the k highest scores of every row of a matrix, partitioning before
+    sorting so only k values per row are sorted.
+    
+    Args:
+    scores (ndarray): The scores, one row per query.
+    k (int): Number of scores to keep per row.
+    
+    Returns:
+    columns (ndarray): The columns of the best scores of each row, best first.
+    best_scores (ndarray): The best scores of each row, best first.
+    """
+    
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), dtype='int64'), np.zeros((scores.shape[0], 0), dtype=scores.dtype)
+    columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, columns, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(columns, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class RecommendationIndex:
+    """
+    This class embeds the books of the cleaned tables and answers recommendation queries:
+    similar books (similar, similar_many, precompute_neighbours) and the best books of a
+    set of genres (best_in_genres).
+    
+    Args:
+    dimensions (int): Number of principal components of the genres in the embeddings used 
+    to cluster the books.
+    rating_weight (float): Weight of the rating shape in the similarity, from 0 to 1; the
+    genres get the rest.
+    clusters (int): Number of clusters of the inverted-file index. Defaults to the square
+    root of the number of books.
+    probes (int): Number of clusters scanned by an approximate query.
+    chunk_size (int): Number of books processed at once by the matrix operations.
+    seed (int): Seed of the clustering.
+    """
+    
+    def __init__(self, dimensions=48, rating_weight=0.25, clusters=None, probes=8, chunk_size=20000, seed=0):
+        self.dimensions = dimensions
+        self.rating_weight = rating_weight
+        self.clusters = clusters
+        self.probes = probes
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.neighbours = None
+    
+    @classmethod
+    def build(cls, tables, **options):
+        """
+        This method embeds the books of the cleaned tables and builds the cluster index.
+    
+        Args:
+        tables (dict): The 'Books', 'Genres', 'Book_Genres' and 'Ratings' tables (see
+        etl.build_tables).
+        **options: The parameters of RecommendationIndex.
+    
+        Returns:
+        index (RecommendationIndex): The index of the books.
+        """
+        index = cls(**options)
+        index.fit(tables)
+        return index
+    
+    def fit(self, tables):
+        # Embed the books of the tables and cluster the embeddings
+        books_df = tables['Books'].drop_duplicates(subset=['book_id']).reset_index(drop=True)
+        self.book_ids = books_df['book_id'].to_numpy()
+        self.titles = books_df['book_title'].to_numpy(dtype=object)
+        self.num_ratings = books_df['num_ratings'].to_numpy(dtype='float64')
+        self.positions = pd.Index(self.book_ids)
+    
+        self.fit_genres(tables['Genres'], tables['Book_Genres'])
+        self.fit_ratings(tables['Ratings'])
+    
+        genre_part = normalize_rows(self.project_genres(np.arange(len(self.book_ids))))
+        self.embeddings = np.hstack([np.sqrt(1 - self.rating_weight) * genre_part,
+                                     np.sqrt(self.rating_weight) * self.rating_shapes]).astype('float32')
+        self.fit_clusters()
+        self.neighbours = None
+        return self
+    
+    def fit_genres(self, genres_df, book_genres_df):
+        """
+        This method builds the IDF-weighted genre vectors of the books, stored sparsely by
+        book and by genre, and the principal components of their co-occurrences.
+    
+        Args:
+        genres_df (DataFrame): The Genres table.
+        book_genres_df (DataFrame): The Book_Genres table.
+    
+        Returns:
+        None
+        """
+        self.genre_names = pd.Index(genres_df['genre'].astype(object).str.lower().to_numpy())
+        num_books, num_genres = len(self.book_ids), len(self.genre_names)
+    
+        # 1. (book position, genre code) pairs of the known books and genres
+        books = self.positions.get_indexer(book_genres_df['book_id'])
+        genres = pd.Index(genres_df['genre_id']).get_indexer(book_genres_df['genre_id'])
+        known = (books >= 0) & (genres >= 0)
+        pairs = pd.DataFrame({'book': books[known], 'genre': genres[known]}).drop_duplicates()
+        books, genres = pairs['book'].to_numpy(), pairs['genre'].to_numpy()
+    
+        # 2. IDF weights, normalized per book
+        book_counts = np.bincount(genres, minlength=num_genres)
+        self.idf = np.log((1 + num_books) / (1 + book_counts)) + 1
+        weights = self.idf[genres]
+        norms = np.sqrt(np.bincount(books, weights=weights ** 2, minlength=num_books))
+        weights = weights / norms[books]
+    
+        # 3. The same entries sorted by book (to embed books) and by genre (to filter by genre)
+        by_book = np.lexsort((genres, books))
+        self.book_offsets = np.concatenate([[0], np.cumsum(np.bincount(books, minlength=num_books))])
+        self.book_genres = genres[by_book]
+        self.book_genre_weights = weights[by_book]
+        by_genre = np.lexsort((books, genres))
+        self.genre_offsets = np.concatenate([[0], np.cumsum(book_counts)])
+        self.genre_books = books[by_genre]
+    
+        # 4. Principal components of the genre vectors, from their Gram matrix built chunk by chunk
+        gram = np.zeros((num_genres, num_genres))
+        for start in range(0, num_books, self.chunk_size):
+            chunk = self.genre_vectors(np.arange(start, min(start + self.chunk_size, num_books)))
+            gram += chunk.T @ chunk
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        self.components = eigenvectors[:, ::-1][:, :min(self.dimensions, num_genres)].astype('float32')
+    
+    def genre_entries(self, positions):
+        # Row in positions and index in the by-book arrays of every genre of the books at positions
+        counts = self.book_offsets[positions + 1] - self.book_offsets[positions]
+        rows = np.repeat(np.arange(len(positions)), counts)
+        entries = np.repeat(self.book_offsets[positions] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return rows, entries
+    
+    def genre_vectors(self, positions):
+        # Dense IDF-weighted genre vectors of the books at positions
+        vectors = np.zeros((len(positions), len(self.genre_names)), dtype='float32')
+        rows, entries = self.genre_entries(positions)
+        vectors[rows, self.book_genres[entries]] = self.book_genre_weights[entries]
+        return vectors
+    
+    def project_genres(self, positions):
+        # Genre vectors of the books at positions, projected on the principal components
+        projected = np.zeros((len(positions), self.components.shape[1]), dtype='float32')
+        for start in range(0, len(positions), self.chunk_size):
+            chunk = positions[start:start + self.chunk_size]
+            projected[start:start + len(chunk)] = self.genre_vectors(chunk) @ self.components
+        return projected
+    
+    def vectors(self, positions):
+        # Full vectors of the books at positions; their dot products are the similarities
+        return np.hstack([np.sqrt(1 - self.rating_weight) * self.genre_vectors(positions),
+                          np.sqrt(self.rating_weight) * self.rating_shapes[positions]]).astype('float32')
+    
+    def similarities(self, positions, position):
+        # Similarity of the books at positions with the book at position, from the sparse genres
+        query_genres = np.zeros(len(self.genre_names))
+        rows, entries = self.genre_entries(np.array([position]))
+        query_genres[self.book_genres[entries]] = self.book_genre_weights[entries]
+        rows, entries = self.genre_entries(positions)
+        genre_scores = np.bincount(rows, weights=self.book_genre_weights[entries] * query_genres[self.book_genres[entries]],
+                                   minlength=len(positions))
+        rating_scores = self.rating_shapes[positions] @ self.rating_shapes[position]
+        return ((1 - self.rating_weight) * genre_scores + self.rating_weight * rating_scores).astype('float32')
+    
+    def fit_ratings(self, ratings_df):
+        """
+        This method computes the Bayesian rating of the books and the shape of their
+        rating distribution (share of each star, centered on the catalog and normalized).
+    
+        Args:
+        ratings_df (DataFrame): The Ratings table.
+    
+        Returns:
+        None
+        """
+        ratings_df = add_rating_stats(ratings_df.drop_duplicates(subset=['book_id']))
+        rows = pd.Index(ratings_df['book_id']).get_indexer(self.book_ids)
+        known = rows >= 0
+    
+        counts = np.zeros((len(self.book_ids), len(STAR_COLUMNS)))
+        counts[known] = ratings_df[STAR_COLUMNS].to_numpy(dtype='float64')[rows[known]]
+        total = counts.sum(axis=1, keepdims=True)
+        shares = np.divide(counts, total, out=np.zeros_like(counts), where=total > 0)
+        reviewed = total[:, 0] > 0
+        if reviewed.any():
+            shares[reviewed] -= shares[reviewed].mean(axis=0)
+        self.rating_shapes = normalize_rows(shares)
+    
+        self.bayesian_ratings = np.full(len(self.book_ids), np.nan)
+        self.bayesian_ratings[known] = ratings_df['bayesian_rating'].to_numpy(dtype='float64')[rows[known]]
+    
+    def fit_clusters(self, iterations=10, sample_size=100000):
+        """
+        This method groups the embeddings in clusters with spherical k-means, trained on a
+        sample of the books, then assigns every book to its closest cluster.
+    
+        Args:
+        iterations (int): Number of k-means iterations.
+        sample_size (int): Maximum number of books the clusters are trained on.
+    
+        Returns:
+        None
+        """
+        rng = np.random.default_rng(self.seed)
+        num_books = len(self.embeddings)
+        num_clusters = int(min(self.clusters or max(1, np.sqrt(num_books)), max(num_books, 1)))
+        sample = self.embeddings[rng.choice(num_books, min(sample_size, num_books), replace=False)]
+    
+        centroids = sample[rng.choice(len(sample), num_clusters, replace=False)]
+        for _ in range(iterations):
+            labels = self.closest_clusters(sample, centroids)
+            # Sum of the members of each cluster, by sorting them by cluster
+            order = np.argsort(labels, kind='stable')
+            present, starts = np.unique(labels[order], return_index=True)
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            # Empty clusters restart from a random book
+            empty = np.setdiff1d(np.arange(num_clusters), present)
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = normalize_rows(sums)
+    
+        self.centroids = centroids
+        labels = self.closest_clusters(self.embeddings, centroids)
+        self.cluster_books = np.argsort(labels, kind='stable')
+        self.cluster_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=num_clusters))])
+    
+    def closest_clusters(self, vectors, centroids):
+        # Closest centroid of every vector, by chunks of vectors
+        labels = np.empty(len(vectors), dtype='int64')
+        for start in range(0, len(vectors), self.chunk_size):
+            labels[start:start + self.chunk_size] = np.argmax(vectors[start:start + self.chunk_size] @ centroids.T, axis=1)
+        return labels
+    
+    def candidates(self, vector, exact=False):
+        # Positions of the books of the clusters closest to the vector (every book when exact)
+        if exact or self.probes >= len(self.centroids):
+            return np.arange(len(self.embeddings))
+        probed = np.argsort(-(self.centroids @ vector))[:self.probes]
+        return np.concatenate([self.cluster_books[self.cluster_offsets[cluster]:self.cluster_offsets[cluster + 1]]
+                               for cluster in probed])
+    
+    def filter_mask(self, positions, genre=None, min_ratings=None, min_rating=None):
+        # Which of the books at positions match every filter given
+        mask = np.ones(len(positions), dtype=bool)
+        if genre is not None:
+            code = self.genre_names.get_indexer([genre.lower()])[0]
+            has_genre = np.zeros(len(self.book_ids), dtype=bool)
+            if code >= 0:
+                has_genre[self.genre_books[self.genre_offsets[code]:self.genre_offsets[code + 1]]] = True
+            mask &= has_genre[positions]
+        if min_ratings is not None:
+            mask &= self.num_ratings[positions] >= min_ratings
+        if min_rating is not None:
+            mask &= self.bayesian_ratings[positions] >= min_rating
+        return mask
+    
+    def describe(self, positions, scores, score_column='similarity'):
+        # Result rows of the books at positions
+        return pd.DataFrame({
+            'book_id': self.book_ids[positions],
+            'book_title': self.titles[positions],
+            'num_ratings': self.num_ratings[positions].astype('int64'),
+            'bayesian_rating': self.bayesian_ratings[positions],
+            score_column: scores,
+        })
+    
+    def similar(self, book_id, k=10, exact=False, **filters):
+        """
+        This method returns the books most similar to a book. Without filters, precomputed
+        neighbours are used when available; otherwise the books of the clusters closest to 
+        the book (or every book when exact) are scored with matrix-vector products.
+    
+        Args:
+        book_id (int): The book to find similar books for.
+        k (int): Number of books to return.
+        exact (bool): Whether to score every book instead of the closest clusters.
+        **filters: genre (str), min_ratings (int) and min_rating (Bayesian rating).
+    
+        Returns:
+        similar_books (DataFrame): 'book_id', 'book_title', 'num_ratings',
+        'bayesian_rating' and 'similarity' of the most similar books.
+        """
+        position = self.positions.get_indexer([book_id])[0]
+        if position < 0:
+            raise KeyError(f"Book {book_id} is not in the recommendation index")
+    
+        filters = {name: value for name, value in filters.items() if value is not None}
+        if self.neighbours is not None and not filters and k <= self.neighbours[0].shape[1]:
+            positions, scores = self.neighbours[0][position, :k], self.neighbours[1][position, :k]
+            return self.describe(positions, scores)
+    
+        positions = self.candidates(self.embeddings[position], exact=exact)
+        positions = positions[(positions != position) & self.filter_mask(positions, **filters)]
+        columns, scores = top_k(self.similarities(positions, position)[None, :], k)
+        return self.describe(positions[columns[0]], scores[0])
+    
+    def similar_many(self, book_ids=None, k=10, batch_size=1024):
+        """
+        This method finds the exact k most similar books of many books at once: the books 
+        are scored by batches against the catalog, chunk by chunk, with matrix products, 
+        keeping the best k of each book as it goes.
+    
+        Args:
+        book_ids (list): The books to find similar books for. Defaults to every book.
+        k (int): Number of similar books per book.
+        batch_size (int): Number of books scored together.
+    
+        Returns:
+        neighbours (tuple): The positions and the similarities of the similar books, two
+        arrays of one row per book, best first.
+        """
+        if book_ids is None:
+            positions = np.arange(len(self.book_ids))
+        else:
+            positions = self.positions.get_indexer(book_ids)
+            if (positions < 0).any():
+                raise KeyError("Some books are not in the recommendation index")
+    
+        # Each chunk of the catalog is densified once and scored against every batch of books
+        neighbour_positions = np.zeros((len(positions), 0), dtype='int64')
+        neighbour_scores = np.zeros((len(positions), 0), dtype='float32')
+        for start in range(0, len(self.book_ids), self.chunk_size):
+            chunk = self.vectors(np.arange(start, min(start + self.chunk_size, len(self.book_ids))))
+            chunk_positions, chunk_scores = [], []
+            for batch_start in range(0, len(positions), batch_size):
+                batch = positions[batch_start:batch_start + batch_size]
+                scores = self.vectors(batch) @ chunk.T
+                # A book is not its own neighbour
+                own = (batch >= start) & (batch < start + len(chunk))
+                scores[np.flatnonzero(own), batch[own] - start] = -np.inf
+                columns, best_scores = top_k(scores, k)
+                chunk_positions.append(columns + start)
+                chunk_scores.append(best_scores)
+            # Merge the best of this chunk with the best so far
+            merged_positions = np.hstack([neighbour_positions, np.vstack(chunk_positions)])
+            columns, neighbour_scores = top_k(np.hstack([neighbour_scores, np.vstack(chunk_scores)]), k)
+            neighbour_positions = np.take_along_axis(merged_positions, columns, axis=1)
+    
+        return neighbour_positions, neighbour_scores
+    
+    def precompute_neighbours(self, k=10, batch_size=1024):
+        """
+        This method precomputes the exact k most similar books of every book (see
+        similar_many), so similar answers without scoring anything. It scores every pair
+        of books, so it suits catalogs up to a few hundred thousand books; larger ones
+        should rely on the cluster index.
+    
+        Args:
+        k (int): Number of neighbours kept per book.
+        batch_size (int): Number of books scored together.
+    
+        Returns:
+        neighbours_df (DataFrame): One row per (book, neighbour) pair, with the columns
+        'book_id', 'rank', 'neighbour_id' and 'similarity'.
+        """
+        self.neighbours = self.similar_many(k=k, batch_size=batch_size)
+        positions, scores = self.neighbours
+        return pd.DataFrame({
+            'book_id': np.repeat(self.book_ids, positions.shape[1]),
+            'rank': np.tile(np.arange(1, positions.shape[1] + 1), len(self.book_ids)),
+            'neighbour_id': self.book_ids[positions.ravel()],
+            'similarity': scores.ravel(),
+        })
+    
+    def best_in_genres(self, genres, k=10, min_ratings=None):
+        """
+        This method returns the best candidates to stock in a set of genres: the books are
+        ranked by the share of the genres they belong to times their Bayesian rating, so
+        well-rated books matching all the genres come first.
+    
+        Args:
+        genres (list): Names of the genres (case-insensitive).
+        k (int): Number of books to return.
+        min_ratings (int): Only books with at least this number of ratings.
+    
+        Returns:
+        best_books (DataFrame): 'book_id', 'book_title', 'num_ratings', 'bayesian_rating',
+        'genre_match' (share of the genres of the book) and 'score'.
+        """
+        codes = self.genre_names.get_indexer([genre.lower() for genre in genres])
+        codes = np.unique(codes[codes >= 0])
+    
+        # Number of the genres each book belongs to, from the books of each genre
+        members = [self.genre_books[self.genre_offsets[code]:self.genre_offsets[code + 1]] for code in codes]
+        matches = np.bincount(np.concatenate(members), minlength=len(self.book_ids)) if members else np.zeros(0)
+        positions = np.flatnonzero(matches)
+        positions = positions[self.filter_mask(positions, min_ratings=min_ratings)]
+    
+        genre_match = matches[positions] / max(len(genres), 1)
+        scores = genre_match * np.nan_to_num(self.bayesian_ratings[positions])
+        columns, best_scores = top_k(scores[None, :], k)
+        best_books = self.describe(positions[columns[0]], best_scores[0], score_column='score')
+        best_books.insert(4, 'genre_match', genre_match[columns[0]])
+        return best_books
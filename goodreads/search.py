@@ -0,0 +1,564 @@
+"""
+Full-text search of the Goodreads books: an inverted index over the titles and details of
+the cleaned Books table, with BM25 ranking, title autocomplete and filters on the author,
+format, genre and ratings.
+
+The index is a list of immutable segments. An update indexes the new and changed books in
+a new small segment and marks their previous versions as deleted, so refreshing a few books
+never re-tokenizes the others; compact merges the segments back into one.
+
+Only pandas and NumPy are imported here. With pyarrow installed the texts are tokenized by
+Arrow's compiled kernels, and the index can be saved to and loaded from disk.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import json
+import re
+
+
+# Words too frequent to help the ranking, left out of the index
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'he', 'her', 'his', 'in', 'is',
+    'it', 'its', 'of', 'on', 'or', 'she', 'that', 'the', 'their', 'they', 'this', 'to', 'was', 'were',
+    'which', 'who', 'with',
+])
+
+# Separators between tokens: anything but letters and digits (RE2 syntax for pyarrow, and
+# its equivalent for Python's re module)
+TOKEN_SEPARATOR_PATTERN = r"[^\p{L}\p{N}]+"
+TOKEN_SEPARATOR_FALLBACK_PATTERN = r"[\W_]+"
+
+# Columns describing each indexed book, returned with the results
+DOCUMENT_COLUMNS = ['book_id', 'book_title', 'author', 'book_format', 'average_rating', 'num_ratings']
+
+# Maximum number of index terms a prefix is expanded to
+MAX_PREFIX_TERMS = 64
+
+
+def tokenize(texts):
+    """
+    This function splits texts into lowercase tokens of letters and digits, leaving out the
+    STOPWORDS, in one vectorized pass over the column.
+    
+    Args:
+    texts (Series): The texts to tokenize; missing texts give no tokens.
+    
+    Returns:
+    tokens (DataFrame): One row per token, with the columns 'row' (position of the text in
+    texts) and 'token'.
+    """
+    
+    texts = pd.Series(texts).reset_index(drop=True)
+    if isinstance(texts.dtype, pd.CategoricalDtype):
+        texts = texts.astype(object)
+    
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        split = texts.str.lower().str.split(TOKEN_SEPARATOR_FALLBACK_PATTERN, regex=True).explode()
+        rows = split.index.to_numpy(dtype='int64')
+        token = split.to_numpy(dtype=object)
+    else:
+        lowered = pc.utf8_lower(pa.array(texts, type=pa.large_string(), from_pandas=True))
+        split = pc.split_pattern_regex(lowered, TOKEN_SEPARATOR_PATTERN)
+        rows = pc.list_parent_indices(split).to_numpy().astype('int64')
+        token = pc.list_flatten(split).to_numpy(zero_copy_only=False)
+    
+    token = pd.Series(token, dtype=object)
+    keep = (token.notna() & (token != '') & ~token.isin(STOPWORDS)).to_numpy()
+    
+    return pd.DataFrame({
+        'row': rows[keep],
+        'token': token[keep].to_numpy(),
+    })
+
+
+def partial_word(text):
+    """
+    This function returns the word being typed at the end of a text, i.e. its last word 
+    unless the text ends with a separator.
+    
+    Args:
+    text (str): The text typed so far.
+    
+    Returns:
+    word (str): The lowercase last word, or '' when the text ends with a separator.
+    """
+    
+    return re.split(TOKEN_SEPARATOR_FALLBACK_PATTERN, text.lower())[-1]
+
+
+class Postings:
+    """
+    This class is a compressed inverted list: the sorted distinct keys (terms or genres),
+    and for each key the documents containing it with a weight (e.g. the term frequency),
+    stored as flat arrays delimited by offsets.
+    
+    Args:
+    keys (ndarray): The sorted distinct keys.
+    offsets (ndarray): The postings of keys[i] are at positions offsets[i] to offsets[i + 1].
+    docs (ndarray): The document positions of all the postings.
+    weights (ndarray): The weights of all the postings.
+    """
+    
+    def __init__(self, keys, offsets, docs, weights):
+        self.keys = keys
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+    
+    @classmethod
+    def build(cls, docs, keys, weights=None, num_docs=None):
+        # Sum the weights of every (key, document) pair and sort the pairs by key, then document
+        num_docs = int(num_docs if num_docs is not None else (docs.max() + 1 if len(docs) else 0))
+        key_codes, distinct_keys = pd.factorize(pd.Series(keys, dtype=object), sort=True)
+        pairs, inverse = np.unique(key_codes.astype('int64') * max(num_docs, 1) + docs, return_inverse=True)
+        pair_weights = np.bincount(inverse, weights=weights, minlength=len(pairs))
+        pair_keys = pairs // max(num_docs, 1)
+        offsets = np.zeros(len(distinct_keys) + 1, dtype='int64')
+        offsets[1:] = np.cumsum(np.bincount(pair_keys, minlength=len(distinct_keys)))
+        return cls(np.asarray(distinct_keys, dtype=object), offsets,
+                   (pairs % max(num_docs, 1)).astype('int32'), pair_weights.astype('float32'))
+    
+    def key_range(self, key, prefix=False):
+        # Positions of the key (or of all the keys starting with it) in self.keys
+        start = np.searchsorted(self.keys, key, side='left')
+        stop = np.searchsorted(self.keys, key + '\U0010ffff' if prefix else key, side='right')
+        return start, stop
+    
+    def lookup(self, key):
+        # Documents and weights of a key
+        start, stop = self.key_range(key)
+        if start == stop:
+            return self.docs[:0], self.weights[:0]
+        return self.docs[self.offsets[start]:self.offsets[start + 1]], self.weights[self.offsets[start]:self.offsets[start + 1]]
+    
+    def expand(self):
+        # All the postings as (document, key, weight) arrays
+        counts = np.diff(self.offsets)
+        return self.docs, np.repeat(self.keys, counts), self.weights
+    
+    def to_arrays(self, name):
+        # The postings as NumPy arrays; the keys are stored as one UTF-8 buffer separated by
+        # new lines (tokens and genres never contain one), so no pickling is needed
+        return {f'{name}_keys': np.frombuffer('\n'.join(self.keys).encode('utf-8'), dtype='uint8'),
+                f'{name}_offsets': self.offsets, f'{name}_docs': self.docs, f'{name}_weights': self.weights}
+    
+    @classmethod
+    def from_arrays(cls, arrays, name):
+        buffer = arrays[f'{name}_keys'].tobytes().decode('utf-8')
+        keys = np.asarray(buffer.split('\n') if len(arrays[f'{name}_offsets']) > 1 else [], dtype=object)
+        return cls(keys, arrays[f'{name}_offsets'], arrays[f'{name}_docs'], arrays[f'{name}_weights'])
+
+
+class IndexSegment:
+    """
+    This class is one immutable part of the index: its books (DOCUMENT_COLUMNS, the
+    weighted length of their text and whether they are still live), the postings of their
+    title and details terms, of their title terms only (for autocomplete) and of their genres.
+    
+    Args:
+    docs (DataFrame): The books of the segment, one row per document position.
+    text (Postings): Title and details terms, with field-weighted term frequencies.
+    titles (Postings): Title terms.
+    genres (Postings): Lowercase genre names.
+    """
+    
+    def __init__(self, docs, text, titles, genres):
+        self.docs = docs
+        self.text = text
+        self.titles = titles
+        self.genres = genres
+        self.live = np.ones(len(docs), dtype=bool)
+        # Columns used by the ranking and the filters, as arrays and lowercase name codes
+        self.lengths = docs['length'].to_numpy(dtype='float64')
+        self.ratings = docs['average_rating'].to_numpy(dtype='float64')
+        self.num_ratings = docs['num_ratings'].to_numpy(dtype='float64')
+        self.author_codes, self.author_names = pd.factorize(docs['author'].astype(object).str.lower())
+        self.format_codes, self.format_names = pd.factorize(docs['book_format'].astype(object).str.lower())
+    
+    @classmethod
+    def build(cls, books_df, book_genres_df, title_weight=3.0):
+        """
+        This method indexes books in a new segment.
+    
+        Args:
+        books_df (DataFrame): The books, with DOCUMENT_COLUMNS and 'book_details'.
+        book_genres_df (DataFrame): The columns 'book_id' and 'genre' (genre names).
+        title_weight (float): How many times a title term counts more than a details term.
+    
+        Returns:
+        segment (IndexSegment): The segment of the books.
+        """
+        books_df = books_df.reset_index(drop=True)
+        num_docs = len(books_df)
+    
+        # 1. Title terms weigh more than details terms in the term frequencies
+        title_tokens = tokenize(books_df['book_title'])
+        detail_tokens = tokenize(books_df['book_details'])
+        rows = np.concatenate([title_tokens['row'].to_numpy(), detail_tokens['row'].to_numpy()])
+        weights = np.concatenate([np.full(len(title_tokens), title_weight), np.ones(len(detail_tokens))])
+        text = Postings.build(rows, np.concatenate([title_tokens['token'].to_numpy(), detail_tokens['token'].to_numpy()]),
+                              weights, num_docs=num_docs)
+        titles = Postings.build(title_tokens['row'].to_numpy(), title_tokens['token'].to_numpy(), num_docs=num_docs)
+    
+        # 2. Genres of the books of the segment
+        positions = pd.Index(books_df['book_id']).get_indexer(book_genres_df['book_id'])
+        known = positions >= 0
+        genres = Postings.build(positions[known], book_genres_df['genre'].astype(object).str.lower().to_numpy()[known],
+                                num_docs=num_docs)
+    
+        # 3. The books, with the weighted length of their text for BM25
+        docs = books_df[DOCUMENT_COLUMNS].copy()
+        docs['length'] = np.bincount(rows, weights=weights, minlength=num_docs)
+    
+        return cls(docs, text, titles, genres)
+    
+    def filter_mask(self, positions, author=None, book_format=None, genre=None, min_rating=None,
+                    max_rating=None, min_ratings=None):
+        # Which of the documents at positions are live and match every filter given
+        mask = self.live[positions]
+        for codes, names, value in [(self.author_codes, self.author_names, author),
+                                    (self.format_codes, self.format_names, book_format)]:
+            if value is not None:
+                code = names.get_indexer([value.lower()])[0]
+                mask &= (codes[positions] == code) & (code >= 0)
+        if genre is not None:
+            genre_docs = np.zeros(len(self.live), dtype=bool)
+            genre_docs[self.genres.lookup(genre.lower())[0]] = True
+            mask &= genre_docs[positions]
+        if min_rating is not None:
+            mask &= self.ratings[positions] >= min_rating
+        if max_rating is not None:
+            mask &= self.ratings[positions] <= max_rating
+        if min_ratings is not None:
+            mask &= self.num_ratings[positions] >= min_ratings
+        return mask
+    
+    def best(self, positions, scores, limit):
+        # The `limit` best documents at positions, by score then number of ratings
+        if len(positions) > limit:
+            # Partition first, so only the candidates tied with the limit-th one are sorted
+            keys = scores[positions] if scores is not None else self.num_ratings[positions]
+            threshold = np.partition(keys, len(keys) - limit)[len(keys) - limit]
+            positions = positions[keys >= threshold]
+        scores = scores[positions] if scores is not None else np.zeros(len(positions))
+        order = np.lexsort((-self.num_ratings[positions], -scores))[:limit]
+        results = self.docs.iloc[positions[order]][DOCUMENT_COLUMNS].reset_index(drop=True)
+        results['score'] = scores[order]
+        return results
+
+
+class SearchIndex:
+    """
+    This class is the search index of the books: ranked full-text queries (search), title
+    autocomplete, incremental updates (update, apply_delta, remove) and persistence
+    (save, load). Scores use BM25 with statistics of the live books of all segments.
+    
+    Args:
+    k1 (float): BM25 term-frequency saturation.
+    b (float): BM25 length normalization.
+    title_weight (float): How many times a title term counts more than a details term.
+    max_segments (int): Number of segments above which an update compacts the index.
+    """
+    
+    def __init__(self, k1=1.2, b=0.75, title_weight=3.0, max_segments=8):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.max_segments = max_segments
+        self.segments = []
+        # Names of the authors, formats and genres by ID, to describe the books of later updates
+        self.authors = pd.Series(dtype=object)
+        self.formats = pd.Series(dtype=object)
+        self.genres = pd.Series(dtype=object)
+    
+    @classmethod
+    def build(cls, tables, **options):
+        """
+        This method indexes the books of the cleaned tables (see etl.build_tables).
+    
+        Args:
+        tables (dict): The 'Books', 'Authors', 'Formats', 'Genres' and 'Book_Genres' tables.
+        **options: The parameters of SearchIndex.
+    
+        Returns:
+        index (SearchIndex): The index of the books.
+        """
+        index = cls(**options)
+        index.update(tables)
+        return index
+    
+    def __len__(self):
+        # Number of live books
+        return int(sum(segment.live.sum() for segment in self.segments))
+    
+    def update(self, tables, removed_book_ids=()):
+        """
+        This method indexes new and changed books in a new segment and removes the previous
+        version of the changed books and the removed books.
+    
+        Args:
+        tables (dict): The 'Books' to (re)index, their 'Book_Genres', and the 'Authors',
+        'Formats' and 'Genres' rows not yet known to the index (e.g. the upserts of
+        etl.build_incremental_delta).
+        removed_book_ids (list): IDs of books to remove from the index.
+    
+        Returns:
+        None
+        """
+        # 1. Remember the names of the new authors, formats and genres
+        for attribute, table_name, id_column, name_column in [('authors', 'Authors', 'author_id', 'author'),
+                                                              ('formats', 'Formats', 'format_id', 'book_format'),
+                                                              ('genres', 'Genres', 'genre_id', 'genre')]:
+            table_df = tables.get(table_name)
+            if table_df is not None and len(table_df):
+                names = pd.Series(table_df[name_column].astype(object).to_numpy(), index=table_df[id_column].to_numpy())
+                names = pd.concat([getattr(self, attribute), names])
+                setattr(self, attribute, names[~names.index.duplicated(keep='last')])
+    
+        # 2. Remove the previous version of the books
+        books_df = tables.get('Books')
+        book_ids = [] if books_df is None else books_df['book_id'].tolist()
+        self.remove(list(removed_book_ids) + book_ids)
+        if books_df is None or books_df.empty:
+            return
+    
+        # 3. Index the books in a new segment
+        books_df = books_df.drop_duplicates(subset=['book_id'], keep='last').reset_index(drop=True)
+        books_df['author'] = books_df['author_id'].map(self.authors)
+        books_df['book_format'] = books_df['format_id'].map(self.formats)
+        book_genres_df = tables.get('Book_Genres', pd.DataFrame(columns=['book_id', 'genre_id']))
+        book_genres_df = pd.DataFrame({'book_id': book_genres_df['book_id'].to_numpy(),
+                                       'genre': book_genres_df['genre_id'].map(self.genres).to_numpy()}).dropna()
+        self.segments.append(IndexSegment.build(books_df, book_genres_df, title_weight=self.title_weight))
+    
+        if len(self.segments) > self.max_segments:
+            self.compact()
+    
+    def apply_delta(self, delta):
+        # Apply a delta of etl.build_incremental_delta (changed books are in the upserts)
+        self.update(delta['upserts'], removed_book_ids=delta['deletes']['book_ids'])
+    
+    def remove(self, book_ids):
+        # Mark the books as deleted; they are dropped from the postings by compact
+        book_ids = np.asarray(list(book_ids))
+        if len(book_ids) == 0:
+            return
+        for segment in self.segments:
+            segment.live &= ~segment.docs['book_id'].isin(book_ids).to_numpy()
+    
+    def compact(self):
+        """
+        This method merges all the segments into one without their deleted books. The
+        postings are merged as they are, so no text is tokenized again.
+    
+        Returns:
+        None
+        """
+        docs, postings = [], {'text': [], 'titles': [], 'genres': []}
+        offset = 0
+        for segment in self.segments:
+            # New position of every live document of the segment
+            new_positions = np.cumsum(segment.live) - 1 + offset
+            for name in postings:
+                segment_docs, keys, weights = getattr(segment, name).expand()
+                live = segment.live[segment_docs]
+                postings[name].append((new_positions[segment_docs[live]], keys[live], weights[live]))
+            docs.append(segment.docs[segment.live])
+            offset += int(segment.live.sum())
+    
+        if not docs:
+            return
+        docs = pd.concat(docs, ignore_index=True)
+        merged = {name: Postings.build(*[np.concatenate(arrays) for arrays in zip(*parts)], num_docs=len(docs))
+                  for name, parts in postings.items()}
+        self.segments = [IndexSegment(docs, merged['text'], merged['titles'], merged['genres'])]
+    
+    def search(self, query, limit=10, prefix=False, author=None, book_format=None, genre=None,
+               min_rating=None, max_rating=None, min_ratings=None):
+        """
+        This method returns the books best matching a query, ranked by BM25 over their titles
+        and details (ties and empty queries are ranked by number of ratings).
+    
+        Args:
+        query (str): The words to search; a book matches when it contains any of them.
+        limit (int): Maximum number of books to return.
+        prefix (bool): Whether the last word is a prefix (search as you type).
+        author (str): Only books of this author (case-insensitive).
+        book_format (str): Only books of this format, e.g. 'Paperback'.
+        genre (str): Only books of this genre.
+        min_rating (float): Only books with at least this average rating.
+        max_rating (float): Only books with at most this average rating.
+        min_ratings (int): Only books with at least this number of ratings.
+    
+        Returns:
+        results (DataFrame): DOCUMENT_COLUMNS and 'score' of the best books.
+        """
+        filters = {'author': author, 'book_format': book_format, 'genre': genre, 'min_rating': min_rating,
+                   'max_rating': max_rating, 'min_ratings': min_ratings}
+        terms = self.query_terms(query, prefix=prefix)
+    
+        # 1. Collection statistics over the live books
+        num_docs = len(self)
+        if num_docs == 0 or (query.strip() and not terms):
+            return pd.DataFrame(columns=DOCUMENT_COLUMNS + ['score'])
+        average_length = sum(segment.lengths[segment.live].sum() for segment in self.segments) / num_docs
+        average_length = average_length or 1.0
+    
+        # 2. Live postings of every term in every segment, and the document frequency of the terms
+        postings = [[self.live_postings(segment, term) for term in terms] for segment in self.segments]
+        document_frequencies = np.array([sum(len(segment_postings[i][0]) for segment_postings in postings)
+                                         for i in range(len(terms))], dtype='float64')
+        idf = np.log(1 + (num_docs - document_frequencies + 0.5) / (document_frequencies + 0.5))
+    
+        # 3. BM25 score of the matching books of each segment, then the filters
+        results = []
+        for segment, segment_postings in zip(self.segments, postings):
+            if terms:
+                scores = np.zeros(len(segment.docs))
+                for term_idf, (docs, frequencies) in zip(idf, segment_postings):
+                    norm = self.k1 * (1 - self.b + self.b * segment.lengths[docs] / average_length)
+                    scores += np.bincount(docs, weights=term_idf * frequencies * (self.k1 + 1) / (frequencies + norm),
+                                          minlength=len(scores))
+                positions = np.flatnonzero(scores > 0)
+            else:
+                scores = None
+                positions = np.arange(len(segment.docs))
+            positions = positions[segment.filter_mask(positions, **filters)]
+    
+            # Only the best `limit` books of each segment can be among the best overall
+            results.append(segment.best(positions, scores, limit))
+    
+        results = pd.concat(results, ignore_index=True)
+        return results.sort_values(['score', 'num_ratings'], ascending=False, kind='stable').head(limit).reset_index(drop=True)
+    
+    def autocomplete(self, prefix, limit=10, **filters):
+        """
+        This method completes a partial title: the books whose title contains every word of
+        the prefix, the last one possibly unfinished, ranked by number of ratings.
+    
+        Args:
+        prefix (str): The beginning of the title typed so far.
+        limit (int): Maximum number of books to return.
+        **filters: The filters of search (author, book_format, genre, ...).
+    
+        Returns:
+        suggestions (DataFrame): DOCUMENT_COLUMNS of the suggested books.
+        """
+        # The last word may be unfinished (even a stopword is the beginning of other words)
+        words = tokenize(pd.Series([prefix]))['token'].tolist()
+        last_word = partial_word(prefix)
+        if last_word and words and words[-1] == last_word:
+            words = words[:-1]
+    
+        suggestions = []
+        for segment in self.segments:
+            # Books whose title has every finished word and a word beginning with the last one
+            matches = segment.live.copy()
+            for word in words:
+                has_word = np.zeros(len(matches), dtype=bool)
+                has_word[segment.titles.lookup(word)[0]] = True
+                matches &= has_word
+            if last_word:
+                start, stop = segment.titles.key_range(last_word, prefix=True)
+                has_word = np.zeros(len(matches), dtype=bool)
+                has_word[segment.titles.docs[segment.titles.offsets[start]:segment.titles.offsets[stop]]] = True
+                matches &= has_word
+            positions = np.flatnonzero(matches)
+            positions = positions[segment.filter_mask(positions, **filters)]
+            suggestions.append(segment.best(positions, None, limit))
+    
+        if not suggestions:
+            return pd.DataFrame(columns=DOCUMENT_COLUMNS)
+        suggestions = pd.concat(suggestions, ignore_index=True)
+        return (suggestions.sort_values('num_ratings', ascending=False, kind='stable').head(limit)
+                [DOCUMENT_COLUMNS].reset_index(drop=True))
+    
+    def query_terms(self, query, prefix=False):
+        # Distinct terms of a query, the last one expanded to the index terms it begins when prefix is set
+        terms = list(dict.fromkeys(tokenize(pd.Series([query]))['token']))
+        last_word = partial_word(query) if prefix else ''
+        if last_word:
+            if terms and terms[-1] == last_word:
+                terms = terms[:-1]
+            # The most frequent index terms beginning with the last word
+            completions = pd.Series(dtype='float64')
+            for segment in self.segments:
+                start, stop = segment.text.key_range(last_word, prefix=True)
+                counts = pd.Series(np.diff(segment.text.offsets)[start:stop], index=segment.text.keys[start:stop])
+                completions = completions.add(counts, fill_value=0)
+            terms += [term for term in completions.nlargest(MAX_PREFIX_TERMS).index if term not in terms]
+        return terms
+    
+    def live_postings(self, segment, term):
+        # Postings of a term in a segment, without the deleted books
+        docs, frequencies = segment.text.lookup(term)
+        live = segment.live[docs]
+        return docs[live], frequencies[live]
+    
+    def save(self, directory):
+        """
+        This method writes the index to a directory (requires pyarrow): the parameters and
+        the names in index.json, and the books and postings of each segment.
+    
+        Args:
+        directory (str): The directory of the index; previous files are replaced.
+    
+        Returns:
+        None
+        """
+        # The manifest goes first and is written back last, so a partly written index is never loaded
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name == 'index.json' or name.startswith('segment_'):
+                os.remove(os.path.join(directory, name))
+    
+        for number, segment in enumerate(self.segments):
+            docs = segment.docs.assign(live=segment.live)
+            docs.to_parquet(os.path.join(directory, f"segment_{number}.parquet"), index=False)
+            np.savez(os.path.join(directory, f"segment_{number}.npz"),
+                     **segment.text.to_arrays('text'), **segment.titles.to_arrays('titles'),
+                     **segment.genres.to_arrays('genres'))
+    
+        manifest = {
+            'parameters': {'k1': self.k1, 'b': self.b, 'title_weight': self.title_weight,
+                           'max_segments': self.max_segments},
+            'segments': len(self.segments),
+            'names': {attribute: {str(key): value for key, value in getattr(self, attribute).items()}
+                      for attribute in ['authors', 'formats', 'genres']},
+        }
+        with open(os.path.join(directory, "index.json.tmp"), 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, default=str)
+        os.replace(os.path.join(directory, "index.json.tmp"), os.path.join(directory, "index.json"))
+    
+    @classmethod
+    def load(cls, directory):
+        """
+        This method reads an index written by save.
+    
+        Args:
+        directory (str): The directory of the index.
+    
+        Returns:
+        index (SearchIndex): The index.
+        """
+        with open(os.path.join(directory, "index.json"), encoding='utf-8') as file:
+            manifest = json.load(file)
+    
+        index = cls(**manifest['parameters'])
+        for attribute, names in manifest['names'].items():
+            setattr(index, attribute, pd.Series(list(names.values()), index=[int(key) for key in names], dtype=object))
+    
+        for number in range(manifest['segments']):
+            docs = pd.read_parquet(os.path.join(directory, f"segment_{number}.parquet"))
+            with np.load(os.path.join(directory, f"segment_{number}.npz")) as arrays:
+                segment = IndexSegment(docs[DOCUMENT_COLUMNS + ['length']],
+                                       *[Postings.from_arrays(arrays, name) for name in ['text', 'titles', 'genres']])
+            segment.live = docs['live'].to_numpy(dtype=bool)
+            index.segments.append(segment)
+    
+        return index
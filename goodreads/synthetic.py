@@ -0,0 +1,233 @@
+"""
+Synthetic data shaped like the Goodreads Book_Details.csv file, to test and benchmark the
+pipeline beyond the ~16k books of the original dataset.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+
+
+# Number of books of the original dataset, i.e. scale factor 1
+BASE_BOOKS = 16225
+
+# Book formats with their share of the original dataset
+BOOK_FORMATS = {
+    'Paperback': 0.29, 'Hardcover': 0.24, 'Mass Market Paperback': 0.17, 'Kindle Edition': 0.16,
+    'ebook': 0.07, 'Library Binding': 0.02, 'Audio CD': 0.015, 'Unknown Binding': 0.015,
+    'Nook': 0.005, 'Audiobook': 0.005,
+}
+
+# Atomic genres, from the most to the least frequent
+GENRE_NAMES = [
+    'Fiction', 'Nonfiction', 'Fantasy', 'Classics', 'Romance', 'Young Adult', 'Mystery', 'Historical Fiction',
+    'Science Fiction', 'Literature', 'Novels', 'Adult', 'Contemporary', 'Thriller', 'History', 'Audiobook',
+    'Adventure', 'Biography', 'Philosophy', 'Horror', 'Humor', 'Childrens', 'Magic', 'Paranormal', 'Poetry',
+    'Memoir', 'Self Help', 'Psychology', 'Crime', 'Suspense', 'Chick Lit', 'Middle Grade', 'Graphic Novels',
+    'Short Stories', 'Religion', 'Science', 'Travel', 'Dystopia', "Women's Fiction", 'Business', 'Art',
+    'Politics', 'Sports', 'Cookbooks', 'Economics', 'Music', 'Plays', 'Christian', 'Spirituality', 'War',
+]
+
+# Words used to build titles, details and author names
+WORDS = [
+    'the', 'night', 'house', 'river', 'secret', 'king', 'girl', 'war', 'garden', 'stone', 'shadow', 'light',
+    'city', 'winter', 'summer', 'dark', 'last', 'lost', 'world', 'heart', 'fire', 'sea', 'star', 'road',
+    'empire', 'silent', 'golden', 'broken', 'wild', 'little', 'great', 'story', 'life', 'time', 'game', 'song',
+]
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+
+
+def zipf_choice(rng, size, num_values, exponent=1.2):
+    """
+    This function draws integers in [0, num_values) with a Zipf-like skew, so a few values
+    are very frequent and most of them are rare (like authors and genres on Goodreads).
+    
+    Args:
+    rng (Generator): The NumPy random generator.
+    size (int): Number of integers to draw.
+    num_values (int): Number of distinct values.
+    exponent (float): Skew of the distribution, higher is more skewed.
+    
+    Returns:
+    values (ndarray): The drawn integers.
+    """
+    
+    weights = 1.0 / np.arange(1, num_values + 1) ** exponent
+    cumulative = np.cumsum(weights / weights.sum())
+    values = np.searchsorted(cumulative, rng.random(size), side='right')
+    
+    return np.minimum(values, num_values - 1)
+
+
+def random_words(rng, size, min_words, max_words):
+    """
+    This function builds strings of random words from WORDS.
+    
+    Args:
+    rng (Generator): The NumPy random generator.
+    size (int): Number of strings to build.
+    min_words (int): Minimum number of words of each string.
+    max_words (int): Maximum number of words of each string.
+    
+    Returns:
+    strings (Series): The strings.
+    """
+    
+    words = np.array(WORDS, dtype=object)
+    num_words = rng.integers(min_words, max_words + 1, size)
+    strings = pd.Series(words[rng.integers(0, len(words), size)])
+    for position in range(1, max_words):
+        next_words = pd.Series(words[rng.integers(0, len(words), size)])
+        strings = strings.where(num_words <= position, strings + ' ' + next_words)
+    
+    return strings
+
+
+def with_thousands_separators(counts):
+    """
+    This function formats integers with comma thousands separators, like the counts of the
+    rating_distribution column ('1,234,567').
+    
+    Args:
+    counts (ndarray): The non-negative integers to format.
+    
+    Returns:
+    strings (Series): The formatted integers.
+    """
+    
+    strings = pd.Series(counts).astype(str)
+    # Insert a comma before every group of three digits, starting from the right
+    for group, threshold in enumerate([10 ** 3, 10 ** 6, 10 ** 9, 10 ** 12]):
+        position = 3 * (group + 1) + group
+        strings = strings.where(counts < threshold, strings.str[:-position] + ',' + strings.str[-position:])
+    
+    return strings
+
+
+def generate_book_details(num_books, num_authors=None, start_id=1, seed=0, malformed_rate=0.0):
+    """
+    This function generates a DataFrame with the columns of Book_Details.csv: stringified
+    format and genre lists, rating_distribution dictionaries with thousands separators,
+    skewed authors and genres, and rating counts consistent with average_rating.
+    
+    Args:
+    num_books (int): Number of books (rows) to generate.
+    num_authors (int): Number of distinct authors. Defaults to 2 authors per 5 books.
+    start_id (int): book_id of the first book; the ids increase with random gaps.
+    seed (int): Seed of the random generator.
+    malformed_rate (float): Share of rows with a format without page count or an empty
+    genre list, as found in the original file.
+    
+    Returns:
+    df (DataFrame): The generated books.
+    """
+    
+    rng = np.random.default_rng(seed)
+    num_authors = num_authors or max(1, num_books * 2 // 5)
+    
+    # 1. Identifiers, titles and authors
+    book_ids = start_id + np.cumsum(rng.integers(1, 200, num_books)) - 1
+    author_ids = zipf_choice(rng, num_books, num_authors, exponent=0.5) + 1
+    author_names = "Author " + pd.Series(author_ids).astype(str)
+    
+    # 2. Ratings: a per-book star profile and a log-normal number of ratings
+    num_ratings = np.maximum(rng.lognormal(mean=7, sigma=2, size=num_books).astype(np.int64), 1)
+    quality = rng.beta(5, 2, num_books)
+    profiles = np.column_stack([quality ** 2, 2 * quality * (1 - quality), (1 - quality) ** 2,
+                                0.05 * (1 - quality), 0.03 * (1 - quality)])
+    profiles /= profiles.sum(axis=1, keepdims=True)
+    star_counts = rng.multinomial(num_ratings, profiles)
+    average_rating = np.round((star_counts * np.array([5, 4, 3, 2, 1])).sum(axis=1) / num_ratings, 2)
+    
+    rating_distribution = "{'5': '" + with_thousands_separators(star_counts[:, 0])
+    for star in range(1, 5):
+        rating_distribution = rating_distribution + f"', '{5 - star}': '" + with_thousands_separators(star_counts[:, star])
+    rating_distribution = rating_distribution + "'}"
+    
+    # 3. Formats: "['<pages> pages, <format>']"
+    formats = rng.choice(list(BOOK_FORMATS), size=num_books, p=np.array(list(BOOK_FORMATS.values())) /
+                         sum(BOOK_FORMATS.values()))
+    num_pages = np.maximum(rng.lognormal(mean=5.9, sigma=0.6, size=num_books).astype(np.int64), 1)
+    format_strings = "['" + pd.Series(num_pages).astype(str) + " pages, " + pd.Series(formats) + "']"
+    
+    # 4. Genres: a list literal of 1 to 7 distinct, skewed genres, the most popular first
+    quoted_genres = np.array([repr(genre) for genre in GENRE_NAMES], dtype=object)
+    num_genres = rng.integers(1, 8, num_books)
+    drawn = np.sort(zipf_choice(rng, (num_books, 7), len(GENRE_NAMES), exponent=0.9), axis=1)
+    # Keep the first num_genres draws of each book, without repeating a genre
+    keep = np.arange(7) < num_genres[:, None]
+    keep[:, 1:] &= drawn[:, 1:] != drawn[:, :-1]
+    genres = pd.Series(np.where(keep[:, 0], quoted_genres[drawn[:, 0]], ''))
+    for position in range(1, 7):
+        genres = genres.where(~keep[:, position], genres + ', ' + quoted_genres[drawn[:, position]])
+    genres = '[' + genres + ']'
+    
+    # 5. Entries without page count or genres
+    if malformed_rate > 0:
+        malformed = rng.random(num_books) < malformed_rate
+        format_strings = format_strings.where(~malformed, "['" + pd.Series(formats) + "']")
+        genres = genres.where(~(malformed & (rng.random(num_books) < 0.5)), '[]')
+    
+    # Titles and details are drawn from pools of random sentences
+    titles = random_words(rng, min(num_books, 100000), 1, 5).str.title()
+    details = random_words(rng, min(num_books, 10000), 8, 20).str.capitalize() + '.'
+    
+    years = rng.integers(1850, 2024, num_books)
+    publication_info = ("['First published " + pd.Series(np.array(MONTHS)[rng.integers(0, 12, num_books)]) +
+                        " " + pd.Series(rng.integers(1, 29, num_books)).astype(str) + ", " +
+                        pd.Series(years).astype(str) + "']")
+    
+    df = pd.DataFrame({
+        'book_id': book_ids,
+        'book_title': titles.to_numpy()[rng.integers(0, len(titles), num_books)],
+        'book_details': details.to_numpy()[rng.integers(0, len(details), num_books)],
+        'format': format_strings,
+        'publication_info': publication_info,
+        'authorlink': "https://www.goodreads.com/author/show/" + pd.Series(author_ids).astype(str) + "." +
+                      author_names.str.replace(' ', '_'),
+        'author': author_names,
+        'num_pages': "['" + pd.Series(num_pages).astype(str) + "']",
+        'genres': genres,
+        'num_ratings': num_ratings,
+        'num_reviews': (num_ratings * rng.uniform(0.01, 0.1, num_books)).astype(np.int64),
+        'average_rating': average_rating,
+        'rating_distribution': rating_distribution,
+    })
+    
+    return df
+
+
+def write_book_details(path="Book_Details.csv", scale=1.0, chunksize=100000, seed=0, malformed_rate=0.0):
+    """
+    This function writes a synthetic Book_Details CSV file of scale * BASE_BOOKS books. The
+    books are generated and appended chunk by chunk, so files of tens of millions of rows
+    can be written with the memory of a single chunk.
+    
+    Args:
+    path (str): Path of the CSV file to write.
+    scale (float): Scale factor; 1 is the size of the original dataset.
+    chunksize (int): Number of books generated per chunk.
+    seed (int): Seed of the random generator (each chunk derives its own seed from it).
+    malformed_rate (float): Share of malformed rows, see generate_book_details.
+    
+    Returns:
+    num_books (int): The number of books written.
+    """
+    
+    num_books = max(1, int(round(scale * BASE_BOOKS)))
+    num_authors = max(1, num_books * 2 // 5)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    next_id = 1
+    for chunk_index, start in enumerate(range(0, num_books, chunksize)):
+        chunk_df = generate_book_details(min(chunksize, num_books - start), num_authors=num_authors,
+                                         start_id=next_id, seed=[seed, chunk_index],
+                                         malformed_rate=malformed_rate)
+        chunk_df.to_csv(path, mode='w' if chunk_index == 0 else 'a', header=chunk_index == 0, index=False)
+        next_id = int(chunk_df['book_id'].iloc[-1]) + 1
+    
+    return num_books
@@ -0,0 +1,237 @@
+"""
+Validation part of the Goodreads analysis: the constraints of the schema of
+SQL/Creating_books_db.sql (database.BOOKS_METADATA) checked on the tables before they are
+loaded. Every primary key, foreign key, NOT NULL, VARCHAR length and value range is checked
+on whole columns at once; the rows breaking a constraint are moved to quarantine tables
+instead of failing an insert, so a load never aborts half-way.
+"""
+
+import pandas as pd
+import numpy as np
+import os
+from sqlalchemy import Integer, String, Text, Numeric
+
+from goodreads.etl import STAR_COLUMNS
+from goodreads.metrics import METRICS, instrument_stage
+from goodreads.database import BOOKS_METADATA, LOAD_ORDER
+
+
+# Range of the INT columns of MySQL
+INTEGER_RANGE = (-2 ** 31, 2 ** 31 - 1)
+
+# Largest TEXT value of MySQL, in bytes
+TEXT_MAX_BYTES = 65535
+
+# Ranges of the values themselves, beyond the ranges of the column types (None is unbounded)
+VALUE_RANGES = {
+    'Books': {'num_ratings': (0, None), 'num_reviews': (0, None), 'average_rating': (0, 5)},
+    'Formats': {'num_pages': (0, None)},
+    'Ratings': {column: (0, None) for column in STAR_COLUMNS},
+}
+
+
+def check_columns(table_df, table, value_ranges=None):
+    """
+    This function checks the NOT NULL, type, length and range constraints of every column of
+    a table, one vectorized pass per constraint:
+    
+    - NOT NULL: columns declared nullable=False and primary-key columns.
+    - type: values of INT and DECIMAL columns that are not numbers, or not whole numbers.
+    - length: VARCHAR(n) values longer than n characters, TEXT values longer than 65535 bytes.
+    - range: INT values outside of the 32-bit range, DECIMAL(p, s) values with more than
+      p - s integer digits, and the ranges of value_ranges.
+    
+    Args:
+    table_df (DataFrame): The rows of the table.
+    table (Table): The table of BOOKS_METADATA.
+    value_ranges (dict): (minimum, maximum) of the values of some columns, keyed by column.
+    
+    Returns:
+    checks (list): One (kind, column, constraint, violations) tuple per constraint, where
+    violations is a boolean array marking the rows that break it.
+    """
+    
+    value_ranges = value_ranges or {}
+    checks = []
+    for column in table.columns:
+        if column.name not in table_df.columns:
+            continue
+        values = table_df[column.name]
+        missing = values.isna().to_numpy()
+    
+        # 1. NOT NULL
+        if not column.nullable or column.primary_key:
+            checks.append(('not_null', column.name, f"{column.name} NOT NULL", missing))
+    
+        # 2. Type and range of the numeric columns
+        if isinstance(column.type, (Integer, Numeric)):
+            numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            invalid = np.isnan(numbers) & ~missing
+            if isinstance(column.type, Integer):
+                invalid |= np.isfinite(numbers) & (numbers != np.round(numbers))
+                out_of_range = (numbers < INTEGER_RANGE[0]) | (numbers > INTEGER_RANGE[1])
+                checks.append(('type', column.name, f"{column.name} INT", invalid))
+                checks.append(('range', column.name, f"{column.name} INT range", out_of_range))
+            else:
+                precision, scale = column.type.precision, column.type.scale
+                out_of_range = np.abs(np.round(numbers, scale)) >= 10.0 ** (precision - scale)
+                checks.append(('type', column.name, f"{column.name} DECIMAL", invalid))
+                checks.append(('range', column.name, f"{column.name} DECIMAL({precision},{scale}) range",
+                               out_of_range))
+            if column.name in value_ranges:
+                minimum, maximum = value_ranges[column.name]
+                outside = np.zeros(len(numbers), dtype=bool)
+                if minimum is not None:
+                    outside |= numbers < minimum
+                if maximum is not None:
+                    outside |= numbers > maximum
+                bounds = f"{'' if minimum is None else minimum}..{'' if maximum is None else maximum}"
+                checks.append(('range', column.name, f"{column.name} in {bounds}", outside))
+    
+        # 3. Length of the text columns
+        elif isinstance(column.type, (String, Text)):
+            present = values[~missing]
+            lengths = np.zeros(len(values), dtype='int64')
+            lengths[~missing] = present.astype(str).str.len().to_numpy(dtype='int64')
+            if not isinstance(column.type, Text) and column.type.length is not None:
+                too_long = lengths > column.type.length
+                checks.append(('length', column.name, f"{column.name} VARCHAR({column.type.length})", too_long))
+            else:
+                # A character takes at most 4 bytes in UTF-8: only the longest values are encoded
+                too_long = lengths > TEXT_MAX_BYTES // 4
+                candidates = np.flatnonzero(too_long)
+                byte_lengths = values.iloc[candidates].astype(str).str.encode('utf-8').str.len().to_numpy()
+                too_long[candidates] = byte_lengths > TEXT_MAX_BYTES
+                checks.append(('length', column.name, f"{column.name} TEXT", too_long))
+    
+    return checks
+
+
+def check_keys(table_df, table, valid, parent_keys):
+    """
+    This function checks the primary key and the foreign keys of a table. The primary key is
+    checked among the rows that are otherwise valid, keeping the first row of every key like
+    format_books_table; foreign keys must match a key of the valid rows of the parent table.
+    
+    Args:
+    table_df (DataFrame): The rows of the table.
+    table (Table): The table of BOOKS_METADATA.
+    valid (ndarray): Boolean array marking the rows that passed the column checks.
+    parent_keys (dict): The valid primary keys (Index) of the tables checked before, by table name.
+    
+    Returns:
+    checks (list): One (kind, column, constraint, violations) tuple per constraint, like check_columns.
+    """
+    
+    checks = []
+    
+    # 1. Primary key: duplicates of a valid row
+    key_columns = [column.name for column in table.primary_key.columns if column.name in table_df.columns]
+    if key_columns:
+        duplicated = np.zeros(len(table_df), dtype=bool)
+        duplicated[valid] = table_df.loc[valid, key_columns].duplicated(keep='first').to_numpy()
+        checks.append(('primary_key', ', '.join(key_columns), f"PRIMARY KEY ({', '.join(key_columns)})", duplicated))
+    
+    # 2. Foreign keys: values missing from the parent table (NULL is allowed)
+    for foreign_key in table.foreign_keys:
+        column = foreign_key.parent.name
+        parent = foreign_key.column.table.name
+        if column not in table_df.columns or parent not in parent_keys:
+            continue
+        values = table_df[column]
+        orphans = (values.notna() & ~values.isin(parent_keys[parent])).to_numpy()
+        checks.append(('foreign_key', column,
+                       f"FOREIGN KEY ({column}) REFERENCES {parent}({foreign_key.column.name})", orphans))
+    
+    return checks
+
+
+def any_violation(checks, row_count):
+    # Rows breaking at least one of the checks
+    invalid = np.zeros(row_count, dtype=bool)
+    for _, _, _, violations in checks:
+        invalid |= violations
+    return invalid
+
+
+@instrument_stage
+def validate_tables(tables, value_ranges=None):
+    """
+    This function checks the tables against every constraint of the schema before they are
+    loaded, in foreign-key order (see database.LOAD_ORDER), so rows referencing a quarantined
+    row are quarantined too. Tables that are not part of the schema are returned unchanged.
+    
+    Args:
+    tables (dict): The tables keyed by table name, as returned by build_tables.
+    value_ranges (dict): (minimum, maximum) of the values of some columns, keyed by table name
+    and column (see VALUE_RANGES, the default).
+    
+    Returns:
+    valid_tables (dict): The tables without the rows breaking a constraint.
+    quarantine (dict): The rows breaking a constraint, keyed by table name, with a 'violations'
+    column listing the constraints each row breaks.
+    report (DataFrame): The table, kind, column, constraint and number of rows breaking it,
+    for every constraint checked.
+    """
+    
+    value_ranges = VALUE_RANGES if value_ranges is None else value_ranges
+    valid_tables = dict(tables)
+    quarantine = {}
+    parent_keys = {}
+    report = []
+    
+    for table_name in [table_name for group in LOAD_ORDER for table_name in group if table_name in tables]:
+        table_df = tables[table_name].reset_index(drop=True)
+        table = BOOKS_METADATA.tables[table_name]
+    
+        # 1. Check the columns, then the keys of the rows left
+        checks = check_columns(table_df, table, value_ranges.get(table_name))
+        valid = ~any_violation(checks, len(table_df))
+        checks += check_keys(table_df, table, valid, parent_keys)
+        for kind, column, constraint, violations in checks:
+            report.append({'table': table_name, 'kind': kind, 'column': column, 'constraint': constraint,
+                           'violations': int(violations.sum())})
+    
+        # 2. Move the rows breaking a constraint to the quarantine table
+        invalid = any_violation(checks, len(table_df))
+        quarantined_df = table_df[invalid].copy()
+        reasons = [np.where(violations[invalid], constraint, '') for _, _, constraint, violations in checks]
+        quarantined_df['violations'] = ['; '.join(filter(None, row_reasons)) for row_reasons in zip(*reasons)]
+        quarantine[table_name] = quarantined_df
+        valid_tables[table_name] = table_df[~invalid].reset_index(drop=True)
+        METRICS.increment('quarantined_rows', int(invalid.sum()))
+    
+        # 3. Keep the valid primary keys for the foreign keys of the next tables
+        key_columns = [column.name for column in table.primary_key.columns]
+        if len(key_columns) == 1 and key_columns[0] in table_df.columns:
+            parent_keys[table_name] = pd.Index(valid_tables[table_name][key_columns[0]])
+    
+    return valid_tables, quarantine, pd.DataFrame(report)
+
+
+def write_quarantine(quarantine, report, output_dir="Data/quarantine"):
+    """
+    This function writes the quarantine tables that are not empty as CSV files, together
+    with the validation report (report.csv), so the rejected rows can be fixed and reloaded.
+    
+    Args:
+    quarantine (dict): The quarantine tables returned by validate_tables.
+    report (DataFrame): The report returned by validate_tables.
+    output_dir (str): Directory of the files.
+    
+    Returns:
+    paths (list): The paths of the files written.
+    """
+    
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for table_name, quarantined_df in quarantine.items():
+        if len(quarantined_df):
+            path = os.path.join(output_dir, f"{table_name}.csv")
+            quarantined_df.to_csv(path, index=False)
+            paths.append(path)
+    path = os.path.join(output_dir, "report.csv")
+    report.to_csv(path, index=False)
+    paths.append(path)
+    
+    return paths
@@ -0,0 +1,456 @@
+"""
+Visualization part of the Goodreads analysis: the charts of the notebook and the batch 
+dashboard that regenerates them as PNG files.
+"""
+
+import pandas as pd
+import os
+import time
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import seaborn as sns
+from concurrent.futures import ThreadPoolExecutor
+
+from goodreads.database import (get_worker_engine, get_top_books_5_stars, get_highest_rated_books, get_best_authors, 
+                                get_most_in_demand_book_formats, get_avg_rating_by_genre, get_top_genres_by_reviews, 
+                                get_num_pages_avg_rating, get_top_books_by_avg_rating, 
+                                get_num_pages_rating_statistics)
+
+
+def render_top_books_5_stars(top_books_5_stars, ax=None):
+    """
+    This function draws a bar chart of the books with the most 5-star reviews.
+
+    Args:
+    top_books_5_stars (DataFrame): The result of get_top_books_5_stars.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(12, 8))
+    ax.barh(top_books_5_stars['book_author'], top_books_5_stars['5_star_reviews'], color='skyblue')
+    
+    # Adding titles and labels
+    ax.set_xlabel('Number of 5-Star Reviews')
+    ax.set_ylabel('Book Title - Author')
+    ax.set_title('Top 10 Books with Most 5-Star Reviews')
+    
+    # Invert y-axis to have the book with the most 5-star reviews at the top
+    ax.invert_yaxis()
+    
+    return ax.figure
+
+def render_highest_rated_books(highest_rated_books, ax=None):
+    """
+    This function draws a bar chart of the books with the highest average rating and a 
+    low number of reviews.
+
+    Args:
+    highest_rated_books (DataFrame): The result of get_highest_rated_books.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 6))
+    sns.barplot(x='average_rating', y='book_title', data=highest_rated_books, palette='viridis', ax=ax)
+    
+    ax.set_title('Top 10 Books with Highest Average Rating (Low Number of Reviews)', fontsize=16)
+    ax.set_xlabel('Average Rating', fontsize=14)
+    ax.set_ylabel('Book Title', fontsize=14)
+    ax.set_xlim(0, 5)  # Assuming ratings are out of 5
+    ax.grid(True, linestyle='--', alpha=0.6)
+    
+    return ax.figure
+
+def render_best_authors(best_authors, ax=None):
+    """
+    This function draws a bar chart of the authors with the highest average rating.
+
+    Args:
+    best_authors (DataFrame): The result of get_best_authors.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(12, 8))
+    sns.barplot(x='Average_Rating', y='author', data=best_authors, palette='plasma', ax=ax)
+    
+    ax.set_title('Top 10 Authors with More Than 10 Books Rated and Average Rating >= 4', fontsize=16)
+    ax.set_xlabel('Average Rating', fontsize=14)
+    ax.set_ylabel('Author', fontsize=14)
+    ax.set_xlim(4, 5)  # Assuming ratings are out of 5
+    ax.grid(True, linestyle='--', alpha=0.6)
+    
+    return ax.figure
+
+def render_most_in_demand_book_formats(best_formats, ax=None):
+    """
+    This function draws a bar chart of the most common book formats.
+
+    Args:
+    best_formats (DataFrame): The result of get_most_in_demand_book_formats.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(best_formats['book_format'], best_formats['count(book_format)'], color='skyblue')
+    
+    # Adding titles and labels
+    ax.set_xlabel('Count')
+    ax.set_ylabel('Book Format')
+    ax.set_title('Most In-Demand Book Formats')
+    
+    # Invert y-axis to have the most popular formats at the top
+    ax.invert_yaxis()
+    
+    return ax.figure
+
+def render_avg_rating_by_genre(best_genres, ax=None):
+    """
+    This function draws a bar chart of the average rating of each genre.
+
+    Args:
+    best_genres (DataFrame): The result of get_avg_rating_by_genre.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(12, 8))
+    ax.barh(best_genres['Genre'], best_genres['Avg_Rating'], color='skyblue')
+    
+    # Set the x-axis limit to start at 4
+    if not best_genres.empty:
+        ax.set_xlim(4, best_genres['Avg_Rating'].max() + 0.1)
+    
+    # Adding titles and labels
+    ax.set_xlabel('Average Rating')
+    ax.set_ylabel('Genre')
+    ax.set_title('Average Rating by Genre')
+    
+    # Invert y-axis to have the highest-rated genres at the top
+    ax.invert_yaxis()
+    
+    return ax.figure
+
+def render_top_genres_by_reviews(top_genres, ax=None):
+    """
+    This function draws a bar chart of the genres with the most reviews.
+
+    Args:
+    top_genres (DataFrame): The result of get_top_genres_by_reviews.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(12, 8))
+    ax.barh(top_genres['Genre'], top_genres['Total_Reviews'], color='skyblue')
+    
+    # Adding titles and labels
+    ax.set_xlabel('Total Reviews')
+    ax.set_ylabel('Genre')
+    ax.set_title('Top 10 Genres by Total Reviews')
+    
+    # Invert y-axis to have the genre with the most reviews at the top
+    ax.invert_yaxis()
+    
+    return ax.figure
+
+def render_num_pages_avg_rating(num_pages_avg_rating, ax=None):
+    """
+    This function draws a scatter plot of the average rating by number of pages.
+
+    Args:
+    num_pages_avg_rating (DataFrame): The result of get_num_pages_avg_rating.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(10, 6))
+    ax.scatter(num_pages_avg_rating['Number of Pages'], num_pages_avg_rating['Average Rating'], alpha=0.5, color='green')
+    ax.set_title('Correlation between Number of Pages and Average Rating')
+    ax.set_xlabel('Number of Pages')
+    ax.set_ylabel('Average Rating')
+    
+    return ax.figure
+
+def render_top_books_by_avg_rating(top_books, ax=None):
+    """
+    This function draws a bar chart of the books with the highest average rating.
+
+    Args:
+    top_books (DataFrame): The result of get_top_books_by_avg_rating.
+    ax (Axes): Optional axes to draw on. A new figure is created when it is not given.
+
+    Returns:
+    fig (Figure): The figure containing the chart.
+    """
+    
+    if ax is None:
+        fig, ax = plt.subplots(figsize=(12, 8))
+    ax.barh(top_books['book_title'], top_books['average_rating'], color='skyblue')
+    
+    # Adding titles and labels
+    ax.set_xlabel('Average Rating')
+    ax.set_ylabel('Book Title')
+    ax.set_title('Top 10 Books by Average Rating')
+    
+    # Set the x-axis limit to start at 4
+    if not top_books.empty:
+        ax.set_xlim(4, top_books['average_rating'].max() + 0.1)
+    
+    # Invert y-axis to have the highest-rated books at the top
+    ax.invert_yaxis()
+    
+    return ax.figure
+
+def plot_top_10_books_5_stars(engine, cache=None):
+    """
+    This function retrieves the top 10 books with the most 5-star reviews from the database,
+    then creates a bar chart to display the results.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_top_books_5_stars(get_top_books_5_stars(engine, cache=cache))
+    plt.show()
+
+def plot_top_10_highest_rated_books(engine, cache=None):
+    """
+    This function retrieves books with a low number of reviews (between 30 and 100)
+    and high average ratings, then plots the top 10 books.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_highest_rated_books(get_highest_rated_books(engine, cache=cache))
+    plt.show()
+
+def plot_top_10_best_authors(engine, cache=None):
+    """
+    This function retrieves authors who have more than 10 books rated and an average rating of 4 or higher,
+    then plots the top 10 authors.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_best_authors(get_best_authors(engine, cache=cache))
+    plt.show()
+
+def plot_most_in_demand_book_formats(engine, cache=None):
+    """
+    This function retrieves the most in-demand book formats from the database
+    and plots the data.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_most_in_demand_book_formats(get_most_in_demand_book_formats(engine, cache=cache))
+    plt.show()
+
+def plot_avg_rating_by_genre(engine, cache=None):
+    """
+    This function retrieves the average rating of the books of each genre from the database 
+    and plots the genres with an average rating greater than 4. Only genres with 500 or more 
+    books are included in the final plot.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_avg_rating_by_genre(get_avg_rating_by_genre(engine, cache=cache))
+    plt.show()
+
+def plot_top_10_genres_by_reviews(engine, cache=None):
+    """
+    This function retrieves the total number of reviews of the books of each genre from 
+    the database and plots the top 10 genres.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_top_genres_by_reviews(get_top_genres_by_reviews(engine, cache=cache))
+    plt.show()
+
+def plot_correlation_num_pages_avg_rating(engine, cache=None):
+    """
+    This function retrieves the average rating by the number of pages from the database,
+    calculates the correlation between the number of pages and average rating (per number 
+    of pages and per book), and plots a scatter plot to visualize the relationship.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    num_pages_avg_rating = get_num_pages_avg_rating(engine, cache=cache)
+    
+    # Calculate the correlation between Number of Pages and Average Rating
+    correlation = num_pages_avg_rating['Number of Pages'].corr(num_pages_avg_rating['Average Rating'])
+    
+    print(f"The correlation between Number of Pages and Average Rating is: {correlation:.4f}")
+    
+    # The same correlation over the individual books, computed in one streamed pass
+    book_correlation = get_num_pages_rating_statistics(engine)['correlation']
+    print(f"Across individual books, the correlation is: {book_correlation:.4f}")
+    
+    render_num_pages_avg_rating(num_pages_avg_rating)
+    plt.show()
+
+def plot_top_10_books_by_avg_rating(engine, cache=None):
+    """
+    This function retrieves the top 10 books with the highest average ratings (for books with more than 300 ratings)
+    from the database and plots the data.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    None
+    """
+    
+    render_top_books_by_avg_rating(get_top_books_by_avg_rating(engine, cache=cache))
+    plt.show()
+
+
+# The charts of the dashboard: file name, data function, renderer, figure size and 
+# whether the data function can read from the summary tables
+DASHBOARD_CHARTS = [
+    ('Most 5 Stars reviews.png', get_top_books_5_stars, render_top_books_5_stars, (12, 8), False),
+    ('Top 10 Books with Highest Average Rating (Low Number of Reviews).png', get_highest_rated_books, 
+     render_highest_rated_books, (10, 6), False),
+    ('Top 10 Authors with More Than 10 Books Rated and Average Rating >= 4.png', get_best_authors, 
+     render_best_authors, (12, 8), True),
+    ('Most In-Demand Book Formats.png', get_most_in_demand_book_formats, 
+     render_most_in_demand_book_formats, (10, 6), True),
+    ('Average Rating by Genre.png', get_avg_rating_by_genre, render_avg_rating_by_genre, (12, 8), True),
+    ('Top 10 Genres by Total Reviews.png', get_top_genres_by_reviews, render_top_genres_by_reviews, (12, 8), True),
+    ('Correlation between Number of Pages and Average Rating.png', get_num_pages_avg_rating, 
+     render_num_pages_avg_rating, (10, 6), True),
+    ('Top 10 Books by Average Rating.png', get_top_books_by_avg_rating, render_top_books_by_avg_rating, (12, 8), False),
+]
+
+
+def save_dashboard_chart(engine, output_dir, file_name, data_function, renderer, figsize, 
+                         use_summaries=False, cache=None):
+    """
+    This function runs the query of one dashboard chart, draws it on a figure that is not 
+    managed by pyplot (so no GUI backend is involved and figures can be drawn from several 
+    threads) and saves it as a PNG file.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database.
+    output_dir (str): Directory where the chart is written.
+    file_name (str): Name of the PNG file.
+    data_function (function): The get_* function returning the data of the chart.
+    renderer (function): The render_* function drawing the chart.
+    figsize (tuple): Size of the figure in inches.
+    use_summaries (bool): Whether the data function reads from the summary tables.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    stats (dict): The file written and the seconds spent on the query and on rendering.
+    """
+    
+    start = time.perf_counter()
+    if use_summaries:
+        chart_df = data_function(engine, cache=cache, use_summaries=True)
+    else:
+        chart_df = data_function(engine, cache=cache)
+    query_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    fig = Figure(figsize=figsize)
+    renderer(chart_df, ax=fig.add_subplot())
+    fig.tight_layout()
+    path = os.path.join(output_dir, file_name)
+    fig.savefig(path)
+    render_seconds = time.perf_counter() - start
+    
+    return {'file': path, 'rows': len(chart_df), 'query_seconds': query_seconds, 'render_seconds': render_seconds}
+
+
+def generate_dashboard(engine=None, output_dir="Graphs Python", max_workers=8, use_summaries=False, cache=None):
+    """
+    This function regenerates the eight charts of the analysis at once and writes them to 
+    output_dir. Every chart runs its query and renders its figure in its own thread, so the 
+    total time approaches the slowest query instead of the sum of all of them. At most 
+    max_workers connections are used at the same time.
+
+    Args:
+    engine (Engine): The SQLAlchemy engine connected to the database. By default the shared 
+    engine of get_worker_engine, for max_workers threads.
+    output_dir (str): Directory where the charts are written.
+    max_workers (int): Maximum number of charts generated (and connections used) at once.
+    use_summaries (bool): Whether to read from the summary tables where possible.
+    cache (QueryCache): Optional cache of query results, see run_query.
+
+    Returns:
+    report (DataFrame): The file, rows, query and render seconds of each chart.
+    """
+    
+    if engine is None:
+        engine = get_worker_engine(max_workers)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(save_dashboard_chart, engine, output_dir, file_name, data_function, renderer, 
+                                   figsize, use_summaries and supports_summaries, cache)
+                   for file_name, data_function, renderer, figsize, supports_summaries in DASHBOARD_CHARTS]
+        report = [future.result() for future in futures]
+    
+    return pd.DataFrame(report)
@@ -0,0 +1,124 @@
+"""
+Regression tests of the vectorized list parsers of goodreads.etl: the pyarrow (RE2) path and 
+the pure-pandas fallback must parse the format and genre lists the same way.
+"""
+
+import builtins
+
+import pandas as pd
+import pytest
+
+from goodreads import etl
+
+
+FORMATS = pd.Series([
+    "['652 pages, Paperback']",
+    '["1,024 pages, Hardcover"]',
+    "['Kindle Edition']",
+    "['320 pages']",
+    "['1 page, Audio CD']",
+    "[]",
+    "",
+    None,
+    "652 pages, Paperback",
+    "['12 pages, Mass Market Paperback'",
+], index=range(100, 110))
+
+GENRES = pd.Series([
+    "['Fantasy', 'Fiction', 'Young Adult']",
+    '["Children\'s", \'Classics\']',
+    "['Science Fiction']",
+    "[]",
+    "",
+    None,
+    "Fantasy, Fiction",
+    "[ 'Horror' ,  'Thriller' ]",
+], index=range(50, 58))
+
+
+def hide_pyarrow(monkeypatch):
+    # pandas keeps importing pyarrow itself: only the imports of goodreads.etl fail
+    original_import = builtins.__import__
+    
+    def etl_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if name.split('.')[0] == 'pyarrow' and (globals or {}).get('__name__') == etl.__name__:
+            raise ImportError(f"No module named '{name}'")
+        return original_import(name, globals, locals, fromlist, level)
+    
+    monkeypatch.setattr(builtins, '__import__', etl_import)
+
+
+@pytest.fixture
+def without_pyarrow(monkeypatch):
+    hide_pyarrow(monkeypatch)
+
+
+def parse_without_pyarrow(monkeypatch, function, *args):
+    with monkeypatch.context() as context:
+        hide_pyarrow(context)
+        return function(*args)
+
+
+def test_extract_groups_keeps_the_index(without_pyarrow):
+    groups_df = etl.extract_groups(FORMATS, etl.FORMAT_PATTERN)
+    
+    assert groups_df.index.equals(FORMATS.index)
+    assert groups_df.loc[100, 'pages'] == '652'
+    assert groups_df.loc[100, 'format'] == 'Paperback'
+
+
+def test_extract_groups_matches_fallback(monkeypatch):
+    pytest.importorskip('pyarrow')
+    arrow_df = etl.extract_groups(FORMATS, etl.FORMAT_PATTERN)
+    pandas_df = parse_without_pyarrow(monkeypatch, etl.extract_groups, FORMATS, etl.FORMAT_PATTERN)
+    
+    assert arrow_df.index.equals(FORMATS.index)
+    pd.testing.assert_frame_equal(arrow_df.astype(object), pandas_df.astype(object))
+
+
+def test_parse_formats_matches_fallback(monkeypatch):
+    pytest.importorskip('pyarrow')
+    arrow_df = etl.parse_formats(FORMATS)
+    pandas_df = parse_without_pyarrow(monkeypatch, etl.parse_formats, FORMATS)
+    
+    pd.testing.assert_frame_equal(arrow_df.astype({'book_format': object}), 
+                                  pandas_df.astype({'book_format': object}))
+
+
+def test_parse_formats_statuses(without_pyarrow):
+    parsed_df = etl.parse_formats(FORMATS)
+    
+    assert parsed_df['format_status'].tolist() == ['ok', 'ok', 'missing_pages', 'missing_format', 'ok', 
+                                                   'empty', 'empty', 'empty', 'unparsable', 'unparsable']
+    assert parsed_df.loc[101, 'num_pages'] == 1024
+    assert parsed_df.loc[104, 'book_format'] == 'Audio CD'
+
+
+def test_format_format_table_drops_malformed():
+    formats_df = pd.DataFrame({'format': FORMATS, 'format_id': range(1, len(FORMATS) + 1)})
+    cleaned_df = etl.format_format_table(formats_df, malformed='drop')
+    
+    assert cleaned_df['format_id'].tolist() == [1, 2, 5]
+    assert cleaned_df['num_pages'].tolist() == [652, 1024, 1]
+    assert cleaned_df['book_format'].tolist() == ['Paperback', 'Hardcover', 'Audio CD']
+
+
+def test_format_format_table_raises_on_malformed():
+    formats_df = pd.DataFrame({'format': FORMATS, 'format_id': range(1, len(FORMATS) + 1)})
+    
+    with pytest.raises(ValueError, match="7 malformed formats"):
+        etl.format_format_table(formats_df, malformed='raise')
+    
+    # Complete formats never raise
+    etl.format_format_table(formats_df.iloc[[0, 1, 4]], malformed='raise')
+
+
+def test_split_genres_matches_fallback(monkeypatch):
+    pytest.importorskip('pyarrow')
+    arrow_df = etl.split_genres(GENRES)
+    pandas_df = parse_without_pyarrow(monkeypatch, etl.split_genres, GENRES)
+    
+    pd.testing.assert_frame_equal(arrow_df.astype({'genre': object}), pandas_df.astype({'genre': object}))
+    assert arrow_df['row'].tolist() == [0, 0, 0, 1, 1, 2, 7, 7]
+    assert arrow_df['genre'].tolist() == ['Fantasy', 'Fiction', 'Young Adult', "Children's", 'Classics', 
+                                          'Science Fiction', 'Horror', 'Thriller']